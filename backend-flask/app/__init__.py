@@ -1,3 +1,4 @@
+import click
 from flask import Flask
 from flask_cors import CORS
 from flask_limiter import Limiter
@@ -5,14 +6,45 @@ from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 from .settings import settings
 from .db import init_db
+from .auth import current_claims
+from .redis_pool import get_pool, get_redis
 from . import middleware
-from redis import Redis
-import os
 
-# Global limiter instance
+# Default per-tenant request quota by subscription plan
+PLAN_QUOTAS = {
+    "trial": "200/minute",
+    "starter": "300/minute",
+    "pro": "600/minute",
+    "agency": "1200/minute",
+}
+
+def tenant_key():
+    """Rate-limit key: the tenant from the JWT, falling back to the client address."""
+    claims = current_claims()
+    tenant = claims.get("business_id") or claims.get("sub")
+    if tenant:
+        return f"tenant:{tenant}"
+    return f"ip:{get_remote_address()}"
+
+def plan_quota():
+    """Quota for the caller's plan; unauthenticated callers get the trial quota."""
+    plan = current_claims().get("plan") or "trial"
+    return PLAN_QUOTAS.get(plan, PLAN_QUOTAS["trial"])
+
+# Global limiter instance (shared Redis storage, moving window)
 limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["200/minute"]
+    key_func=tenant_key,
+    default_limits=[plan_quota],
+    storage_uri=settings.RATELIMIT_STORAGE_URI,
+    strategy=settings.RATELIMIT_STRATEGY,
+    # Keep serving with per-process counters if Redis is unreachable
+    in_memory_fallback_enabled=True,
+    key_prefix="leadnest",
+    # Reuse the process-wide pool when limits live in the main Redis
+    storage_options=(
+        {"connection_pool": get_pool()}
+        if settings.RATELIMIT_STORAGE_URI == settings.REDIS_URL else {}
+    ),
 )
 
 def create_app():
@@ -51,7 +83,7 @@ def create_app():
         supports_credentials=False,
         allow_headers=["Content-Type", "Authorization"],
         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-        expose_headers=["Authorization"],
+        expose_headers=["Authorization", "X-Next-Cursor"],
         max_age=86400,
     )
 
@@ -84,17 +116,57 @@ def create_app():
             # Tables might not exist yet
             pass
 
-    # Redis connection for RQ
-    try:
-        redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
-        app.redis = Redis.from_url(redis_url)
-    except Exception:
-        app.redis = None
+        # Warm the inbound SMS routing table before the first webhook
+        from .number_routing import number_router
+        try:
+            number_router.load()
+        except Exception:
+            app.logger.warning("Inbound number routes not loaded at startup")
+
+    # Shared Redis pool (RQ, limiter, caches)
+    app.redis_pool = get_pool()
+    app.redis = get_redis()
 
     # Middleware
     app.before_request(middleware.before_request)
     app.after_request(middleware.after_request)
 
+    @app.cli.command("backfill-lead-keys")
+    def backfill_lead_keys_command():
+        """Populate normalized phone/email keys on existing leads."""
+        from .tasks import backfill_lead_keys
+        print(backfill_lead_keys())
+
+    @app.cli.command("rescore-leads")
+    @click.option("--business-id", type=int, default=None, help="Only this business (default: all).")
+    def rescore_leads_command(business_id):
+        """Rescore leads whose AI score inputs changed now (the default worker also sweeps periodically)."""
+        from .tasks import rescore_leads
+        print(rescore_leads(business_id))
+
+    @app.cli.command("rollup-metrics")
+    @click.option("--rebuild-days", type=int, default=None, help="Recompute the last N days instead of catching up.")
+    @click.option("--business-id", type=int, default=None, help="With --rebuild-days, only this business.")
+    def rollup_metrics_command(rebuild_days, business_id):
+        """Update the daily ROI rollups from rows changed since the last run."""
+        if rebuild_days:
+            from .metrics_rollup import rebuild
+            print({"written": rebuild(rebuild_days, business_id)})
+        else:
+            from .tasks import rollup_metrics
+            print(rollup_metrics(reschedule=False))
+
+    @app.cli.command("roi-fleet")
+    @click.option("--inline", is_flag=True, help="Run every range in this process instead of on RQ workers.")
+    def roi_fleet_command(inline):
+        """Write today's ROI reports for all businesses (run nightly, e.g. from cron; reruns resume)."""
+        if inline:
+            from .workers.roi_worker import roi_worker
+            print(roi_worker.calculate_roi_for_all_active_businesses())
+        else:
+            from .tasks import enqueue_roi_fleet
+            print(enqueue_roi_fleet())
+
     # ✅ Import API after limiter is defined to avoid circular import
     from .api import api_bp
     app.register_blueprint(api_bp, url_prefix="/api")
@@ -1,22 +1,30 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from datetime import datetime, timedelta
-import logging, csv, io, os
+import logging, csv, hashlib, io, os, json, base64, time
 
 from twilio.rest import Client
-from twilio.request_validator import RequestValidator
 from twilio.twiml.messaging_response import MessagingResponse
 
-from redis import Redis
-from rq import Queue
-
 from marshmallow import Schema, fields, validate
-from sqlalchemy import text
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import load_only
+from redis.exceptions import RedisError
 
-from .auth import require_auth, issue_token
-from .db import db
+from .auth import require_auth, require_business, issue_token, current_business_id, user_claims
+from .db import db, pool_stats as db_pool_stats
 from .models import Lead, Booking, Business, Conversation, Message, IdempotencyKey
-from .__init__ import limiter
-from .tasks import enqueue_bulk_import
+from . import limiter
+from .tasks import enqueue_bulk_import, enqueue_rescore, queue as task_queue
+from .redis_pool import pool_stats
+from .settings import settings
+from .lead_import import upsert_leads, spool_upload, iter_csv_rows, discard_spool, discard_stash, stash_spool
+from .sms_events import INBOUND_STREAM, STATUS_STREAM, inbound_event, persist_inbound, persist_statuses, status_event
+from .number_routing import number_router
+from .twiml_cache import twiml_cache, validator_for
+from .sms_outbound import queue_sms, sender_for
+from .lead_scoring import scored_page
+from .metrics_rollup import rollup_roi
+from .response_cache import response_cache, tenant_id
 
 log = logging.getLogger(__name__)
 
@@ -66,8 +74,7 @@ def get_twilio_client():
     return None
 
 def get_queue():
-    redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
-    return Queue(connection=Redis.from_url(redis_url))
+    return task_queue
 
 # ---------- Schemas ----------
 class LeadSchema(Schema):
@@ -163,6 +170,20 @@ def readyz():
         checks["database_connection"] = f"FAILED: {str(e)}"
         overall_ready = False
     
+    try:
+        checks["database_pool"] = db_pool_stats()
+    except Exception as e:
+        checks["database_pool"] = f"FAILED: {str(e)}"
+
+    # Redis pool health (informational; Redis is not required to serve)
+    try:
+        checks["redis_pool"] = pool_stats()
+    except Exception as e:
+        checks["redis_pool"] = f"FAILED: {str(e)}"
+
+    # Response cache hit/miss counts for this process (for TTL tuning)
+    checks["response_cache"] = response_cache.stats()
+
     # Check JWT secret
     jwt_secret = os.environ.get("JWT_SECRET")
     checks["jwt_secret"] = "SET" if jwt_secret else "NOT_SET"
@@ -183,7 +204,7 @@ def login():
     password = data.get("password", "")
     if not email:
         return {"error": "email required"}, 400
-    token = issue_token({"sub": email, "email": email})
+    token = issue_token(user_claims(email))
     return {"token": token, "email": email}
 
 @limiter.limit("5/min")
@@ -205,7 +226,7 @@ def register():
             
         # For demo purposes, we just issue a token
         # In production, you'd create user record, hash password, etc.
-        token = issue_token({"sub": email, "email": email})
+        token = issue_token(user_claims(email))
         
         current_app.logger.info(f"User registered: {email}")
         
@@ -220,15 +241,77 @@ def register():
         return {"error": "Registration failed"}, 500
 
 # ---------- Leads ----------
+LEADS_PAGE_DEFAULT = 50
+LEADS_PAGE_MAX = 200
+
+def _encode_cursor(lead: Lead) -> str:
+    raw = json.dumps([lead.created_at.isoformat() if lead.created_at else None, lead.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    """Opaque cursor -> (created_at, id); raises ValueError if malformed."""
+    try:
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(lead_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
 @api_bp.get("/leads")
 @require_auth
+@require_business
 def list_leads():
-    items = Lead.query.order_by(Lead.created_at.desc()).limit(100).all()
-    return jsonify([x.to_dict() for x in items])
+    """
+    Newest-first lead listing with keyset pagination on (created_at, id).
+    The body stays a JSON array; the cursor for the next page is returned in
+    the X-Next-Cursor header (absent on the last page).
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get("limit", LEADS_PAGE_DEFAULT)), 1), LEADS_PAGE_MAX)
+        min_score = float(args["min_score"]) if "min_score" in args else None
+        max_score = float(args["max_score"]) if "max_score" in args else None
+        cursor = _decode_cursor(args["cursor"]) if args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    fields_arg = args.get("fields")
+    projection = None
+    if fields_arg:
+        requested = [f.strip() for f in fields_arg.split(",") if f.strip()]
+        unknown = sorted(set(requested) - set(Lead.API_FIELDS))
+        if unknown:
+            return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+        # id/created_at are always returned; the cursor is built from them
+        projection = [f for f in Lead.API_FIELDS if f in requested or f in ("id", "created_at")]
+
+    q = Lead.query.filter(Lead.business_id == current_business_id())
+    for name in ("status", "source", "priority"):
+        if args.get(name):
+            q = q.filter(getattr(Lead, name) == args[name])
+    if min_score is not None:
+        q = q.filter(Lead.score >= min_score)
+    if max_score is not None:
+        q = q.filter(Lead.score <= max_score)
+    if cursor:
+        created_at, lead_id = cursor
+        q = q.filter(tuple_(Lead.created_at, Lead.id) < (created_at, lead_id))
+    if projection:
+        q = q.options(load_only(*[getattr(Lead, f) for f in projection]))
+
+    # Fetch one extra row to know whether another page exists
+    items = q.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    resp = jsonify([x.to_dict(projection) for x in items])
+    if has_more:
+        resp.headers["X-Next-Cursor"] = _encode_cursor(items[-1])
+    return resp
 
 @limiter.limit("5/min")
 @api_bp.post("/leads/bulk")
 @require_auth
+@require_business
 def leads_bulk():
     # Idempotency check
     idem_key = request.headers.get("Idempotency-Key")
@@ -243,7 +326,8 @@ def leads_bulk():
             out["idempotent"] = True
             return out
 
-    created = updated = 0
+    business_id = current_business_id()
+    created = updated = duplicates = 0
     errors = []
 
     # CSV upload path
@@ -252,56 +336,33 @@ def leads_bulk():
         if not f.filename.lower().endswith(".csv"):
             return {"error": "only CSV files supported"}, 400
 
-        content = f.read().decode("utf-8", "ignore")
-        rows = list(csv.DictReader(io.StringIO(content)))
-        row_count = len(rows)
+        # Spool to disk and stream rows; the file is never held in memory
+        spool_path, row_count = spool_upload(f.stream)
 
-        # Enqueue large imports
+        # Enqueue large imports; the worker runs on another host, so the upload
+        # goes through Redis and the job gets its key
         if row_count > 5000:
             if idem_key and not IdempotencyKey.query.filter_by(key=idem_key).first():
                 db.session.add(IdempotencyKey(key=idem_key, response_data=None))
                 db.session.commit()
-            job_id = enqueue_bulk_import(content, idem_key)
+            try:
+                spool_key = stash_spool(spool_path)
+            finally:
+                discard_spool(spool_path)
+            try:
+                job_id = enqueue_bulk_import(spool_key, business_id, idem_key, row_count)
+            except Exception:
+                discard_stash(spool_key)
+                raise
             return {"job_id": job_id, "status": "enqueued", "estimated_rows": row_count}, 202
 
-        # Inline small imports (chunked commits)
-        reader = csv.DictReader(io.StringIO(content))
-        processed = 0
-        for row in reader:
-            try:
-                data = {
-                    "full_name": (row.get("full_name") or "").strip() or None,
-                    "email": (row.get("email") or "").strip().lower() or None,
-                    "phone": (row.get("phone") or "").strip() or None,
-                    "source": (row.get("source") or "bulk").strip() or "bulk",
-                    "status": (row.get("status") or "new").strip() or "new",
-                    "business_id": 1,
-                }
-                if not any([data["full_name"], data["email"], data["phone"]]):
-                    continue
-
-                existing = None
-                if data["email"]:
-                    existing = Lead.query.filter_by(email=data["email"]).first()
-                if not existing and data["phone"]:
-                    existing = Lead.query.filter_by(phone=data["phone"]).first()
-
-                if existing:
-                    for k, v in data.items():
-                        if v is not None:
-                            setattr(existing, k, v)
-                    existing.updated_at = datetime.utcnow()
-                    updated += 1
-                else:
-                    db.session.add(Lead(**data))
-                    created += 1
-
-                processed += 1
-                if processed % 500 == 0:
-                    db.session.commit()
-            except Exception as e:
-                errors.append(f"Row {processed+1}: {e}")
-        db.session.commit()
+        # Inline small imports (chunked set-based upserts)
+        try:
+            outcome = upsert_leads(iter_csv_rows(spool_path), business_id=business_id)
+        finally:
+            discard_spool(spool_path)
+        created, updated, errors = outcome["created"], outcome["updated"], outcome["errors"]
+        duplicates = outcome["duplicates"]
 
     # JSON array path
     else:
@@ -310,29 +371,24 @@ def leads_bulk():
             return {"error": "expected JSON array"}, 400
 
         schema = LeadSchema()
-        for idx, item in enumerate(body):
-            try:
-                data = schema.load(item)
-                data["business_id"] = 1
-                existing = None
-                if data.get("email"):
-                    existing = Lead.query.filter_by(email=data["email"]).first()
-                if not existing and data.get("phone"):
-                    existing = Lead.query.filter_by(phone=data["phone"]).first()
-                if existing:
-                    for k, v in data.items():
-                        if v is not None:
-                            setattr(existing, k, v)
-                    existing.updated_at = datetime.utcnow()
-                    updated += 1
-                else:
-                    db.session.add(Lead(**data))
-                    created += 1
-            except Exception as e:
-                errors.append(f"Item {idx+1}: {e}")
-        db.session.commit()
+
+        def validated():
+            for idx, item in enumerate(body):
+                try:
+                    yield schema.load(item)
+                except Exception as e:
+                    errors.append(f"Item {idx+1}: {e}")
+                    yield None  # keep row numbering aligned with the request body
+
+        outcome = upsert_leads(validated(), business_id=business_id, default_source="api", label="Item")
+        created, updated, duplicates = outcome["created"], outcome["updated"], outcome["duplicates"]
+        errors.extend(outcome["errors"])
 
     result = {"created": created, "updated": updated, "errors": errors}
+    if duplicates:
+        log.info("Bulk import for business %s merged %d duplicate rows", business_id, duplicates)
+    if created or updated:
+        enqueue_rescore(business_id)
     if idem_key:
         rec = IdempotencyKey.query.filter_by(key=idem_key).first()
         if rec:
@@ -361,6 +417,7 @@ def create_booking():
         )
         db.session.add(booking)
         db.session.commit()
+        response_cache.invalidate("roi", [booking.business_id])
         return booking.to_dict(), 201
     except Exception as e:
         return {"error": f"Invalid booking data: {e}"}, 400
@@ -411,10 +468,12 @@ def twilio_inbound_debug():
         return f"ERROR: {str(e)}", 500
 
 @api_bp.post("/twilio/inbound")
+@limiter.exempt
 def twilio_inbound():
     """
     Twilio posts application/x-www-form-urlencoded.
-    We must validate the X-Twilio-Signature using the *live* TWILIO_AUTH_TOKEN.
+    We must validate the X-Twilio-Signature using the auth token of the
+    business that owns the To number (TWILIO_AUTH_TOKEN for unrouted numbers).
     """
     
     try:
@@ -424,20 +483,22 @@ def twilio_inbound():
         # 2) Render sits behind a proxy; make sure URL used for validation is https
         url_for_sig = request.url.replace("http://", "https://")
         
-        # 3) Validate Twilio signature
+        # 3) Route the To number to its business, then validate the Twilio
+        # signature with that tenant's auth token
         sig = request.headers.get("X-Twilio-Signature", "")
-        auth_token = os.environ.get("TWILIO_AUTH_TOKEN", "")
+        route = number_router.resolve(request.form.get("To", ""))
 
-        current_app.logger.info(f"Twilio webhook signature validation - URL: {url_for_sig}, has_signature: {bool(sig)}")
+        current_app.logger.debug(f"Twilio webhook signature validation - URL: {url_for_sig}, has_signature: {bool(sig)}")
         
-        if not auth_token:
-            # Misconfigured env -> treat as forbidden so you'll see 403 in logs
-            current_app.logger.error("TWILIO_AUTH_TOKEN not configured")
+        if route is None:
+            # Unknown number and no TWILIO_AUTH_TOKEN fallback -> forbidden so you'll see 403 in logs
+            current_app.logger.error("No Twilio auth token configured for inbound number")
             return "", 403
 
-        validator = RequestValidator(auth_token)
-        is_valid = validator.validate(url_for_sig, form_params, sig)
-        current_app.logger.info(f"Twilio signature validation result: {is_valid}")
+        validator = validator_for(route.auth_token)
+        # Pass the MultiDict itself: the validator reads repeated keys via getlist()
+        is_valid = validator.validate(url_for_sig, request.form, sig)
+        current_app.logger.debug(f"Twilio signature validation result: {is_valid}")
         
         if not is_valid:
             # Signature mismatch => 403 Forbidden
@@ -452,67 +513,22 @@ def twilio_inbound():
             )
             return "", 403
 
-        # 4) Process the webhook
-        from_number = request.form.get("From", "")
-        body = request.form.get("Body", "")
-
-        current_app.logger.info({
-            "twilio_inbound": True, 
-            "from": from_number, 
-            "body": body,
-            "url": url_for_sig,
-            "signature_valid": True
-        })
-
-        # Try database operations in try/catch to prevent 500 errors
+        # 4) Hand the message to the stream consumer and answer right away;
+        # persistence happens in batches off the request path (see sms_events)
+        event = inbound_event(request.form, business_id=route.business_id, received_at=int(time.time()))
+        current_app.logger.debug({"twilio_inbound": True, "message_sid": event["message_sid"]})
         try:
-            # Only try database operations if DATABASE_URL is configured
-            if os.environ.get("DATABASE_URL"):
-                # Find or create lead
-                lead = Lead.query.filter_by(phone=from_number).first()
-                if not lead:
-                    lead = Lead(phone=from_number, source="sms", status="new", business_id=1)
-                    db.session.add(lead)
-                    db.session.flush()
-
-                # Find or create conversation
-                convo = Conversation.query.filter_by(lead_id=lead.id, channel="sms").first()
-                if not convo:
-                    convo = Conversation(lead_id=lead.id, channel="sms")
-                    db.session.add(convo)
-                    db.session.flush()
-
-                # Add message
-                db.session.add(Message(
-                    conversation_id=convo.id, 
-                    role="user", 
-                    text=body, 
-                    ts=datetime.utcnow()
-                ))
-                db.session.commit()
-                current_app.logger.info("SMS saved to database successfully")
-            else:
-                current_app.logger.warning("DATABASE_URL not set, skipping database operations")
+            INBOUND_STREAM.publish(event)
+        except RedisError:
+            current_app.logger.exception("Inbound SMS stream unavailable; persisting inline")
+            try:
+                persist_inbound([event])
+            except Exception as db_error:
+                db.session.rollback()
+                current_app.logger.exception(f"Database error in Twilio webhook: {db_error}")
+
+        return twiml_cache.reply(route.business_id), 200, {"Content-Type": "application/xml"}
 
-            # Auto-reply with TwiML (always send reply regardless of DB status)
-            resp = MessagingResponse()
-            resp.message("Thanks! We got your message and will reply shortly.")
-            
-            xml_response = str(resp)
-            current_app.logger.info(f"Sending TwiML response: {xml_response}")
-            
-            # Return TwiML with correct Content-Type for Twilio auto-reply
-            return xml_response, 200, {"Content-Type": "application/xml"}
-            
-        except Exception as db_error:
-            current_app.logger.exception(f"Database error in Twilio webhook: {db_error}")
-            # Still return a TwiML response even if DB fails
-            resp = MessagingResponse()
-            resp.message("Message received!")
-            xml_response = str(resp)
-            current_app.logger.info(f"Sending fallback TwiML response: {xml_response}")
-            return xml_response, 200, {"Content-Type": "application/xml"}
-        
     except Exception as e:
         current_app.logger.exception(f"Twilio webhook error: {e}")
         # Surface error so it appears in Twilio console; they will retry
@@ -553,38 +569,146 @@ def twilio_inbound_test():
         current_app.logger.exception(f"Twilio TEST webhook error: {e}")
         return "Twilio TEST webhook internal error", 500
 
+@api_bp.post("/twilio/status")
+@limiter.exempt
+def twilio_status():
+    """
+    Message status callback (StatusCallback on sends). Signed with the auth
+    token of the business that owns the sending (From) number. Queued for
+    batched persistence; see sms_events.persist_statuses.
+    """
+    route = number_router.resolve(request.form.get("From", ""))
+    url_for_sig = request.url.replace("http://", "https://")
+    sig = request.headers.get("X-Twilio-Signature", "")
+    if route is None or not validator_for(route.auth_token).validate(url_for_sig, request.form, sig):
+        current_app.logger.warning("Rejected Twilio status callback", extra={"has_signature": bool(sig)})
+        return "", 403
+
+    event = status_event(request.form, received_at=int(time.time()))
+    try:
+        STATUS_STREAM.publish(event)
+    except RedisError:
+        current_app.logger.exception("SMS status stream unavailable; persisting inline")
+        try:
+            persist_statuses([event])
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Database error in Twilio status callback")
+            # Let Twilio retry the callback
+            return "", 503
+    return "", 204
+
+
 @api_bp.post("/twilio/send")
 @require_auth
+@require_business
 def twilio_send():
+    """Queue one SMS to a lead; the sms worker sends it. Poll the message for delivery status."""
     data = request.get_json() or {}
     lead_id = data.get("lead_id")
     text = data.get("body", "")
     if not lead_id or not text:
         return {"error": "lead_id and body required"}, 400
 
-    lead = Lead.query.get(lead_id)
-    if not lead or not lead.phone:
+    lead = db.session.get(Lead, lead_id)
+    if not lead or not lead.phone or lead.business_id != current_business_id():
         return {"error": "lead not found or no phone"}, 404
-
-    client = get_twilio_client()
-    if not client:
+    if sender_for(lead.business_id) is None:
         return {"error": "Twilio not configured"}, 503
 
-    from_number = os.environ.get("TWILIO_FROM")
-    msg = client.messages.create(body=text, from_=from_number, to=lead.phone)
+    try:
+        queued = queue_sms(lead.business_id, [lead.id], text, sender="ai")
+    except RedisError:
+        return {"error": "send queue unavailable"}, 503
+    return {"message_id": queued[lead.id], "status": "queued", "to": lead.phone, "body": text}, 202
 
-    convo = Conversation.query.filter_by(lead_id=lead.id, channel="sms").first()
-    if not convo:
-        convo = Conversation(lead_id=lead.id, channel="sms")
-        db.session.add(convo)
-        db.session.flush()
 
-    db.session.add(Message(conversation_id=convo.id, role="ai", text=text, ts=datetime.utcnow()))
-    db.session.commit()
+@api_bp.post("/twilio/send/bulk")
+@require_auth
+@require_business
+@limiter.limit("10 per minute")
+def twilio_send_bulk():
+    """Queue the same SMS to many leads (campaigns). Leads without a phone are skipped."""
+    data = request.get_json() or {}
+    lead_ids = data.get("lead_ids") or []
+    text = data.get("body", "")
+    if not isinstance(lead_ids, list) or not lead_ids or not text:
+        return {"error": "lead_ids and body required"}, 400
+    if len(lead_ids) > settings.SMS_BULK_MAX_LEADS:
+        return {"error": f"at most {settings.SMS_BULK_MAX_LEADS} leads per request"}, 413
+
+    business_id = current_business_id()
+    if sender_for(business_id) is None:
+        return {"error": "Twilio not configured"}, 503
 
-    return {"message_sid": msg.sid, "status": msg.status, "to": msg.to, "body": msg.body}
+    try:
+        queued = queue_sms(business_id, lead_ids, text, sender="ai")
+    except RedisError:
+        return {"error": "send queue unavailable"}, 503
+    return {"queued": len(queued), "skipped": len(set(lead_ids)) - len(queued),
+            "message_ids": {str(k): v for k, v in queued.items()}}, 202
 
 # ---------- Jobs ----------
+def _partitioned_job_status(job, q):
+    """Per-partition and overall progress for a bulk import that was fanned out."""
+    from rq.job import Job
+
+    partition_ids = job.meta.get("partition_job_ids") or []
+    partitions = []
+    for job_id, child in zip(partition_ids, Job.fetch_many(partition_ids, connection=q.connection)):
+        entry = {"id": job_id, "status": child.get_status() if child else "expired"}
+        if child is not None:
+            entry["progress"] = child.meta.get("progress")
+            if child.is_finished:
+                res = child.return_value() or {}
+                entry.update({k: res.get(k) for k in ("created", "updated", "duplicates", "total_rows")})
+        partitions.append(entry)
+
+    done = sum(1 for p in partitions if p["status"] in ("finished", "failed", "expired"))
+    live = [p["progress"] for p in partitions if p.get("progress")]
+    expected = sum(p.get("expected_rows") or 0 for p in live)
+    etas = [p["eta_seconds"] for p in live if p.get("eta_seconds") is not None]
+    out = {
+        "partitions": partitions,
+        "progress": {
+            "partitions_total": len(partitions),
+            "partitions_done": done,
+            "percent": round(done / len(partitions) * 100, 1) if partitions else 100.0,
+            "rows_processed": sum(p["rows_processed"] for p in live),
+            "expected_rows": expected or None,
+            # Partitions run side by side, so throughput adds up and the slowest sets the ETA
+            "rows_per_sec": round(sum(p["rows_per_sec"] for p in live), 1),
+            "eta_seconds": max(etas) if etas else None,
+        },
+    }
+
+    aggregate = q.fetch_job(job.meta["aggregate_job_id"]) if job.meta.get("aggregate_job_id") else None
+    if aggregate is not None:
+        out["status"] = aggregate.get_status()
+        if aggregate.is_finished:
+            out["result"] = aggregate.return_value()
+        elif aggregate.is_failed:
+            out["error"] = str(aggregate.exc_info)
+    return out
+
+def _job_payload(job, q):
+    out = {
+        "id": job.id,
+        "status": job.get_status(),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "ended_at": job.ended_at.isoformat() if job.ended_at else None,
+    }
+    if job.meta.get("progress"):
+        out["progress"] = job.meta["progress"]
+    if job.meta.get("partition_job_ids") is not None:
+        out.update(_partitioned_job_status(job, q))
+    elif job.is_finished:
+        out["result"] = job.result
+    elif job.is_failed:
+        out["error"] = str(job.exc_info)
+    return out
+
 @api_bp.get("/jobs/<job_id>")
 @require_auth
 def job_status(job_id: str):
@@ -593,22 +717,58 @@ def job_status(job_id: str):
         job = q.fetch_job(job_id)
         if job is None:
             return {"error": "job not found"}, 404
-
-        out = {
-            "id": job.id,
-            "status": job.get_status(),
-            "created_at": job.created_at.isoformat() if job.created_at else None,
-            "started_at": job.started_at.isoformat() if job.started_at else None,
-            "ended_at": job.ended_at.isoformat() if job.ended_at else None,
-        }
-        if job.is_finished:
-            out["result"] = job.result
-        elif job.is_failed:
-            out["error"] = str(job.exc_info)
-        return out
+        return _job_payload(job, q)
     except Exception as e:
         return {"error": str(e)}, 500
 
+@api_bp.get("/jobs/<job_id>/events")
+@require_auth
+def job_events(job_id: str):
+    """
+    Server-sent events: pushes the job payload whenever its progress changes.
+    Each stream holds a web thread, so it ends after JOB_EVENTS_MAX_SECONDS and
+    EventSource reconnects; the Last-Event-ID it sends back skips a payload the
+    client already has.
+    """
+    q = get_queue()
+    if q.fetch_job(job_id) is None:
+        return {"error": "job not found"}, 404
+
+    poll_seconds = settings.JOB_EVENTS_POLL_SECONDS
+    last_event_id = request.headers.get("Last-Event-ID")
+
+    def stream():
+        last = last_event_id
+        idle = 0.0
+        deadline = time.monotonic() + settings.JOB_EVENTS_MAX_SECONDS
+        yield f"retry: {int(poll_seconds * 1000)}\n\n"
+        while time.monotonic() < deadline:
+            job = q.fetch_job(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"job not found\"}\n\n"
+                return
+            data = _job_payload(job, q)
+            payload = json.dumps(data, default=str)
+            event_id = hashlib.sha1(payload.encode()).hexdigest()[:16]
+            if event_id != last:
+                last = event_id
+                idle = 0.0
+                yield f"id: {event_id}\nevent: progress\ndata: {payload}\n\n"
+            elif idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            if data["status"] in ("finished", "failed", "canceled", "stopped"):
+                yield "event: done\ndata: {}\n\n"
+                return
+            time.sleep(poll_seconds)
+            idle += poll_seconds
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------- Seed (guarded) ----------
 @api_bp.post("/admin/seed-demo")
 def seed_demo():
@@ -624,6 +784,7 @@ def seed_demo():
     l1 = Lead(full_name="Alice Johnson", email="alice@example.com", phone="+1111111111", source="demo", business_id=biz.id)
     l2 = Lead(full_name="Bob Smith",   email="bob@example.com",   phone="+2222222222", source="demo", business_id=biz.id)
     db.session.add_all([l1, l2]); db.session.commit()
+    enqueue_rescore(biz.id)
 
     convo = Conversation(lead_id=l1.id, channel="sms")
     db.session.add(convo); db.session.commit()
@@ -650,56 +811,36 @@ def lead_messages(lead_id: int):
 # AI Lead Scoring
 @api_bp.get("/ai/score-leads")
 @require_auth
+@require_business
 @limiter.limit("10 per minute")  # Rate limit for expensive AI operations
 def score_leads():
-    """Get AI lead scores for all leads with pagination and filtering"""
-    if not ai_scorer:
-        return {"error": "AI scoring service not available"}, 503
-    
+    """
+    AI lead scores, highest first. Scores are persisted by the rescore job
+    (lead_scoring / tasks.rescore_leads), so this is an indexed read; leads
+    not scored yet are left out until the job reaches them.
+    """
     try:
-        # Get query parameters with defaults
-        user_id = request.args.get('user_id', 'default')
         limit = min(int(request.args.get('limit', 50)), 100)  # Max 100 leads per request
         offset = int(request.args.get('offset', 0))
-        industry = request.args.get('industry', 'medspas')
-        min_score = int(request.args.get('min_score', 0))
-        
-        # Get leads from database with pagination
-        leads_query = Lead.query.offset(offset).limit(limit)
-        if request.args.get('source'):
-            leads_query = leads_query.filter(Lead.source == request.args.get('source'))
-        
-        leads = leads_query.all()
-        
-        if not leads:
-            return {"leads": [], "total": 0, "has_more": False}, 200
-        
-        # Prepare lead data for scoring
-        lead_data = []
-        for lead in leads:
-            lead_data.append({
+        min_score = float(request.args.get('min_score', 0))
+        business_id = current_business_id()
+
+        rows, has_more = scored_page(business_id, limit, offset, min_score, request.args.get('source'))
+        scores = [
+            {
                 'id': str(lead.id),
-                'name': lead.full_name or 'Unknown',
+                'name': " ".join(filter(None, (lead.first_name, lead.last_name))) or 'Unknown',
                 'email': lead.email or '',
                 'phone': lead.phone or '',
                 'source': lead.source or 'unknown',
-                'industry': industry,
-                'created_at': lead.created_at.isoformat() if lead.created_at else None
-            })
-        
-        # Get AI scores
-        scores = ai_scorer.bulk_score_leads(lead_data)
-        
-        # Filter by minimum score if specified
-        if min_score > 0:
-            scores = [s for s in scores if s.get('score', 0) >= min_score]
-        
-        # Check if there are more leads
-        total_leads = Lead.query.count()
-        has_more = (offset + limit) < total_leads
-        
-        log.info(f"Scored {len(scores)} leads for user {user_id}")
-        
+                'created_at': lead.created_at.isoformat() if lead.created_at else None,
+                **(score.factors or {}),
+                'ai_score': lead.score,
+                'scored_at': score.scored_at.isoformat() if score.scored_at else None,
+            }
+            for lead, score in rows
+        ]
+
         return {
             "leads": scores,
             "total": len(scores),
@@ -760,7 +901,9 @@ def lead_insights(lead_id: int):
 # ROI Dashboard
 @api_bp.get("/analytics/roi")
 @require_auth
+@require_business
 @limiter.limit("20 per minute")
+@response_cache.cached("roi", vary=("days", "industry"))
 def roi_dashboard():
     """Get comprehensive ROI analytics dashboard data"""
     if not roi_calculator:
@@ -768,7 +911,7 @@ def roi_dashboard():
         
     try:
         # Validate and sanitize parameters
-        user_id = request.args.get('user_id', 'default')
+        business_id = current_business_id()
         
         try:
             timeframe = int(request.args.get('days', 30))
@@ -781,8 +924,8 @@ def roi_dashboard():
         if industry not in ['medspas', 'contractors', 'law_firms', 'salons']:
             industry = 'medspas'
         
-        # Calculate ROI metrics
-        metrics = roi_calculator.calculate_roi_metrics(user_id, timeframe)
+        # Summed from the business's daily rollups (at most `timeframe` rows)
+        metrics = rollup_roi(business_id, timeframe)
         insights = roi_calculator.get_roi_insights(metrics, industry)
         recommendations = roi_calculator.get_growth_recommendations(metrics, industry)
         
@@ -803,7 +946,10 @@ def roi_dashboard():
                 'cost_per_lead': float(metrics.cost_per_lead),
                 'conversion_rate': float(metrics.conversion_rate),
                 'roi_percentage': float(metrics.roi_percentage),
-                'projected_monthly_revenue': float(metrics.projected_monthly_revenue)
+                'projected_monthly_revenue': float(metrics.projected_monthly_revenue),
+                'sms_sent': int(metrics.sms_sent),
+                'leads_responded': int(metrics.leads_responded),
+                'total_cost': float(metrics.total_cost)
             },
             'insights': insights,
             'recommendations': recommendations,
@@ -813,7 +959,7 @@ def roi_dashboard():
             'generated_at': datetime.utcnow().isoformat()
         }
         
-        log.info(f"Generated ROI dashboard for user {user_id}, {timeframe} days, {industry}")
+        log.info(f"Generated ROI dashboard for business {business_id}, {timeframe} days, {industry}")
         
         return response_data, 200
         
@@ -823,19 +969,21 @@ def roi_dashboard():
 
 @api_bp.get("/analytics/roi/export")
 @require_auth
+@require_business
 @limiter.limit("5 per minute")
+@response_cache.cached("roi", vary=("days", "industry"))
 def export_roi_data():
     """Export ROI data as CSV for client reporting"""
     if not roi_calculator:
         return {"error": "ROI analytics service not available"}, 503
     
     try:
-        user_id = request.args.get('user_id', 'default')
+        business_id = current_business_id()
         timeframe = int(request.args.get('days', 30))
         industry = request.args.get('industry', 'medspas')
         
         # Get metrics
-        metrics = roi_calculator.calculate_roi_metrics(user_id, timeframe)
+        metrics = rollup_roi(business_id, timeframe)
         
         # Create CSV data
         csv_data = [
@@ -852,21 +1000,14 @@ def export_roi_data():
             ["Projected Monthly Revenue", f"${metrics.projected_monthly_revenue:,.2f}"]
         ]
         
-        # Create CSV response
-        import io
+        # A dozen rows: built in memory, so the response cache can store it with an ETag
         output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerows(csv_data)
-        
-        csv_content = output.getvalue()
-        output.close()
-        
-        from flask import make_response
-        response = make_response(csv_content)
+        csv.writer(output).writerows(csv_data)
+        response = current_app.make_response(output.getvalue())
         response.headers["Content-Disposition"] = f"attachment; filename=roi-report-{timeframe}days.csv"
         response.headers["Content-Type"] = "text/csv"
         
-        log.info(f"Exported ROI data for user {user_id}")
+        log.info(f"Exported ROI data for business {business_id}")
         
         return response
         
@@ -940,6 +1081,7 @@ def start_nurture_sequence():
 
 @api_bp.get("/sequences/templates")
 @require_auth
+@response_cache.cached("templates", ttl=3600, vary=("industry",))
 def get_sequence_templates():
     """Get available nurture sequence templates by industry"""
     if not sequence_manager:
@@ -1190,6 +1332,7 @@ def send_message():
         )
         
         log.info(f"Sent {data['message_type']} message to lead {data['lead_id']}")
+        response_cache.invalidate("inbox", [tenant_id()])
         
         return {
             **result,
@@ -1222,6 +1365,7 @@ def mark_messages_read():
         result = inbox_manager.mark_as_read(message_ids)
         
         log.info(f"Marked {result['updated']} messages as read")
+        response_cache.invalidate("inbox", [tenant_id()])
         
         return {
             **result,
@@ -1234,6 +1378,7 @@ def mark_messages_read():
 
 @api_bp.get("/inbox/stats")
 @require_auth
+@response_cache.cached("inbox", ttl=30, vary=("user_id", "days"))
 def inbox_stats():
     """Get inbox statistics and KPIs"""
     if not inbox_manager:
@@ -1508,6 +1653,7 @@ def update_call_notes(call_id: str):
 # ============================================================================
 
 @api_bp.post("/stripe/webhook")
+@limiter.exempt
 def stripe_webhook():
     """
     Stripe webhook handler for subscription events
@@ -1726,6 +1872,10 @@ def complete_onboarding_step():
         
         db.session.commit()
         
+        # Inbound webhooks serve pre-rendered auto-replies
+        if step == 'enable_auto_reply' and user.business_id:
+            twiml_cache.invalidate(user.business_id)
+        
         return jsonify({
             'success': True,
             'step': step,
@@ -1768,6 +1918,7 @@ def calculate_roi():
         
         db.session.add(roi_report)
         db.session.commit()
+        response_cache.invalidate("roi_status", [business_id])
         
         return jsonify({
             'success': True,
@@ -1786,6 +1937,7 @@ def calculate_roi():
 
 
 @api_bp.route('/launch-multiplier/roi/status/<int:business_id>', methods=['GET'])
+@response_cache.cached("roi_status")
 def get_roi_status(business_id):
     """Get current ROI status and metrics for a business."""
     try:
@@ -8,6 +8,8 @@ from flask_limiter.util import get_remote_address
 from ..db import db
 from ..models import User, Business, OnboardingProgress, ActivityLog
 from ..settings import settings
+from ..number_routing import number_router
+from ..twiml_cache import twiml_cache
 from . import api
 import json
 from datetime import datetime
@@ -124,6 +126,10 @@ def complete_onboarding_step():
         
         db.session.commit()
         
+        # Inbound webhooks serve pre-rendered auto-replies
+        if step == 'enable_auto_reply' and user.business_id:
+            twiml_cache.invalidate(user.business_id)
+        
         # Get updated progress
         completed_steps = OnboardingProgress.query.filter_by(user_id=user_id).all()
         completed_count = len([s for s in completed_steps if s.completed_at])
@@ -191,6 +197,7 @@ def reset_onboarding():
         db.session.add(activity)
         
         db.session.commit()
+        twiml_cache.invalidate()
         
         return jsonify({
             'success': True,
@@ -243,6 +250,10 @@ def update_business_setup():
             
             db.session.commit()
             
+            # Inbound webhooks route by number and validate with this token
+            if {'twilio_phone_number', 'twilio_auth_token'} & set(updated_fields):
+                number_router.invalidate()
+            
             return jsonify({
                 'success': True,
                 'updated_fields': updated_fields,
@@ -1,6 +1,7 @@
 import time
 from functools import wraps
-from flask import request, jsonify
+from typing import Optional
+from flask import g, request, jsonify
 import jwt
 from .settings import settings
 
@@ -10,6 +11,74 @@ def issue_token(payload: dict, ttl=60 * 60 * 24):
     return jwt.encode(payload, settings.JWT_SECRET, algorithm='HS256')
 
 
+def current_claims() -> dict:
+    """Verified JWT claims for this request ({} if absent/invalid); decoded once per request."""
+    if 'jwt_claims' not in g:
+        claims = {}
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            try:
+                claims = jwt.decode(auth.split(' ', 1)[1], settings.JWT_SECRET, algorithms=['HS256'])
+            except Exception:
+                claims = {}
+        g.jwt_claims = claims
+    return g.jwt_claims
+
+
+def business_for(email: Optional[str]) -> Optional[int]:
+    """The business a user (by email) belongs to; None if they have no user record or business."""
+    if not email:
+        return None
+    from .db import db
+    from .models import User
+    return db.session.execute(
+        db.select(User.business_id).where(User.email == email.strip().lower())
+    ).scalar()
+
+
+def user_claims(email: str) -> dict:
+    """Token claims for a user: sub/email and plan, plus business_id when they belong to one.
+
+    plan is the subscribed plan while the subscription is active, else 'trial';
+    the rate limiter reads it so quotas need no per-request lookup.
+    """
+    from .db import db
+    from .models import User
+    claims = {'sub': email, 'email': email, 'plan': 'trial'}
+    user = db.session.execute(
+        db.select(User.business_id, User.plan, User.subscription_status)
+        .where(User.email == email.strip().lower())
+    ).first()
+    if user is None:
+        return claims
+    if user.business_id is not None:
+        claims['business_id'] = user.business_id
+    if user.subscription_status == 'active' and user.plan:
+        claims['plan'] = user.plan
+    return claims
+
+
+def current_business_id() -> Optional[int]:
+    """The authenticated caller's business: the token's business_id claim, else their user record's."""
+    if 'caller_business_id' not in g:
+        claims = current_claims()
+        business_id = claims.get('business_id')
+        if business_id is None:
+            business_id = business_for(claims.get('email') or claims.get('sub'))
+        g.caller_business_id = int(business_id) if business_id is not None else None
+    return g.caller_business_id
+
+
+def _requested_business_id():
+    """business_id the client asked for (query string, else JSON body); None if it named none."""
+    requested = request.args.get('business_id')
+    if requested is None and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            requested = body.get('business_id')
+    return requested
+
+
 def require_auth(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -24,3 +93,19 @@ def require_auth(fn):
         return fn(*args, **kwargs)
 
     return wrapper
+
+
+def require_business(fn):
+    """Resolve the caller's business (current_business_id()) for the view; 403 if they have
+    none, or if the request names a business_id that isn't theirs. Use after require_auth."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        business_id = current_business_id()
+        if business_id is None:
+            return jsonify({'error': 'no business for this user'}), 403
+        requested = _requested_business_id()
+        if requested is not None and str(requested).strip() != str(business_id):
+            return jsonify({'error': 'forbidden'}), 403
+        return fn(*args, **kwargs)
+
+    return wrapper
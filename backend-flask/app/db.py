@@ -1,10 +1,134 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.pool import QueuePool
 from .settings import settings
+import logging
 import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+
+class PoolMetrics:
+    """Per-process connection pool counters (checkout waits, checkouts, overflow)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.slow_waits = 0
+        self.overflow_peak = 0
+
+    def record_checkout(self, wait_ms: float, overflow: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            self.overflow_peak = max(self.overflow_peak, overflow)
+            if wait_ms >= settings.DB_POOL_SLOW_WAIT_MS:
+                self.slow_waits += 1
+        if wait_ms >= settings.DB_POOL_SLOW_WAIT_MS:
+            log.warning("DB pool checkout waited %.0fms (overflow=%s)", wait_ms, overflow)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 2),
+                "slow_waits": self.slow_waits,
+                "overflow_peak": self.overflow_peak,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+# Per thread: whether a checkout is being timed, and how long it spent opening new connections
+_checkout = threading.local()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times how long each checkout waits for a connection.
+    Opening a new one (TCP, TLS, auth) when the pool grows isn't waiting and is
+    left out, so slow_waits only counts an exhausted pool.
+    """
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            if getattr(_checkout, "timing", False):
+                _checkout.connect_ms += (time.perf_counter() - start) * 1000
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; time the outermost call only
+        if getattr(_checkout, "timing", False):
+            return super()._do_get()
+        _checkout.timing, _checkout.connect_ms = True, 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _checkout.timing = False
+            wait_ms = (time.perf_counter() - start) * 1000 - _checkout.connect_ms
+            pool_metrics.record_checkout(max(wait_ms, 0.0), max(self.overflow(), 0))
+
+
+def engine_options(uri: str) -> dict:
+    """Pool sizing/health options from settings; SQLite keeps SQLAlchemy's defaults."""
+    if uri.startswith("sqlite"):
+        return {}
+
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        # Recycle before Render's Postgres drops idle connections
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if uri.startswith("postgresql") and settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def conflict_insert(table):
+    """Dialect insert() supporting ON CONFLICT (Postgres, SQLite), or None on other backends."""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(table)
+
+
+def pool_stats() -> dict:
+    """Live pool state plus checkout wait counters; call inside an app context."""
+    pool = db.engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats["max_overflow"] = settings.DB_MAX_OVERFLOW
+    stats.update(pool_metrics.snapshot())
+    return stats
+
+
 def init_db(app):
     # Belt & suspenders: compute URI with multiple fallbacks
     uri = (
@@ -15,5 +139,6 @@ def init_db(app):
     )
     app.config["SQLALCHEMY_DATABASE_URI"] = uri
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(uri)
     db.init_app(app)
     Migrate(app, db)
@@ -0,0 +1,142 @@
+"""
+Redis stream buffers for high-volume webhook events.
+
+Webhooks append an event with XADD and return immediately. A consumer
+(stream_worker.py) reads through a consumer group in batches and hands each
+batch to a handler that persists it in one transaction. Entries are acked only
+after the handler succeeds, so a crash or DB outage replays the batch once
+another read reclaims it; handlers must be idempotent.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from redis.exceptions import ResponseError
+
+from .redis_pool import get_redis
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[List[Dict[str, str]]], Any]
+
+
+def _decode(fields: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode(): v.decode() for k, v in fields.items()}
+
+
+class EventStream:
+    """One Redis stream plus the consumer group that persists it."""
+
+    def __init__(self, key: str, group: str = "persist"):
+        self.key = key
+        self.group = group
+        self.dead_key = f"{key}:dead"
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    def publish(self, event: Dict[str, Any]) -> str:
+        """Append one event; values must be str/int/float/bytes."""
+        fields = {k: ("" if v is None else v) for k, v in event.items()}
+        return self.redis.xadd(self.key, fields, maxlen=settings.EVENT_STREAM_MAXLEN, approximate=True)
+
+    def ensure_group(self) -> None:
+        try:
+            self.redis.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_batch(self, consumer: str, count: int, block_ms: int) -> List[Tuple[bytes, Dict[str, str]]]:
+        """
+        Entries left pending by a failed or dead consumer come first (after
+        EVENT_STREAM_RECLAIM_MS idle), then new entries, waiting up to block_ms.
+        """
+        _, entries, *_ = self.redis.xautoclaim(
+            self.key, self.group, consumer,
+            min_idle_time=settings.EVENT_STREAM_RECLAIM_MS, start_id="0-0", count=count,
+        )
+        if not entries:
+            resp = self.redis.xreadgroup(self.group, consumer, {self.key: ">"}, count=count, block=block_ms)
+            entries = resp[0][1] if resp else []
+        return [(entry_id, _decode(fields)) for entry_id, fields in entries if fields]
+
+    def ack(self, ids: List[bytes]) -> None:
+        if ids:
+            self.redis.xack(self.key, self.group, *ids)
+
+    def exhausted(self, ids: List[bytes]) -> set:
+        """Ids among `ids` delivered at least EVENT_STREAM_MAX_DELIVERIES times."""
+        pending = self.redis.xpending_range(self.key, self.group, min=min(ids), max=max(ids), count=len(ids) * 2)
+        wanted = set(ids)
+        return {
+            p["message_id"] for p in pending
+            if p["message_id"] in wanted and p["times_delivered"] >= settings.EVENT_STREAM_MAX_DELIVERIES
+        }
+
+    def dead_letter(self, event: Dict[str, str], error: str) -> None:
+        self.redis.xadd(self.dead_key, {**event, "error": error[:500]},
+                        maxlen=settings.EVENT_STREAM_MAXLEN, approximate=True)
+
+
+def handle_batch(stream: EventStream, batch: List[Tuple[bytes, Dict[str, str]]], handler: Handler) -> bool:
+    """
+    Run handler over a batch and ack it. If the batch fails, retry events one at
+    a time so a single bad event can't wedge the stream: failures are moved to
+    the dead-letter stream. If every event fails (e.g. the database is down)
+    nothing is acked and the batch is retried later, except events that have
+    already used up EVENT_STREAM_MAX_DELIVERIES attempts.
+    Returns True if the whole batch was acked.
+    """
+    from .db import db
+
+    ids = [entry_id for entry_id, _ in batch]
+    try:
+        handler([event for _, event in batch])
+    except Exception:
+        db.session.rollback()
+        log.exception("Batch of %d events from %s failed; retrying individually", len(batch), stream.key)
+    else:
+        stream.ack(ids)
+        return True
+
+    failed = []
+    for entry_id, event in batch:
+        try:
+            handler([event])
+        except Exception as e:
+            db.session.rollback()
+            failed.append((entry_id, event, repr(e)))
+
+    if len(failed) == len(batch):
+        exhausted = stream.exhausted(ids)
+        failed = [f for f in failed if f[0] in exhausted]
+        ids = [f[0] for f in failed]
+    for _, event, error in failed:
+        log.error("Dead-lettering event from %s: %s", stream.key, error)
+        stream.dead_letter(event, error)
+    stream.ack(ids)
+    return len(ids) == len(batch)
+
+
+def run_consumer(app, stream: EventStream, handler: Handler, consumer: str, stop: threading.Event) -> None:
+    """Read, persist and ack batches until `stop` is set."""
+    stream.ensure_group()
+    backoff = 0.0
+    while not stop.is_set():
+        try:
+            batch = stream.read_batch(consumer, settings.EVENT_STREAM_BATCH_SIZE, settings.EVENT_STREAM_BLOCK_MS)
+            if not batch:
+                continue
+            with app.app_context():
+                ok = handle_batch(stream, batch, handler)
+        except Exception:
+            log.exception("Consumer %s on %s failed", consumer, stream.key)
+            ok = False
+
+        backoff = 0.0 if ok else min(max(backoff * 2, 0.5), 30.0)
+        if backoff:
+            stop.wait(backoff)
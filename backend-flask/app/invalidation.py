@@ -0,0 +1,74 @@
+"""
+Cross-process cache invalidation over Redis pub/sub.
+
+In-process caches register a callback per channel with on(). One daemon thread
+per process (started lazily by ensure_listening(), so it is created after
+gunicorn forks) delivers published messages to those callbacks. After a
+(re)connect, every callback receives None, because anything published while the
+thread was disconnected is unknown.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from .redis_pool import get_blocking_redis, get_redis
+
+log = logging.getLogger(__name__)
+
+Callback = Callable[[Optional[str]], None]
+
+_callbacks: Dict[str, List[Callback]] = {}
+_listener: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def on(channel: str, callback: Callback) -> None:
+    with _lock:
+        _callbacks.setdefault(channel, []).append(callback)
+
+
+def publish(channel: str, message: str = "*") -> bool:
+    """Broadcast to every process; False if Redis was unreachable."""
+    try:
+        get_redis().publish(channel, message)
+        return True
+    except RedisError:
+        log.warning("Could not publish invalidation on %s", channel)
+        return False
+
+
+def ensure_listening() -> None:
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name="cache-invalidation", daemon=True)
+            _listener.start()
+
+
+def _dispatch(channel: str, message: Optional[str]) -> None:
+    for callback in list(_callbacks.get(channel, [])):
+        try:
+            callback(message)
+        except Exception:
+            log.exception("Invalidation callback for %s failed", channel)
+
+
+def _listen() -> None:
+    while True:
+        try:
+            pubsub = get_blocking_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*_callbacks)
+            for channel in list(_callbacks):
+                _dispatch(channel, None)
+            for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _dispatch(message["channel"].decode(), message["data"].decode())
+        except RedisError:
+            log.warning("Invalidation listener disconnected; retrying")
+            time.sleep(5)
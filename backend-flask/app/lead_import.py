@@ -0,0 +1,444 @@
+"""
+Bulk lead upsert engine shared by /api/leads/bulk and the RQ import job.
+
+Uploads are spooled to disk and parsed incrementally, so web and worker memory
+stays flat regardless of file size. Uploads handed to the worker are stashed in
+Redis as a list of blocks (stash_spool / fetch_spool), since the web and worker
+services don't share a disk. Rows are processed in chunks. Each chunk is
+deduplicated in memory on the normalized phone/email keys (see lead_keys),
+existing leads are resolved with one indexed IN (...) probe per key, and writes
+go out as batched statements per chunk instead of one round-trip per row. New
+rows are inserted with ON CONFLICT on the tenant key constraints, so a lead
+written concurrently by another partition or request is merged, not duplicated;
+a chunk that still collides with a concurrent write (on the key that was not
+its conflict target) is retried once against the now-committed leads.
+"""
+
+import csv
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime
+from itertools import islice
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from .db import conflict_insert, db
+from .lead_keys import email_key, phone_key
+from .models import Lead
+from .redis_pool import get_redis
+from .settings import settings
+
+CHUNK_SIZE = 500
+SPOOL_BLOCK_SIZE = 64 * 1024
+# Spool blocks moved per Redis round-trip when stashing/fetching an upload
+STASH_BATCH_BLOCKS = 16
+STASH_KEY_PREFIX = "leadnest:import-spool:"
+
+# Columns a bulk row may set on a lead
+UPSERT_COLUMNS = ("first_name", "last_name", "email", "phone", "source", "status", "phone_key", "email_key")
+
+
+def spool_upload(stream: IO[bytes]) -> Tuple[str, int]:
+    """
+    Copy an upload stream to the spool directory block by block.
+    Returns (path, estimated row count) without ever holding the file in memory.
+    """
+    os.makedirs(settings.IMPORT_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_SPOOL_DIR, f"import-{uuid.uuid4().hex}.csv")
+
+    newlines = 0
+    last = b""
+    with open(path, "wb") as out:
+        while True:
+            block = stream.read(SPOOL_BLOCK_SIZE)
+            if not block:
+                break
+            out.write(block)
+            newlines += block.count(b"\n")
+            last = block[-1:]
+
+    # Header line doesn't count; a missing trailing newline still ends a row
+    lines = newlines + (1 if last and last != b"\n" else 0)
+    return path, max(lines - 1, 0)
+
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield CSV rows from a spooled file one at a time."""
+    with open(path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+        yield from csv.DictReader(f)
+
+
+def partition_key(row: Dict[str, Any]) -> str:
+    """Stable partition key for a raw row: normalized phone, else email."""
+    data = normalize_row(row)
+    if not data:
+        return ""
+    return data["phone_key"] or data["email_key"] or ""
+
+
+def partition_spool(path: str, partitions: int) -> List[Tuple[str, int]]:
+    """
+    Split a spooled CSV into `partitions` files by a stable hash of each row's
+    partition key, streaming row by row. Rows for the same phone (or email, when
+    there is no phone) always land in the same partition. Phone collisions can
+    therefore only happen within a partition, where chunks run one after
+    another; rows sharing just an email may be split, and concurrent inserts
+    of that email are merged by its ON CONFLICT target. Returns (path, row
+    count) pairs; empty partitions are dropped.
+    """
+    base, _ = os.path.splitext(path)
+    paths = [f"{base}.part{i}.csv" for i in range(partitions)]
+    files = [open(p, "w", newline="", encoding="utf-8") for p in paths]
+    counts = [0] * partitions
+    try:
+        with open(path, newline="", encoding="utf-8-sig", errors="ignore") as f:
+            reader = csv.DictReader(f)
+            writers = [csv.DictWriter(out, fieldnames=reader.fieldnames or [], extrasaction="ignore") for out in files]
+            for w in writers:
+                w.writeheader()
+            for row in reader:
+                # crc32 rather than hash(): must agree across processes
+                i = zlib.crc32(partition_key(row).encode("utf-8")) % partitions
+                writers[i].writerow(row)
+                counts[i] += 1
+    finally:
+        for out in files:
+            out.close()
+
+    kept = []
+    for p, n in zip(paths, counts):
+        if n:
+            kept.append((p, n))
+        else:
+            discard_spool(p)
+    return kept
+
+
+def discard_spool(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def stash_spool(path: str) -> str:
+    """
+    Copy a spooled file into Redis as a list of blocks, expiring after
+    IMPORT_SPOOL_TTL_SECONDS, so a worker on another host can read it.
+    Returns the key to hand to the job.
+    """
+    redis = get_redis()
+    key = f"{STASH_KEY_PREFIX}{uuid.uuid4().hex}"
+    try:
+        with open(path, "rb") as f:
+            while True:
+                blocks = list(islice(iter(lambda: f.read(SPOOL_BLOCK_SIZE), b""), STASH_BATCH_BLOCKS))
+                if not blocks:
+                    break
+                pipe = redis.pipeline(transaction=False)
+                pipe.rpush(key, *blocks)
+                pipe.expire(key, settings.IMPORT_SPOOL_TTL_SECONDS)
+                pipe.execute()
+    except BaseException:
+        discard_stash(key)
+        raise
+    return key
+
+
+def fetch_spool(key: str) -> str:
+    """
+    Copy a stashed upload back to a local spool file block by block.
+    Returns its path; raises LookupError if the stash expired or was consumed.
+    """
+    os.makedirs(settings.IMPORT_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_SPOOL_DIR, f"import-{uuid.uuid4().hex}.csv")
+    redis = get_redis()
+    fetched = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                blocks = redis.lrange(key, fetched, fetched + STASH_BATCH_BLOCKS - 1)
+                if not blocks:
+                    break
+                out.writelines(blocks)
+                fetched += len(blocks)
+    except BaseException:
+        discard_spool(path)
+        raise
+    if not fetched:
+        discard_spool(path)
+        raise LookupError(f"Import upload {key} has expired or was already imported")
+    return path
+
+
+def discard_stash(key: str) -> None:
+    try:
+        get_redis().delete(key)
+    except RedisError:
+        # Expires on its own
+        pass
+
+
+def normalize_row(row: Optional[Dict[str, Any]], default_source: str = "bulk") -> Optional[Dict[str, Any]]:
+    """Map a CSV/JSON row onto Lead columns. Returns None for rows without identity."""
+    if not row:
+        return None
+
+    first_name = (row.get("first_name") or "").strip() or None
+    last_name = (row.get("last_name") or "").strip() or None
+    full_name = (row.get("full_name") or "").strip()
+    if full_name and not (first_name or last_name):
+        parts = full_name.split(None, 1)
+        first_name = parts[0]
+        last_name = parts[1] if len(parts) > 1 else None
+
+    data = {
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": (row.get("email") or "").strip().lower() or None,
+        "phone": (row.get("phone") or "").strip() or None,
+        "source": (row.get("source") or default_source).strip() or default_source,
+        "status": (row.get("status") or "new").strip() or "new",
+    }
+    if not any([data["first_name"], data["last_name"], data["email"], data["phone"]]):
+        return None
+    data["phone_key"] = phone_key(data["phone"])
+    data["email_key"] = email_key(data["email"])
+    return data
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    for k, v in data.items():
+        if v is not None:
+            target[k] = v
+
+
+def _dedup_chunk(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse rows for the same lead into one row per lead, field by field: a
+    later non-empty value replaces an earlier one, an empty one never does.
+    Rows match on email key, else phone key. A row whose phone is already on a
+    row with a different email stays its own lead without the phone, as
+    _resolve_existing does for a number that belongs to another lead.
+    """
+    unique: List[Dict[str, Any]] = []
+    by_email: Dict[str, Dict[str, Any]] = {}
+    by_phone: Dict[str, Dict[str, Any]] = {}
+
+    for data in rows:
+        target = None
+        if data["email_key"]:
+            target = by_email.get(data["email_key"])
+        if target is None and data["phone_key"]:
+            target = by_phone.get(data["phone_key"])
+            if target is not None and target["email_key"] and data["email_key"]:
+                data = {**data, "phone": None, "phone_key": None}
+                target = None
+
+        if target is None:
+            target = dict(data)
+            unique.append(target)
+        else:
+            _merge(target, data)
+
+        if target["email_key"]:
+            by_email.setdefault(target["email_key"], target)
+        if target["phone_key"]:
+            by_phone.setdefault(target["phone_key"], target)
+
+    return unique
+
+
+def _resolve_existing(rows: List[Dict[str, Any]], business_id: int) -> Dict[int, List[Dict[str, Any]]]:
+    """Match rows to existing leads with one unique-index IN (...) probe per key."""
+    email_keys = {r["email_key"] for r in rows if r["email_key"]}
+    phone_keys = {r["phone_key"] for r in rows if r["phone_key"]}
+
+    email_ids: Dict[str, int] = {}
+    phone_ids: Dict[str, int] = {}
+    if email_keys:
+        email_ids = dict(
+            db.session.query(Lead.email_key, Lead.id)
+            .filter(Lead.business_id == business_id, Lead.email_key.in_(email_keys))
+            .all()
+        )
+    if phone_keys:
+        phone_ids = dict(
+            db.session.query(Lead.phone_key, Lead.id)
+            .filter(Lead.business_id == business_id, Lead.phone_key.in_(phone_keys))
+            .all()
+        )
+
+    matches: Dict[int, List[Dict[str, Any]]] = {}
+    for r in rows:
+        lead_id = email_ids.get(r["email_key"]) if r["email_key"] else None
+        phone_owner = phone_ids.get(r["phone_key"]) if r["phone_key"] else None
+        if lead_id is None:
+            lead_id = phone_owner
+        elif phone_owner is not None and phone_owner != lead_id:
+            # The number already belongs to another lead; leave it there
+            r["phone"] = r["phone_key"] = None
+        if lead_id is not None:
+            matches.setdefault(lead_id, []).append(r)
+    return matches
+
+
+def _write_updates(matches: Dict[int, List[Dict[str, Any]]], business_id: int, now: datetime) -> None:
+    """
+    Apply non-null fields to existing leads in one statement.
+    Postgres gets a multi-row INSERT ... ON CONFLICT (id) DO UPDATE; other
+    dialects (SQLite in dev) get an executemany UPDATE keyed by id.
+    """
+    merged = []
+    for lead_id, rows in matches.items():
+        values: Dict[str, Any] = {}
+        for r in rows:
+            _merge(values, r)
+        merged.append((lead_id, {c: values.get(c) for c in UPSERT_COLUMNS}))
+
+    leads = Lead.__table__
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(leads).values([
+            {"id": lead_id, "business_id": business_id, "updated_at": now, **values}
+            for lead_id, values in merged
+        ])
+        db.session.execute(stmt.on_conflict_do_update(index_elements=[leads.c.id], set_=_merge_excluded(stmt)))
+        return
+
+    stmt = update(leads).where(leads.c.id == bindparam("b_id")).values(
+        updated_at=bindparam("b_updated_at"),
+        **{c: func.coalesce(bindparam(f"b_{c}"), leads.c[c]) for c in UPSERT_COLUMNS},
+    )
+    db.session.execute(stmt, [
+        {"b_id": lead_id, "b_updated_at": now, **{f"b_{c}": v for c, v in values.items()}}
+        for lead_id, values in merged
+    ])
+
+
+def _merge_excluded(stmt) -> Dict[str, Any]:
+    """ON CONFLICT DO UPDATE set clause: take incoming non-null fields, keep the rest."""
+    leads = Lead.__table__
+    return {
+        "updated_at": stmt.excluded.updated_at,
+        **{c: func.coalesce(stmt.excluded[c], leads.c[c]) for c in UPSERT_COLUMNS},
+    }
+
+
+def _write_inserts(rows: List[Dict[str, Any]], business_id: int, now: datetime) -> None:
+    """
+    Insert new leads, batched per conflict target. Rows with an email key
+    arbitrate on (business_id, email_key), phone-only rows on
+    (business_id, phone_key); rows with neither key are plain inserts.
+    """
+    params = [
+        {"business_id": business_id, "created_at": now, "updated_at": now,
+         **{c: r.get(c) for c in UPSERT_COLUMNS}}
+        for r in rows
+    ]
+    by_email = [p for p in params if p["email_key"]]
+    by_phone = [p for p in params if not p["email_key"] and p["phone_key"]]
+    keyless = [p for p in params if not p["email_key"] and not p["phone_key"]]
+
+    base = conflict_insert(Lead.__table__)
+    if base is None:
+        db.session.execute(insert(Lead.__table__), params)
+        return
+
+    for key, batch in (("email_key", by_email), ("phone_key", by_phone)):
+        if batch:
+            stmt = base.on_conflict_do_update(index_elements=["business_id", key], set_=_merge_excluded(base))
+            db.session.execute(stmt, batch)
+    if keyless:
+        db.session.execute(insert(Lead.__table__), keyless)
+
+
+def _upsert_chunk(normalized: List[Dict[str, Any]], business_id: int) -> Tuple[int, int]:
+    """Write one chunk and commit. Returns (leads created, rows collapsed into another row of the chunk)."""
+    unique = _dedup_chunk(normalized)
+    now = datetime.utcnow()
+    matches = _resolve_existing(unique, business_id)
+    matched = {id(r) for rs in matches.values() for r in rs}
+    new_rows = [r for r in unique if id(r) not in matched]
+
+    if matches:
+        _write_updates(matches, business_id, now)
+    if new_rows:
+        _write_inserts(new_rows, business_id, now)
+    db.session.commit()
+    return len(new_rows), len(normalized) - len(unique)
+
+
+def upsert_leads(
+    rows: Iterable[Optional[Dict[str, Any]]],
+    business_id: int = 1,
+    default_source: str = "bulk",
+    label: str = "Row",
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Upsert raw lead rows in chunks and commit once per chunk.
+    `None` entries are counted but skipped (e.g. rows that failed validation upstream).
+    `on_chunk`, if given, receives running totals and the chunk's write/commit
+    latency after every chunk.
+    Returns {"created", "updated", "duplicates", "errors", "total_rows"}, where
+    duplicates are rows merged into another row for the same lead in their chunk.
+    """
+    created = updated = duplicates = total = 0
+    errors: List[str] = []
+
+    for chunk in _chunked(rows, chunk_size):
+        start = total + 1
+        total += len(chunk)
+
+        normalized = []
+        for idx, row in enumerate(chunk, start=start):
+            try:
+                data = normalize_row(row, default_source)
+            except Exception as e:
+                errors.append(f"{label} {idx}: {e}")
+                continue
+            if data:
+                normalized.append(data)
+
+        commit_ms = 0.0
+        if normalized:
+            t0 = time.perf_counter()
+            try:
+                try:
+                    n_created, n_duplicates = _upsert_chunk(normalized, business_id)
+                except IntegrityError:
+                    # Another partition or request committed one of these leads after
+                    # they were resolved; resolving again routes them to the update path
+                    db.session.rollback()
+                    n_created, n_duplicates = _upsert_chunk(normalized, business_id)
+            except Exception as e:
+                db.session.rollback()
+                errors.append(f"{label}s {start}-{total}: {e}")
+            else:
+                created += n_created
+                duplicates += n_duplicates
+                updated += len(normalized) - n_created - n_duplicates
+            commit_ms = (time.perf_counter() - t0) * 1000
+
+        if on_chunk is not None:
+            on_chunk({"rows_processed": total, "created": created, "updated": updated,
+                      "duplicates": duplicates, "errors": len(errors), "commit_ms": commit_ms})
+
+    return {"created": created, "updated": updated, "duplicates": duplicates, "errors": errors,
+            "total_rows": total}
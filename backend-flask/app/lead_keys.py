@@ -0,0 +1,69 @@
+"""
+Canonical dedup keys for leads.
+
+Every write path stores Lead.phone_key / Lead.email_key through these helpers,
+so "+15551234567", "(555) 123-4567" and "555-123-4567" collide on one unique
+(business_id, phone_key) entry instead of creating three leads.
+"""
+
+import re
+from typing import Optional
+
+from .settings import settings
+
+_NON_DIGITS = re.compile(r"\D")
+
+# Mailbox providers that ignore dots and "+tag" suffixes in the local part
+_DOTLESS_DOMAINS = {"gmail.com": "gmail.com", "googlemail.com": "gmail.com"}
+
+
+def phone_key(raw: Optional[str]) -> Optional[str]:
+    """
+    E.164 form of a phone number, or None if it can't be normalized.
+    Numbers without a country code get settings.DEFAULT_PHONE_COUNTRY_CODE.
+    """
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return None
+
+    if raw.startswith("+"):
+        pass
+    elif raw.startswith("00"):
+        digits = digits[2:]
+    else:
+        cc = settings.DEFAULT_PHONE_COUNTRY_CODE
+        if cc == "1":
+            # NANP: 10-digit national number, optionally with the leading 1
+            if len(digits) == 10:
+                digits = "1" + digits
+            elif not (len(digits) == 11 and digits.startswith("1")):
+                return None
+        else:
+            # Drop the national trunk prefix (e.g. 07700... -> 447700...)
+            digits = cc + digits.lstrip("0")
+
+    # E.164 allows at most 15 digits; anything under 8 is not a dialable number
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def email_key(raw: Optional[str]) -> Optional[str]:
+    """Lowercased, trimmed address; Gmail dots and +tags are folded away."""
+    if not raw:
+        return None
+    email = raw.strip().lower()
+    if email.startswith("mailto:"):
+        email = email[len("mailto:"):]
+    local, sep, domain = email.rpartition("@")
+    if not sep or not local or not domain:
+        return None
+
+    canonical = _DOTLESS_DOMAINS.get(domain)
+    if canonical:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = canonical
+    return f"{local}@{domain}"
@@ -0,0 +1,209 @@
+"""
+Persisted AI lead scores.
+
+Scores are computed off the request path (tasks.rescore_leads) and stored on
+AIScoring (the full score_lead result) and Lead.score (for sorting/filtering),
+so /ai/score-leads is an indexed read. Each stored score records a fingerprint
+of the scorer config, the business's AIScoringConfig and the lead fields it was
+computed from, plus the recency multiplier applied; a lead is rescored only
+when one of those has changed.
+
+A business's AIScoringConfig is compiled once into an immutable ScoringProfile
+and kept in an LRU cache keyed by (business, config updated_at), so an edited
+config is picked up on the next batch and scoring never reads it per lead.
+
+The multiplier only changes at fixed lead ages, so each score also records
+when its lead next crosses one (next_rescore_at). tasks.rescore_due rescores
+just the leads whose time has passed, instead of every lead, to keep scores
+fresh as leads age.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, insert, select, tuple_, update
+
+from services.ai_lead_scorer import AILeadScorer, ScoringProfile
+
+from .db import conflict_insert, db
+from .models import AIScoring, AIScoringConfig, Lead
+
+log = logging.getLogger(__name__)
+
+scorer = AILeadScorer()
+
+# score_lead priority -> AIScoring.priority
+PRIORITY_LABELS = {1: "high", 2: "medium", 3: "low"}
+
+_CONFIG_COLUMNS = ("recency_weight", "source_weight", "engagement_weight", "profile_completeness_weight",
+                   "high_value_sources", "peak_contact_hours")
+
+
+def lead_inputs(row) -> Dict:
+    """score_lead input for a lead row."""
+    return {
+        "company_name": row.company or "",
+        "contact_name": " ".join(filter(None, (row.first_name, row.last_name))),
+        "email": row.email or "",
+        "phone": row.phone or "",
+        "notes": row.notes or "",
+        "source": row.source or "",
+        # Stored as naive UTC; the scorer only ages timezone-aware timestamps
+        "created_at": row.created_at.replace(tzinfo=timezone.utc) if row.created_at else "",
+    }
+
+
+@lru_cache(maxsize=1024)
+def _compiled_profile(business_id: int, updated_at: Optional[datetime]) -> ScoringProfile:
+    configs = AIScoringConfig.__table__
+    row = db.session.execute(
+        select(*(configs.c[c] for c in _CONFIG_COLUMNS)).where(configs.c.business_id == business_id)
+    ).first()
+    return scorer.compile_profile(dict(row._mapping) if row else None)
+
+
+def profiles_for(business_ids: Iterable[int]) -> Dict[int, ScoringProfile]:
+    """business id -> its scoring profile: one query for the config versions, compiled ones come from the cache."""
+    business_ids = set(business_ids)
+    configs = AIScoringConfig.__table__
+    versions = dict(db.session.execute(
+        select(configs.c.business_id, configs.c.updated_at).where(configs.c.business_id.in_(business_ids))
+    ).all())
+    default = scorer.default_profile()
+    return {b: _compiled_profile(b, versions[b]) if b in versions else default for b in business_ids}
+
+
+def fingerprint(profile_fingerprint: str, inputs: Dict) -> str:
+    payload = json.dumps([profile_fingerprint, inputs], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def scoring_rows():
+    """Lead scoring inputs joined with the stored score state; add filters and ordering."""
+    leads, scores = Lead.__table__, AIScoring.__table__
+    return (
+        select(leads.c.id, leads.c.business_id, leads.c.company, leads.c.first_name, leads.c.last_name,
+               leads.c.email, leads.c.phone, leads.c.notes, leads.c.source, leads.c.created_at,
+               scores.c.id.label("score_id"), scores.c.fingerprint, scores.c.recency)
+        .select_from(leads.outerjoin(
+            scores, and_(scores.c.lead_id == leads.c.id, scores.c.business_id == leads.c.business_id)
+        ))
+    )
+
+
+def rescore_batch(rows: List, now: Optional[datetime] = None) -> int:
+    """
+    Rescore the rows (from scoring_rows()) whose fingerprint or recency
+    multiplier changed and write them set-wise; the caller commits.
+    Returns the number of leads rescored.
+    """
+    now = now or datetime.now(timezone.utc)
+    profiles = profiles_for(r.business_id for r in rows)
+
+    stale = []
+    for r in rows:
+        inputs = lead_inputs(r)
+        fp = fingerprint(profiles[r.business_id].fingerprint, inputs)
+        recency = scorer.recency_multiplier(inputs["created_at"], now)
+        if r.score_id is None or fp != r.fingerprint or recency != r.recency:
+            stale.append((r, inputs, fp, recency))
+    if not stale:
+        return 0
+
+    # Each business's leads are scored as one batch with its profile
+    by_business: Dict[int, List] = {}
+    for item in stale:
+        by_business.setdefault(item[0].business_id, []).append(item)
+    scored = []
+    for business_id, items in by_business.items():
+        results = scorer.score_leads_batch([inputs for _, inputs, _, _ in items], now=now,
+                                           profile=profiles[business_id])
+        scored.extend(zip(items, results))
+    scored_at = now.replace(tzinfo=None)
+
+    def next_rescore_at(inputs):
+        when = scorer.next_recency_change(inputs["created_at"], now)
+        return when.astimezone(timezone.utc).replace(tzinfo=None) if when else None
+
+    values = [
+        {
+            "b_lead_id": r.id, "b_score_id": r.score_id, "business_id": r.business_id,
+            "score": res["ai_score"], "factors": res, "priority": PRIORITY_LABELS.get(res["priority"]),
+            "recommended_action": (res.get("recommended_action") or "")[:100],
+            "fingerprint": fp, "recency": recency, "scored_at": scored_at,
+            "next_rescore_at": next_rescore_at(inputs), "best_contact_time": res.get("best_contact_time"),
+        }
+        for (r, inputs, fp, recency), res in scored
+    ]
+
+    scores = AIScoring.__table__
+    changed = {"score", "factors", "priority", "recommended_action", "fingerprint", "recency", "scored_at",
+               "next_rescore_at", "best_contact_time"}
+    existing = [v for v in values if v["b_score_id"] is not None]
+    if existing:
+        db.session.execute(
+            update(scores).where(scores.c.id == bindparam("b_score_id"))
+            .values(**{c: bindparam(c) for c in changed}, updated_at=scored_at),
+            [{k: v[k] for k in changed | {"b_score_id"}} for v in existing],
+        )
+    new = [
+        {"business_id": v["business_id"], "lead_id": v["b_lead_id"], "created_at": scored_at,
+         "updated_at": scored_at, **{c: v[c] for c in changed}}
+        for v in values if v["b_score_id"] is None
+    ]
+    if new:
+        base = conflict_insert(scores)
+        if base is not None:
+            # Another rescore may have inserted it meanwhile; its next run reconciles
+            db.session.execute(base.on_conflict_do_nothing(index_elements=["business_id", "lead_id"]), new)
+        else:
+            db.session.execute(insert(scores), new)
+
+    leads = Lead.__table__
+    db.session.execute(
+        # A rescore isn't an edit: keep updated_at
+        update(leads).where(leads.c.id == bindparam("b_lead_id"))
+        .values(score=bindparam("score"), updated_at=leads.c.updated_at),
+        [{"b_lead_id": v["b_lead_id"], "score": v["score"]} for v in values],
+    )
+    return len(values)
+
+
+def due_rows(now: datetime, after: Optional[Tuple[datetime, int]] = None):
+    """scoring_rows() for leads whose recency boundary passed before now, in (next_rescore_at, id) order."""
+    scores = AIScoring.__table__
+    query = scoring_rows().add_columns(scores.c.next_rescore_at).where(
+        scores.c.next_rescore_at < now.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+    if after is not None:
+        query = query.where(tuple_(scores.c.next_rescore_at, scores.c.id) > after)
+    return query.order_by(scores.c.next_rescore_at, scores.c.id)
+
+
+def next_rescore_due() -> Optional[datetime]:
+    """Earliest upcoming recency boundary (naive UTC), or None."""
+    scores = AIScoring.__table__
+    return db.session.scalar(select(func.min(scores.c.next_rescore_at)))
+
+
+def scored_page(business_id: int, limit: int, offset: int = 0, min_score: float = 0,
+                source: Optional[str] = None) -> Tuple[List[Tuple[Lead, AIScoring]], bool]:
+    """
+    One page of scored leads, highest score first (ix_leads_business_score_id).
+    Returns ([(lead, score)], has_more); leads not scored yet are left out.
+    """
+    q = (
+        db.session.query(Lead, AIScoring)
+        .join(AIScoring, and_(AIScoring.lead_id == Lead.id, AIScoring.business_id == Lead.business_id))
+        .filter(Lead.business_id == business_id, Lead.score.isnot(None))
+    )
+    if min_score:
+        q = q.filter(Lead.score >= min_score)
+    if source:
+        q = q.filter(Lead.source == source)
+    rows = q.order_by(Lead.score.desc(), Lead.id.desc()).offset(offset).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,298 @@
+"""
+Daily per-business ROI rollups.
+
+DailyMetrics holds one row per business per UTC day with the counts from
+roi_metrics.activity_counts, already valued (revenue includes closed deals
+without a recorded amount at the business's average deal size; cost is leads
+at its cost per lead). A 7/30/90/365-day ROI window is a sum over at most that
+many rows (rollup_roi) instead of aggregates over every lead, booking and
+message in the period.
+
+refresh_daily_metrics keeps the rows current incrementally. For each source
+table it reads only the rows changed since a stored (timestamp, id) watermark
+(RollupWatermark), collects the (business, day) cells those rows touch and
+recomputes just those cells. Rows are read only once they are
+METRICS_ROLLUP_LAG_SECONDS old, so transactions that commit a little late are
+still picked up. The watermarks don't see deletes, a booking moved to another
+day (the old day keeps its counts) or a lead's later day that stops being its
+first response when an earlier message is only then sent, and a change to a business's deal
+size or lead cost only affects days rolled up afterwards. `flask rollup-metrics --rebuild-days N` recomputes a whole window.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, tuple_
+
+from services.roi_calculator import ROIMetrics
+
+from .db import conflict_insert, db
+from .models import ActivityLog, Booking, Business, Conversation, DailyMetrics, Lead, Message, RollupWatermark
+from .response_cache import response_cache
+from .roi_metrics import CALL_ACTIONS, EPOCH, activity_counts, calculator, valuation
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+Cell = Tuple[int, date]
+
+# DailyMetrics column -> activity_counts key
+COUNT_COLUMNS = {
+    "leads_received": "leads",
+    "leads_responded": "leads_responded",
+    "appointments_booked": "appointments",
+    "deals_closed": "deals_closed",
+    "sms_sent": "sms_sent",
+    "emails_sent": "emails_sent",
+    "calls_made": "calls_made",
+}
+VALUE_COLUMNS = tuple(COUNT_COLUMNS) + ("revenue", "cost")
+
+
+@dataclass(frozen=True)
+class Source:
+    """A table the rollups are computed from, walked in (at, id) order."""
+    name: str
+    rows: Callable  # () -> select of id, at, and whatever cell() needs
+    at: Callable  # () -> the column the watermark follows
+    cell: Callable  # row -> (business id, day) it counts towards, or None
+
+
+def _leads_rows():
+    leads = Lead.__table__
+    return select(leads.c.id, leads.c.created_at.label("at"), leads.c.business_id)
+
+
+def _logs_rows():
+    logs = ActivityLog.__table__
+    return select(logs.c.id, logs.c.created_at.label("at"), logs.c.business_id, logs.c.action)
+
+
+def _bookings_rows():
+    bookings = Booking.__table__
+    return select(bookings.c.id, bookings.c.updated_at.label("at"), bookings.c.business_id, bookings.c.starts_at)
+
+
+def _messages_rows():
+    messages, convos, leads = Message.__table__, Conversation.__table__, Lead.__table__
+    return (
+        select(messages.c.id, messages.c.updated_at.label("at"), leads.c.business_id, messages.c.ts,
+               messages.c.sender)
+        .select_from(messages.join(convos, convos.c.id == messages.c.conversation_id)
+                     .join(leads, leads.c.id == convos.c.lead_id))
+    )
+
+
+SOURCES = [
+    # Leads and logs count on the day they were created; neither is edited in ways that matter here
+    Source("leads", _leads_rows, lambda: Lead.__table__.c.created_at,
+           lambda r: (r.business_id, r.at.date())),
+    Source("activity_logs", _logs_rows, lambda: ActivityLog.__table__.c.created_at,
+           lambda r: (r.business_id, r.at.date()) if r.action in CALL_ACTIONS else None),
+    # Outcome/show/revenue edits bump updated_at; the booking counts on its appointment day
+    Source("bookings", _bookings_rows, lambda: Booking.__table__.c.updated_at,
+           lambda r: (r.business_id, r.starts_at.date()) if r.business_id and r.starts_at else None),
+    # Delivery status changes bump updated_at; the message counts on the day it was sent
+    Source("messages", _messages_rows, lambda: Message.__table__.c.updated_at,
+           lambda r: (r.business_id, EPOCH + timedelta(days=r.ts // 86400))
+           if r.ts is not None and r.sender != "lead" else None),
+]
+
+
+def _watermark(source: str) -> RollupWatermark:
+    mark = RollupWatermark.query.filter_by(source=source).first()
+    if mark is None:
+        mark = RollupWatermark(source=source, last_id=0)
+        db.session.add(mark)
+    return mark
+
+
+def _changed_rows(source: Source, mark: RollupWatermark, until: datetime, limit: int) -> List:
+    """The next `limit` rows of `source` after its watermark and before `until`."""
+    at = source.at()
+    table = at.table
+    query = source.rows().where(at < until)
+    if mark.last_at is not None:
+        query = query.where(tuple_(at, table.c.id) > (mark.last_at, mark.last_id))
+    return db.session.execute(query.order_by(at, table.c.id).limit(limit)).all()
+
+
+def refresh_daily_metrics(batch_size: Optional[int] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    One incremental pass: read up to batch_size changed rows per source since
+    its watermark, recompute the cells they touch and advance the watermarks,
+    all in one transaction, then expire the touched businesses' cached ROI
+    responses. `more` is set when a source had a full batch.
+    """
+    batch_size = batch_size or settings.METRICS_ROLLUP_BATCH_SIZE
+    until = (now or datetime.utcnow()) - timedelta(seconds=settings.METRICS_ROLLUP_LAG_SECONDS)
+    dirty: Set[Cell] = set()
+    scanned = 0
+    more = False
+
+    for source in SOURCES:
+        mark = _watermark(source.name)
+        rows = _changed_rows(source, mark, until, batch_size)
+        if not rows:
+            continue
+        scanned += len(rows)
+        more = more or len(rows) == batch_size
+        dirty.update(c for c in map(source.cell, rows) if c is not None)
+        mark.last_at, mark.last_id = rows[-1].at, rows[-1].id
+
+    write_cells(dirty)
+    db.session.commit()
+    response_cache.invalidate("roi", {business_id for business_id, _ in dirty})
+    return {"scanned": scanned, "cells": len(dirty), "more": more}
+
+
+def _day_runs(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Sorted days -> [(first, last)] of each run of consecutive days."""
+    runs: List[Tuple[date, date]] = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def write_cells(cells: Iterable[Cell]) -> int:
+    """
+    Recompute the DailyMetrics rows for the given (business, day) cells from
+    the source tables; cells left with nothing to count are deleted. Each run of
+    consecutive days is one activity_counts call for all businesses sharing
+    it. The caller commits. Returns the number of rows written.
+    """
+    by_business: Dict[int, List[date]] = {}
+    for business_id, day in set(cells):
+        by_business.setdefault(business_id, []).append(day)
+    if not by_business:
+        return 0
+
+    runs: Dict[Tuple[date, date], List[int]] = {}
+    for business_id, days in by_business.items():
+        for run in _day_runs(days):
+            runs.setdefault(run, []).append(business_id)
+
+    values = valuation(by_business)
+    now = datetime.utcnow()
+    rows, empty = [], []
+    for (first, last), business_ids in runs.items():
+        counts = activity_counts(business_ids, _midnight(first), _midnight(last + timedelta(days=1)), by_day=True)
+        for business_id in business_ids:
+            cost_per_lead, avg_deal_size = values[business_id]
+            day = first
+            while day <= last:
+                activity = counts.get((business_id, day))
+                # e.g. a day whose only bookings were canceled
+                if activity is None or not any(activity.values()):
+                    empty.append((business_id, day))
+                else:
+                    rows.append({
+                        "business_id": business_id, "day": day, "created_at": now, "updated_at": now,
+                        **{column: activity[key] for column, key in COUNT_COLUMNS.items()},
+                        "revenue": round(activity["revenue"] + activity["unpriced_deals"] * avg_deal_size, 2),
+                        "cost": round(activity["leads"] * cost_per_lead, 2),
+                    })
+                day += timedelta(days=1)
+
+    daily = DailyMetrics.__table__
+    if empty:
+        db.session.execute(delete(daily).where(tuple_(daily.c.business_id, daily.c.day).in_(empty)))
+    if rows:
+        base = conflict_insert(daily)
+        if base is not None:
+            db.session.execute(
+                base.on_conflict_do_update(
+                    index_elements=["business_id", "day"],
+                    set_={c: base.excluded[c] for c in VALUE_COLUMNS + ("updated_at",)},
+                ),
+                rows,
+            )
+        else:
+            db.session.execute(
+                delete(daily).where(tuple_(daily.c.business_id, daily.c.day).in_(
+                    [(r["business_id"], r["day"]) for r in rows]
+                ))
+            )
+            db.session.execute(insert(daily), rows)
+    return len(rows)
+
+
+def rebuild(days: int, business_id: Optional[int] = None, today: Optional[date] = None) -> int:
+    """
+    Recompute every business's (or one business's) rows for the last `days`
+    days, including today, whatever the watermarks say. Commits every 31
+    days. Returns the number of rows written.
+    """
+    today = today or datetime.utcnow().date()
+    if business_id is not None:
+        business_ids = [business_id]
+    else:
+        business_ids = list(db.session.scalars(select(Business.__table__.c.id)))
+
+    written = 0
+    first = today - timedelta(days=days - 1)
+    while first <= today:
+        last = min(first + timedelta(days=30), today)
+        cells = [(b, first + timedelta(days=i)) for b in business_ids for i in range((last - first).days + 1)]
+        written += write_cells(cells)
+        db.session.commit()
+        first = last + timedelta(days=1)
+    response_cache.invalidate("roi", business_ids)
+    return written
+
+
+def window(days: int, today: Optional[date] = None) -> Tuple[date, date]:
+    """[first, last] UTC days of a `days`-day window ending today."""
+    today = today or datetime.utcnow().date()
+    return today - timedelta(days=days - 1), today
+
+
+def rollup_activity(business_ids: Iterable[int], first: date, last: date) -> Dict[int, Dict]:
+    """
+    business id -> activity for the days [first, last], summed from the
+    rollups, in the shape metrics_from_activity takes (revenue and cost
+    already valued).
+    """
+    business_ids = set(business_ids)
+    daily = DailyMetrics.__table__
+    activity = {
+        b: {"revenue": 0.0, "cost": 0.0, **{key: 0 for key in COUNT_COLUMNS.values()}} for b in business_ids
+    }
+    for row in db.session.execute(
+        select(daily.c.business_id, *(func.coalesce(func.sum(daily.c[c]), 0).label(c) for c in VALUE_COLUMNS))
+        .where(daily.c.business_id.in_(business_ids), daily.c.day >= first, daily.c.day <= last)
+        .group_by(daily.c.business_id)
+    ):
+        counts = activity[row.business_id]
+        counts.update({key: int(row._mapping[column]) for column, key in COUNT_COLUMNS.items()})
+        counts.update(revenue=float(row.revenue), cost=float(row.cost))
+    return activity
+
+
+def rollup_roi(business_id: int, days: int, today: Optional[date] = None) -> ROIMetrics:
+    """ROIMetrics for one business over the last `days` days (including today), from the rollups."""
+    first, last = window(days, today)
+    activity = rollup_activity([business_id], first, last)[business_id]
+    cost_per_lead, avg_deal_size = valuation([business_id])[business_id]
+    return calculator.metrics_from_activity(activity, days, cost_per_lead=cost_per_lead,
+                                            avg_deal_value=avg_deal_size)
+
+
+def daily_series(business_id: int, days: int, today: Optional[date] = None) -> List[DailyMetrics]:
+    """The business's rollup rows for the last `days` days, oldest first (days without activity have none)."""
+    first, last = window(days, today)
+    return (
+        DailyMetrics.query
+        .filter(DailyMetrics.business_id == business_id, DailyMetrics.day >= first, DailyMetrics.day <= last)
+        .order_by(DailyMetrics.day)
+        .all()
+    )
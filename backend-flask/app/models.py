@@ -1,9 +1,20 @@
 from datetime import datetime, timedelta
+from decimal import Decimal
 from .db import db
-from sqlalchemy import func, Index
+from .lead_keys import phone_key, email_key
+from sqlalchemy import func, Index, event
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 
+def _json_value(value):
+    """JSON-friendly column value (datetimes as ISO strings, decimals as floats)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
 # Base model class for common fields
 class Base(db.Model):
     __abstract__ = True
@@ -43,6 +54,9 @@ class Lead(Base):
     business_id = db.Column(db.Integer, db.ForeignKey('businesses.id'), nullable=False)
     phone = db.Column(db.String(20), index=True)
     email = db.Column(db.String(255), index=True)
+    # Canonical dedup keys (see lead_keys); kept in sync with phone/email on every write
+    phone_key = db.Column(db.String(16))
+    email_key = db.Column(db.String(255))
     first_name = db.Column(db.String(100))
     last_name = db.Column(db.String(100))
     company = db.Column(db.String(200))
@@ -58,10 +72,43 @@ class Lead(Base):
     # Relationships
     business = db.relationship('Business', backref='leads')
     
+    # Keyset pagination walks (created_at, id) newest first, optionally within one
+    # filter value; each filterable listing gets a matching composite index
+    __table_args__ = (
+        Index('ix_leads_created_id', 'created_at', 'id'),
+        Index('ix_leads_business_created_id', 'business_id', 'created_at', 'id'),
+        Index('ix_leads_business_status_created_id', 'business_id', 'status', 'created_at', 'id'),
+        Index('ix_leads_business_source_created_id', 'business_id', 'source', 'created_at', 'id'),
+        Index('ix_leads_business_priority_created_id', 'business_id', 'priority', 'created_at', 'id'),
+        # AI score listing: highest score first, id breaking ties
+        Index('ix_leads_business_score_id', 'business_id', 'score', 'id'),
+        # One lead per normalized phone/email within a tenant; inbound SMS lookup and
+        # import dedup probe these, and bulk inserts use them as ON CONFLICT targets
+        Index('uq_leads_business_phone_key', 'business_id', 'phone_key', unique=True),
+        Index('uq_leads_business_email_key', 'business_id', 'email_key', unique=True),
+    )
+    
+    # Columns exposed through the API, in response order
+    API_FIELDS = (
+        'id', 'business_id', 'first_name', 'last_name', 'email', 'phone', 'company', 'title',
+        'status', 'source', 'notes', 'score', 'priority', 'last_contacted_at', 'next_followup_at',
+        'created_at', 'updated_at',
+    )
+    
+    def to_dict(self, fields=None):
+        return {f: _json_value(getattr(self, f)) for f in (fields or self.API_FIELDS)}
+    
     def __repr__(self):
         return f'<Lead {self.phone} {self.email}>'
 
 
+@event.listens_for(Lead, 'before_insert')
+@event.listens_for(Lead, 'before_update')
+def _sync_lead_keys(mapper, connection, target):
+    target.phone_key = phone_key(target.phone)
+    target.email_key = email_key(target.email)
+
+
 class Conversation(Base):
     __tablename__ = 'conversations'
     
@@ -75,6 +122,10 @@ class Conversation(Base):
     lead = db.relationship('Lead', backref='conversations')
     messages = db.relationship('Message', backref='conversation')
     
+    __table_args__ = (
+        Index('ix_conversations_lead_channel', 'lead_id', 'channel'),
+    )
+    
     def __repr__(self):
         return f'<Conversation {self.id}: {self.channel}>'
 
@@ -91,6 +142,15 @@ class Message(Base):
     extra_data = db.Column(db.JSON, default={})
     ts = db.Column(db.Integer)  # Unix timestamp
     
+    # Conversation threads are read in ts order; provider ids are unique, which
+    # makes webhook persistence idempotent on Twilio's MessageSid
+    __table_args__ = (
+        Index('ix_messages_conversation_ts', 'conversation_id', 'ts'),
+        # Daily rollup watermark walk (status changes bump updated_at)
+        Index('ix_messages_updated_id', 'updated_at', 'id'),
+        Index('uq_messages_external_id', 'external_id', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Message {self.id}: {self.sender} -> {self.content[:50]}>'
 
@@ -112,6 +172,13 @@ class Booking(Base):
     business = db.relationship('Business', backref='bookings')
     lead = db.relationship('Lead', backref='bookings')
     
+    __table_args__ = (
+        # ROI aggregates over a business's bookings in a period
+        Index('ix_bookings_business_starts_at', 'business_id', 'starts_at'),
+        # Daily rollup watermark walk
+        Index('ix_bookings_updated_id', 'updated_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Booking {self.id}: {self.starts_at}>'
 
@@ -147,6 +214,7 @@ class User(Base):
     # Subscription info
     stripe_customer_id = db.Column(db.String(100), unique=True)
     subscription_status = db.Column(db.String(20), default='trial')  # trial, active, past_due, canceled, unpaid
+    plan = db.Column(db.String(20))  # starter, pro, agency; rate-limit quota while the subscription is active
     trial_ends_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(days=14))
     subscription_ends_at = db.Column(db.DateTime)
     
@@ -211,6 +279,11 @@ class ROIReport(Base):
     
     business = db.relationship('Business', backref='roi_reports')
     
+    __table_args__ = (
+        # A business's latest report
+        Index('ix_roi_reports_business_created', 'business_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<ROIReport {self.business_id}: {self.period_start} - {self.period_end}>'
 
@@ -288,12 +361,20 @@ class AIScoring(Base):
     priority = db.Column(db.String(20))  # high, medium, low
     recommended_action = db.Column(db.String(100))  # call_immediately, send_nurture, qualify_further
     best_contact_time = db.Column(db.String(50))  # morning, afternoon, evening
+    # Hash of the scorer config, AIScoringConfig and lead fields the score was computed from;
+    # the lead is rescored only when this or its recency multiplier changes
+    fingerprint = db.Column(db.String(40))
+    recency = db.Column(db.Float)
+    scored_at = db.Column(db.DateTime)
+    # When the recency multiplier next changes (None: it won't); the due rescore walks this index
+    next_rescore_at = db.Column(db.DateTime)
     
     business = db.relationship('Business', backref='ai_scores')
     lead = db.relationship('Lead', backref='ai_scores')
     
     __table_args__ = (
         db.UniqueConstraint('business_id', 'lead_id', name='unique_business_lead_score'),
+        Index('ix_ai_scoring_next_rescore_at', 'next_rescore_at', 'id'),
     )
     
     def __repr__(self):
@@ -357,5 +438,49 @@ class ActivityLog(Base):
     user = db.relationship('User', backref='activities')
     integration = db.relationship('Integration', backref='activities')
     
+    __table_args__ = (
+        # ROI aggregates count actions (calls) per business in a period
+        Index('ix_activity_logs_business_action_created', 'business_id', 'action', 'created_at'),
+        # Daily rollup watermark walk
+        Index('ix_activity_logs_created_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<ActivityLog {self.action}: {self.description[:50]}>'
+
+
+class DailyMetrics(Base):
+    """One business's ROI activity on one UTC day, maintained by metrics_rollup."""
+    __tablename__ = 'daily_metrics'
+    
+    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    leads_received = db.Column(db.Integer, nullable=False, default=0)
+    leads_responded = db.Column(db.Integer, nullable=False, default=0)  # leads first messaged that day
+    appointments_booked = db.Column(db.Integer, nullable=False, default=0)
+    deals_closed = db.Column(db.Integer, nullable=False, default=0)
+    sms_sent = db.Column(db.Integer, nullable=False, default=0)
+    emails_sent = db.Column(db.Integer, nullable=False, default=0)
+    calls_made = db.Column(db.Integer, nullable=False, default=0)
+    # Valued with the business's avg deal size / cost per lead when the day was rolled up
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cost = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('uq_daily_metrics_business_day', 'business_id', 'day', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<DailyMetrics {self.business_id}: {self.day}>'
+
+
+class RollupWatermark(Base):
+    """How far a batch job has got through a table, as a (timestamp, id) position (metrics_rollup, ROI fleet runs)."""
+    __tablename__ = 'rollup_watermarks'
+    
+    source = db.Column(db.String(50), unique=True, nullable=False)
+    last_at = db.Column(db.DateTime)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RollupWatermark {self.source}: {self.last_at} #{self.last_id}>'
@@ -0,0 +1,103 @@
+"""
+In-process routing table for inbound Twilio webhooks.
+
+Maps each business's Twilio number (E.164) to the business and the auth token
+its webhooks are signed with, so routing a webhook is one dict lookup instead
+of a query. The table is loaded at startup and reloaded when any process
+publishes an invalidation (onboarding changes) or when it is older than
+ROUTING_MAX_AGE_SECONDS, in case an invalidation was missed.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from . import invalidation
+from .db import db
+from .lead_keys import phone_key
+from .models import Business
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "leadnest:routing:numbers"
+
+# Numbers without a Business row keep the original single-tenant behaviour
+DEFAULT_BUSINESS_ID = 1
+
+
+@dataclass(frozen=True)
+class Route:
+    business_id: int
+    auth_token: str
+
+
+class NumberRouter:
+    """To-number -> Route table shared by the request threads of one process."""
+
+    def __init__(self, listen: bool = True):
+        self.listen = listen
+        self._routes: Dict[str, Route] = {}
+        self._loaded_at: Optional[float] = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        if listen:
+            invalidation.on(INVALIDATE_CHANNEL, self._mark_stale)
+
+    def load(self) -> int:
+        """(Re)build the table from Business rows; needs an app context. Returns the route count."""
+        # Cleared first so an invalidation arriving mid-load triggers another reload
+        self._stale = False
+        fallback_token = os.environ.get("TWILIO_AUTH_TOKEN", "")
+        rows = (
+            db.session.query(Business.id, Business.twilio_phone_number, Business.twilio_auth_token)
+            .filter(Business.twilio_phone_number.isnot(None))
+            .all()
+        )
+        routes = {}
+        for business_id, number, token in rows:
+            key = phone_key(number)
+            if key:
+                routes[key] = Route(business_id, token or fallback_token)
+
+        with self._lock:
+            self._routes = routes
+            self._loaded_at = time.monotonic()
+        log.info("Loaded %d inbound number routes", len(routes))
+        return len(routes)
+
+    def resolve(self, to_number: str) -> Optional[Route]:
+        """Route for a webhook's To number; None if there is no token to validate with."""
+        if self.listen:
+            invalidation.ensure_listening()
+        expired = self._loaded_at is None or time.monotonic() - self._loaded_at > settings.ROUTING_MAX_AGE_SECONDS
+        # One thread reloads; the others keep using the current table meanwhile
+        if (self._stale or expired) and self._reload_lock.acquire(blocking=False):
+            try:
+                self.load()
+            except Exception:
+                # Keep serving the previous table; retry on the next webhook
+                log.exception("Reloading inbound number routes failed")
+            finally:
+                self._reload_lock.release()
+
+        route = self._routes.get(phone_key(to_number) or "")
+        if route is None:
+            token = os.environ.get("TWILIO_AUTH_TOKEN", "")
+            route = Route(DEFAULT_BUSINESS_ID, token) if token else None
+        return route if route and route.auth_token else None
+
+    def invalidate(self) -> None:
+        """Mark this process's table stale and tell every other process to reload."""
+        self._stale = True
+        invalidation.publish(INVALIDATE_CHANNEL)
+
+    def _mark_stale(self, _message) -> None:
+        self._stale = True
+
+
+number_router = NumberRouter()
@@ -0,0 +1,71 @@
+"""
+Process-wide Redis connection pool.
+
+RQ queues, the rate limiter and caches all draw connections from one pool per
+process instead of opening a client per request. redis-py resets the pool
+after a fork, so RQ work horses and gunicorn workers each get their own.
+
+The shared pool has short connect/read timeouts, so a Redis that hangs fails
+a request instead of holding its thread. Consumers that block on Redis for
+longer (RQ workers waiting in BLPOP, the pub/sub invalidation listener) use
+get_blocking_redis() instead.
+"""
+
+import threading
+
+from redis import ConnectionPool, Redis
+
+from .settings import settings
+
+_pool = None
+_blocking_pool = None
+_lock = threading.Lock()
+
+
+def _make_pool(socket_timeout) -> ConnectionPool:
+    return ConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=30,
+    )
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = _make_pool(settings.REDIS_SOCKET_TIMEOUT)
+    return _pool
+
+
+def get_redis() -> Redis:
+    """A client bound to the shared pool (cheap; no new connection is opened)."""
+    return Redis(connection_pool=get_pool())
+
+
+def get_blocking_redis() -> Redis:
+    """A client without a read timeout, for consumers that block on Redis (RQ worker dequeue, pub/sub)."""
+    global _blocking_pool
+    if _blocking_pool is None:
+        with _lock:
+            if _blocking_pool is None:
+                _blocking_pool = _make_pool(None)
+    return Redis(connection_pool=_blocking_pool)
+
+
+def pool_stats() -> dict:
+    """Connection counts for health checks."""
+    pool = get_pool()
+    with pool._lock:
+        in_use = len(pool._in_use_connections)
+        idle = len(pool._available_connections)
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": in_use,
+        "idle": idle,
+        "created": pool._created_connections,
+    }
@@ -0,0 +1,195 @@
+"""
+Redis-backed response cache for read-heavy GET endpoints.
+
+A view decorated with @response_cache.cached(namespace, ttl, vary) is stored
+per tenant and normalized query string: only the `vary` parameters count, in
+sorted order, so `?days=30&industry=x` and `?industry=x&days=30&_=123` share an
+entry. Entries carry the tenant's generation for the namespace at the time
+they were computed; invalidate() bumps the generation on a write event (a new
+booking, a finished ROI calculation, a daily rollup refresh), so every older
+entry becomes a miss without being found and deleted. The generation and the
+entry are read in one round trip.
+
+On a miss, one request per key computes the response under a short Redis lock
+while identical requests wait up to RESPONSE_CACHE_COALESCE_WAIT_MS for its
+result, so a burst of dashboard loads computes once. Responses carry an ETag
+and conditional requests get 304s. If Redis is unreachable the view just runs.
+
+Hit/miss counters are per process (stats(), shown on /api/readyz).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from flask import current_app, request
+from redis.exceptions import RedisError
+
+from .auth import current_business_id
+from .redis_pool import get_redis
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+# Headers kept with a cached body
+STORED_HEADERS = ("Content-Type", "Content-Disposition")
+
+
+def tenant_id() -> int:
+    """The business a request is for: the route's business_id, else the caller's; 0 if neither."""
+    business_id = (request.view_args or {}).get("business_id")
+    if business_id is None:
+        business_id = current_business_id()
+    return int(business_id or 0)
+
+
+class ResponseCache:
+    def __init__(self, prefix: str = "leadnest:resp"):
+        self.prefix = prefix
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, namespace: str, outcome: str) -> None:
+        with self._lock:
+            self._counts[(namespace, outcome)] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """namespace -> {hit, miss, coalesced, not_modified, bypass: count} for this process."""
+        with self._lock:
+            counts = dict(self._counts)
+        stats: Dict[str, Dict[str, int]] = {}
+        for (namespace, outcome), n in counts.items():
+            stats.setdefault(namespace, {})[outcome] = n
+        return stats
+
+    def _generation_key(self, namespace: str, business_id: int) -> str:
+        return f"{self.prefix}:gen:{namespace}:{business_id}"
+
+    def key(self, namespace: str, business_id: int, vary: Sequence[str]) -> str:
+        """Entry key for the current request: tenant, endpoint, and the vary params and route args, normalized."""
+        params = [("endpoint", request.endpoint or "")]
+        params += sorted((name, value) for name in vary for value in request.args.getlist(name))
+        params += sorted((name, str(value)) for name, value in (request.view_args or {}).items())
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()[:20]
+        return f"{self.prefix}:{namespace}:{business_id}:{digest}"
+
+    def invalidate(self, namespace: str, business_ids: Iterable[int]) -> bool:
+        """Expire the tenants' cached responses in a namespace, in every process. False if Redis was unreachable."""
+        business_ids = set(business_ids)
+        if not business_ids:
+            return True
+        try:
+            with get_redis().pipeline(transaction=False) as pipe:
+                for business_id in business_ids:
+                    pipe.incr(self._generation_key(namespace, business_id))
+                pipe.execute()
+            return True
+        except RedisError:
+            log.warning("Could not invalidate cached %s responses", namespace)
+            return False
+
+    def _lookup(self, redis, namespace: str, business_id: int, key: str) -> Tuple[bytes, Optional[Dict]]:
+        """(current generation, entry if it is from that generation)."""
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.get(self._generation_key(namespace, business_id))
+            pipe.hgetall(key)
+            generation, entry = pipe.execute()
+        generation = generation or b"0"
+        if entry and entry.get(b"generation") == generation:
+            return generation, entry
+        return generation, None
+
+    def _respond(self, entry: Dict, namespace: str):
+        response = current_app.response_class(entry[b"body"], status=int(entry[b"status"]))
+        for name in STORED_HEADERS:
+            value = entry.get(f"h:{name}".encode())
+            if value is not None:
+                response.headers[name] = value.decode()
+        return self._conditional(response, entry[b"etag"].decode(), namespace, "hit")
+
+    def _conditional(self, response, etag: str, namespace: str, outcome: str):
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.headers["X-Cache"] = outcome.upper()
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            self._count(namespace, "not_modified")
+        return response
+
+    def _store(self, redis, key: str, generation: bytes, response, ttl: int) -> str:
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()[:32]
+        entry = {"body": body, "status": response.status_code, "etag": etag, "generation": generation}
+        entry.update({f"h:{name}": response.headers[name] for name in STORED_HEADERS if name in response.headers})
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=entry)
+            pipe.expire(key, ttl)
+            pipe.execute()
+        return etag
+
+    def _release(self, redis, lock_key: str, token: str) -> None:
+        # Only our own lock; it may have expired and been taken by another request
+        try:
+            if redis.get(lock_key) == token.encode():
+                redis.delete(lock_key)
+        except RedisError:
+            pass
+
+    def cached(self, namespace: str, ttl: Optional[int] = None, vary: Sequence[str] = ()):
+        """Cache a GET view's 200 responses per tenant and `vary` query params for `ttl` seconds."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not settings.RESPONSE_CACHE_ENABLED or request.method != "GET":
+                    return view(*args, **kwargs)
+                business_id = tenant_id()
+                key = self.key(namespace, business_id, vary)
+                try:
+                    redis = get_redis()
+                    generation, entry = self._lookup(redis, namespace, business_id, key)
+                    if entry is not None:
+                        self._count(namespace, "hit")
+                        return self._respond(entry, namespace)
+
+                    lock_key, token = f"{key}:lock", uuid.uuid4().hex
+                    if not redis.set(lock_key, token, nx=True, px=settings.RESPONSE_CACHE_COALESCE_WAIT_MS):
+                        # Someone else is computing this response: wait for theirs
+                        deadline = time.monotonic() + settings.RESPONSE_CACHE_COALESCE_WAIT_MS / 1000
+                        while time.monotonic() < deadline:
+                            time.sleep(0.02)
+                            generation, entry = self._lookup(redis, namespace, business_id, key)
+                            if entry is not None:
+                                self._count(namespace, "coalesced")
+                                return self._respond(entry, namespace)
+                        token = None
+                except RedisError:
+                    log.warning("Response cache unavailable for %s", namespace)
+                    self._count(namespace, "bypass")
+                    return view(*args, **kwargs)
+
+                self._count(namespace, "miss")
+                try:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    try:
+                        etag = self._store(redis, key, generation, response,
+                                           ttl or settings.RESPONSE_CACHE_TTL_SECONDS)
+                    except RedisError:
+                        log.warning("Could not cache %s response", namespace)
+                        return response
+                    return self._conditional(response, etag, namespace, "miss")
+                finally:
+                    if token is not None:
+                        self._release(redis, lock_key, token)
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
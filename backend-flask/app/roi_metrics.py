@@ -0,0 +1,203 @@
+"""
+ROI metrics counted from a business's own rows.
+
+Each family of counts is one grouped aggregate over an indexed range, for any
+number of businesses at once:
+
+- leads received: leads by created_at (ix_leads_business_created_id)
+- appointments, shows, closed deals and revenue: bookings by starts_at
+  (ix_bookings_business_starts_at)
+- outbound SMS/email: messages by ts, through each lead's conversations
+  (ix_conversations_lead_channel, ix_messages_conversation_ts)
+- leads responded to: leads whose first outbound message falls in the range,
+  counted on that message's day, so per-day counts add up to the range's
+- calls: activity logs by action and created_at (ix_activity_logs_business_action_created)
+
+ROICalculator.metrics_from_activity turns the counts into ROIMetrics, valued
+with the business's cost per lead and average deal size. The same counts per
+UTC day feed the daily rollups (metrics_rollup).
+"""
+
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select
+
+from services.roi_calculator import ROICalculator, ROIMetrics
+
+from .db import db
+from .models import ActivityLog, Booking, Business, Conversation, Lead, Message
+
+calculator = ROICalculator()
+
+CALL_ACTIONS = ("call_logged", "call_made")
+# Outbound messages that never reached the lead don't count as sent
+UNSENT_STATUSES = ("queued", "failed", "undelivered", "canceled")
+
+# Used when the business hasn't set its own
+DEFAULT_AVG_DEAL_SIZE = 5000.0
+DEFAULT_COST_PER_LEAD = 50.0
+
+EPOCH = date(1970, 1, 1)
+
+EMPTY_ACTIVITY = {
+    "leads": 0, "leads_responded": 0, "appointments": 0, "shows": 0, "no_shows": 0, "deals_closed": 0,
+    "revenue": 0.0, "unpriced_deals": 0, "sms_sent": 0, "emails_sent": 0, "calls_made": 0,
+}
+
+
+def period(days: int, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """[start, end) of the last `days` days, naive UTC like the stored timestamps."""
+    end = now or datetime.utcnow()
+    return end - timedelta(days=days), end
+
+
+def _sum_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as an ISO string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def activity_counts(business_ids: Iterable[int], start: datetime, end: datetime,
+                    by_day: bool = False) -> Dict[Hashable, Dict]:
+    """
+    business id -> activity counts in [start, end); businesses without activity
+    get zeros. With by_day, (business id, UTC date) -> counts instead, for the
+    days that had any activity.
+    """
+    ids = list(set(business_ids))
+    counts: Dict[Hashable, Dict] = {} if by_day else {b: dict(EMPTY_ACTIVITY) for b in ids}
+    if not ids:
+        return counts
+
+    def group(business_id, day) -> List:
+        """Group-by (and leading select) columns: the business, plus the day with by_day."""
+        return [business_id.label("business_id")] + ([day.label("day")] if by_day else [])
+
+    def cell(row, day=None) -> Dict:
+        key = (row.business_id, day or _as_date(row.day)) if by_day else row.business_id
+        return counts.setdefault(key, dict(EMPTY_ACTIVITY))
+
+    leads = Lead.__table__
+    keys = group(leads.c.business_id, func.date(leads.c.created_at))
+    for row in db.session.execute(
+        select(*keys, func.count().label("n"))
+        .where(leads.c.business_id.in_(ids), leads.c.created_at >= start, leads.c.created_at < end)
+        .group_by(*keys)
+    ):
+        cell(row)["leads"] = row.n
+
+    bookings = Booking.__table__
+    closed = bookings.c.outcome == "closed"
+    keys = group(bookings.c.business_id, func.date(bookings.c.starts_at))
+    for row in db.session.execute(
+        select(
+            *keys,
+            _sum_if(bookings.c.status == "canceled").label("canceled"),
+            func.count().label("total"),
+            _sum_if(bookings.c.show_status == "showed").label("shows"),
+            _sum_if(bookings.c.show_status == "no_show").label("no_shows"),
+            _sum_if(closed).label("deals_closed"),
+            func.coalesce(func.sum(case((closed, bookings.c.revenue_generated))), 0).label("revenue"),
+            _sum_if(closed & bookings.c.revenue_generated.is_(None)).label("unpriced_deals"),
+        )
+        .where(bookings.c.business_id.in_(ids), bookings.c.starts_at >= start, bookings.c.starts_at < end)
+        .group_by(*keys)
+    ):
+        cell(row).update(
+            appointments=row.total - row.canceled, shows=row.shows, no_shows=row.no_shows,
+            deals_closed=row.deals_closed, revenue=float(row.revenue), unpriced_deals=row.unpriced_deals,
+        )
+
+    messages, convos = Message.__table__, Conversation.__table__
+    lead_messages = (
+        leads.join(convos, convos.c.lead_id == leads.c.id).join(messages, messages.c.conversation_id == convos.c.id)
+    )
+    outbound = (
+        leads.c.business_id.in_(ids),
+        messages.c.sender != "lead",
+        or_(messages.c.status.is_(None), messages.c.status.notin_(UNSENT_STATUSES)),
+    )
+    start_ts, end_ts = calendar.timegm(start.utctimetuple()), calendar.timegm(end.utctimetuple())
+    # ts is a Unix timestamp: whole days since the epoch, turned into dates below
+    keys = group(leads.c.business_id, messages.c.ts // 86400)
+    for row in db.session.execute(
+        select(
+            *keys,
+            _sum_if(convos.c.channel == "sms").label("sms_sent"),
+            _sum_if(convos.c.channel == "email").label("emails_sent"),
+        )
+        .select_from(lead_messages)
+        .where(*outbound, messages.c.ts >= start_ts, messages.c.ts < end_ts)
+        .group_by(*keys)
+    ):
+        day = EPOCH + timedelta(days=int(row.day)) if by_day else None
+        cell(row, day).update(sms_sent=row.sms_sent, emails_sent=row.emails_sent)
+
+    # A lead counts as responded to once, when its first outbound message went out
+    first_ts = func.min(messages.c.ts)
+    first = (
+        select(leads.c.business_id, first_ts.label("ts"))
+        .select_from(lead_messages)
+        .where(*outbound)
+        .group_by(leads.c.business_id, leads.c.id)
+        .having(first_ts >= start_ts, first_ts < end_ts)
+        .subquery()
+    )
+    keys = group(first.c.business_id, first.c.ts // 86400)
+    for row in db.session.execute(select(*keys, func.count().label("n")).group_by(*keys)):
+        day = EPOCH + timedelta(days=int(row.day)) if by_day else None
+        cell(row, day)["leads_responded"] = row.n
+
+    logs = ActivityLog.__table__
+    keys = group(logs.c.business_id, func.date(logs.c.created_at))
+    for row in db.session.execute(
+        select(*keys, func.count().label("n"))
+        .where(logs.c.business_id.in_(ids), logs.c.action.in_(CALL_ACTIONS),
+               logs.c.created_at >= start, logs.c.created_at < end)
+        .group_by(*keys)
+    ):
+        cell(row)["calls_made"] = row.n
+
+    return counts
+
+
+def valuation(business_ids: Iterable[int]) -> Dict[int, Tuple[float, float]]:
+    """business id -> (cost per lead, average deal size), with defaults where unset."""
+    business_ids = set(business_ids)
+    businesses = Business.__table__
+    found = {
+        row.id: (float(row.cost_per_lead or 0) or DEFAULT_COST_PER_LEAD,
+                 float(row.avg_deal_size or 0) or DEFAULT_AVG_DEAL_SIZE)
+        for row in db.session.execute(
+            select(businesses.c.id, businesses.c.avg_deal_size, businesses.c.cost_per_lead)
+            .where(businesses.c.id.in_(business_ids))
+        )
+    }
+    return {b: found.get(b, (DEFAULT_COST_PER_LEAD, DEFAULT_AVG_DEAL_SIZE)) for b in business_ids}
+
+
+def roi_metrics(business_ids: Iterable[int], start: datetime, end: datetime) -> Dict[int, ROIMetrics]:
+    """business id -> ROIMetrics for [start, end), valued with each business's ROI settings."""
+    business_ids = set(business_ids)
+    counts = activity_counts(business_ids, start, end)
+    values = valuation(business_ids)
+    days = max((end - start).days, 1)
+
+    metrics = {}
+    for business_id, activity in counts.items():
+        cost_per_lead, avg_deal_size = values[business_id]
+        metrics[business_id] = calculator.metrics_from_activity(
+            activity, days, cost_per_lead=cost_per_lead, avg_deal_value=avg_deal_size,
+        )
+    return metrics
+
+
+def business_roi(business_id: int, days: int, now: Optional[datetime] = None) -> ROIMetrics:
+    """ROIMetrics for one business over the last `days` days."""
+    start, end = period(days, now)
+    return roi_metrics([business_id], start, end)[business_id]
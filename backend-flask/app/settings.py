@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 class Settings:
     # Accept either name; default to local sqlite for dev
@@ -13,9 +14,74 @@ class Settings:
         DATABASE_URL = _raw_database_url.replace("postgresql://", "postgresql+psycopg://", 1)
     else:
         DATABASE_URL = _raw_database_url
+    # SQLAlchemy pool: size pool_size + max_overflow to at least gunicorn workers x threads per process
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 280))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+    DB_POOL_SLOW_WAIT_MS = float(os.environ.get("DB_POOL_SLOW_WAIT_MS", 100))
     JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-change-in-production")
     CORS_ORIGINS = [o.strip() for o in os.environ.get("CORS_ORIGINS", "*").split(",") if o.strip()]
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
     PORT = int(os.environ.get("PORT", 8000))
+    REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    # One pool per process; size it to at least gunicorn threads + background users
+    REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 20))
+    # Seconds before a Redis command or connect fails instead of hanging a request thread
+    REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 5))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", 2))
+    # Rate limiter counters live in Redis so limits hold across gunicorn workers and deploys
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", REDIS_URL)
+    RATELIMIT_STRATEGY = os.environ.get("RATELIMIT_STRATEGY", "moving-window")
+    # Bulk imports of at least IMPORT_PARTITION_THRESHOLD rows are split across IMPORT_PARTITIONS jobs
+    IMPORT_PARTITIONS = int(os.environ.get("IMPORT_PARTITIONS", 4))
+    IMPORT_PARTITION_THRESHOLD = int(os.environ.get("IMPORT_PARTITION_THRESHOLD", 20000))
+    # Local scratch space for spooled uploads (each process its own); uploads handed to the worker
+    # travel through Redis and expire there after IMPORT_SPOOL_TTL_SECONDS if never imported
+    IMPORT_SPOOL_DIR = os.environ.get("IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "leadnest-imports"))
+    IMPORT_SPOOL_TTL_SECONDS = int(os.environ.get("IMPORT_SPOOL_TTL_SECONDS", 6 * 60 * 60))
+    # Import progress over SSE (/jobs/<id>/events): poll interval, and how long one stream is held
+    # before the client reconnects (each open stream occupies a web thread)
+    JOB_EVENTS_POLL_SECONDS = float(os.environ.get("JOB_EVENTS_POLL_SECONDS", 1.0))
+    JOB_EVENTS_MAX_SECONDS = float(os.environ.get("JOB_EVENTS_MAX_SECONDS", 45))
+    # Webhook event streams (inbound SMS, delivery status): consumer batch size and wait,
+    # idle time before a failed batch is reclaimed, stream length cap and attempts per event
+    EVENT_STREAM_BATCH_SIZE = int(os.environ.get("EVENT_STREAM_BATCH_SIZE", 200))
+    EVENT_STREAM_BLOCK_MS = int(os.environ.get("EVENT_STREAM_BLOCK_MS", 250))
+    EVENT_STREAM_RECLAIM_MS = int(os.environ.get("EVENT_STREAM_RECLAIM_MS", 30000))
+    EVENT_STREAM_MAXLEN = int(os.environ.get("EVENT_STREAM_MAXLEN", 100000))
+    EVENT_STREAM_MAX_DELIVERIES = int(os.environ.get("EVENT_STREAM_MAX_DELIVERIES", 5))
+    # Outbound SMS: per sender number limits shared by all sms workers (long codes allow ~1 msg/sec),
+    # how long a send waits for a slot before retrying later, and Twilio HTTP/job timeouts
+    SMS_SENDER_CONCURRENCY = int(os.environ.get("SMS_SENDER_CONCURRENCY", 1))
+    SMS_SENDER_RATE_PER_SEC = int(os.environ.get("SMS_SENDER_RATE_PER_SEC", 1))
+    SMS_THROTTLE_MAX_WAIT = float(os.environ.get("SMS_THROTTLE_MAX_WAIT", 30))
+    TWILIO_HTTP_TIMEOUT = float(os.environ.get("TWILIO_HTTP_TIMEOUT", 15))
+    SMS_SEND_JOB_TIMEOUT = int(os.environ.get("SMS_SEND_JOB_TIMEOUT", 120))
+    SMS_BULK_MAX_LEADS = int(os.environ.get("SMS_BULK_MAX_LEADS", 5000))
+    # Public URL of /twilio/status, passed as StatusCallback on sends (no delivery receipts if unset)
+    TWILIO_STATUS_CALLBACK_URL = os.environ.get("TWILIO_STATUS_CALLBACK_URL", "")
+    # Inbound number routing table: max age before a process reloads it without an invalidation
+    ROUTING_MAX_AGE_SECONDS = int(os.environ.get("ROUTING_MAX_AGE_SECONDS", 300))
+    # Country code assumed for lead phone numbers entered without one (E.164 dedup keys)
+    DEFAULT_PHONE_COUNTRY_CODE = os.environ.get("DEFAULT_PHONE_COUNTRY_CODE", "1").lstrip("+")
+    # Periodic sweep rescoring leads whose AI score inputs changed (new leads from any write path,
+    # AIScoringConfig edits); scheduled by the default worker
+    LEAD_RESCORE_INTERVAL_SECONDS = int(os.environ.get("LEAD_RESCORE_INTERVAL_SECONDS", 900))
+    # Daily ROI rollups (metrics_rollup): refresh interval, how old a row must be before it is
+    # rolled up (covers transactions committing late), rows read per source per pass
+    METRICS_ROLLUP_INTERVAL_SECONDS = int(os.environ.get("METRICS_ROLLUP_INTERVAL_SECONDS", 300))
+    METRICS_ROLLUP_LAG_SECONDS = int(os.environ.get("METRICS_ROLLUP_LAG_SECONDS", 60))
+    METRICS_ROLLUP_BATCH_SIZE = int(os.environ.get("METRICS_ROLLUP_BATCH_SIZE", 5000))
+    # Nightly ROI reports: business ids per RQ job, businesses per committed batch
+    ROI_FLEET_RANGE_SIZE = int(os.environ.get("ROI_FLEET_RANGE_SIZE", 1000))
+    ROI_FLEET_BATCH_SIZE = int(os.environ.get("ROI_FLEET_BATCH_SIZE", 200))
+    # Analytics response cache (response_cache): on/off, default entry TTL, how long identical
+    # requests wait for the one computing a missed entry (also its lock's lifetime)
+    RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 300))
+    RESPONSE_CACHE_COALESCE_WAIT_MS = int(os.environ.get("RESPONSE_CACHE_COALESCE_WAIT_MS", 2000))
 
 settings = Settings()
@@ -0,0 +1,252 @@
+"""
+Inbound SMS and delivery status persistence.
+
+/twilio/inbound validates the request, publishes the message to INBOUND_STREAM
+and answers with TwiML straight away; stream_worker.py persists the events in
+batches through persist_inbound. Writes are idempotent on Twilio's MessageSid
+(stored as Message.external_id), so redelivered events are dropped.
+
+/twilio/status does the same with delivery status callbacks (STATUS_STREAM,
+persist_statuses): a batch is coalesced to the latest status per message and
+written as one UPDATE per distinct status.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, or_, select, tuple_, update
+
+from .db import conflict_insert, db
+from .event_streams import EventStream
+from .lead_keys import phone_key
+from .models import Conversation, Lead, Message
+
+log = logging.getLogger(__name__)
+
+INBOUND_STREAM = EventStream("leadnest:sms:inbound")
+STATUS_STREAM = EventStream("leadnest:sms:status")
+
+# Twilio message states in lifecycle order. Callbacks can arrive out of order,
+# so a status never overwrites one of a higher rank.
+STATUS_RANK = {
+    "accepted": 0, "scheduled": 0, "queued": 0,
+    "sending": 1,
+    "sent": 2,
+    "delivered": 3, "undelivered": 3, "failed": 3, "canceled": 3,
+    "read": 4,
+}
+
+
+def inbound_event(form, business_id: int, received_at: int) -> Dict[str, object]:
+    """Stream event for a Twilio inbound message webhook."""
+    return {
+        "message_sid": form.get("MessageSid", ""),
+        "business_id": business_id,
+        "from": form.get("From", ""),
+        "to": form.get("To", ""),
+        "body": form.get("Body", ""),
+        "received_at": received_at,
+    }
+
+
+def _find_leads(wanted: Dict[Tuple[int, str], Optional[str]]) -> Dict[Tuple[int, str], int]:
+    """(business_id, From) -> lead id, matching on phone_key (raw phone if it doesn't normalize)."""
+    leads = Lead.__table__
+    keyed = {(biz, key) for (biz, _), key in wanted.items() if key}
+    raw = {(biz, number) for (biz, number), key in wanted.items() if not key}
+
+    by_key: Dict[Tuple[int, str], int] = {}
+    by_raw: Dict[Tuple[int, str], int] = {}
+    if keyed:
+        by_key = {
+            (biz, key): lead_id for biz, key, lead_id in db.session.execute(
+                select(leads.c.business_id, leads.c.phone_key, leads.c.id)
+                .where(tuple_(leads.c.business_id, leads.c.phone_key).in_(keyed))
+            )
+        }
+    if raw:
+        by_raw = {
+            (biz, number): lead_id for biz, number, lead_id in db.session.execute(
+                select(leads.c.business_id, leads.c.phone, func.min(leads.c.id))
+                .where(tuple_(leads.c.business_id, leads.c.phone).in_(raw))
+                .group_by(leads.c.business_id, leads.c.phone)
+            )
+        }
+
+    found = {}
+    for (biz, number), key in wanted.items():
+        lead_id = by_key.get((biz, key)) if key else by_raw.get((biz, number))
+        if lead_id is not None:
+            found[(biz, number)] = lead_id
+    return found
+
+
+def _ensure_leads(events: List[Dict[str, str]], now: datetime) -> Dict[Tuple[int, str], int]:
+    """Find or create one lead per (business, sender) in the batch."""
+    wanted = {(int(e["business_id"]), e["from"]): phone_key(e["from"]) for e in events}
+    found = _find_leads(wanted)
+    missing = [k for k in wanted if k not in found]
+    if not missing:
+        return found
+
+    rows = [
+        {"business_id": biz, "phone": number, "phone_key": wanted[(biz, number)], "source": "sms",
+         "status": "new", "priority": "medium", "created_at": now, "updated_at": now}
+        for biz, number in missing
+    ]
+    keyed = [r for r in rows if r["phone_key"]]
+    base = conflict_insert(Lead.__table__)
+    if keyed and base is not None:
+        # A concurrent import or webhook may have created the lead meanwhile
+        db.session.execute(base.on_conflict_do_nothing(index_elements=["business_id", "phone_key"]), keyed)
+        rows = [r for r in rows if not r["phone_key"]]
+    if rows:
+        db.session.execute(insert(Lead.__table__), rows)
+
+    found.update(_find_leads({k: wanted[k] for k in missing}))
+    return found
+
+
+def ensure_sms_conversations(lead_ids: set, now: datetime) -> Dict[int, int]:
+    """lead id -> id of its SMS conversation, creating the missing ones."""
+    convos = Conversation.__table__
+
+    def lookup():
+        return dict(db.session.execute(
+            select(convos.c.lead_id, func.min(convos.c.id))
+            .where(convos.c.lead_id.in_(lead_ids), convos.c.channel == "sms")
+            .group_by(convos.c.lead_id)
+        ).all())
+
+    found = lookup()
+    missing = lead_ids - found.keys()
+    if missing:
+        db.session.execute(insert(convos), [
+            {"lead_id": lead_id, "channel": "sms", "status": "active", "created_at": now, "updated_at": now}
+            for lead_id in missing
+        ])
+        found = lookup()
+    return found
+
+
+def persist_inbound(events: List[Dict[str, str]]) -> int:
+    """
+    Persist a batch of inbound SMS events in one transaction: leads,
+    conversations and messages are each resolved and written set-wise.
+    Returns the number of messages stored.
+    """
+    by_sid: Dict[str, Dict[str, str]] = {}
+    for e in events:
+        if e.get("message_sid"):
+            by_sid.setdefault(e["message_sid"], e)
+        else:
+            log.warning("Dropping inbound SMS event without MessageSid")
+    if not by_sid:
+        return 0
+
+    messages = Message.__table__
+    seen = set(db.session.scalars(select(messages.c.external_id).where(messages.c.external_id.in_(by_sid))))
+    fresh = [e for sid, e in by_sid.items() if sid not in seen]
+    if not fresh:
+        return 0
+
+    now = datetime.utcnow()
+    leads = _ensure_leads(fresh, now)
+    convos = ensure_sms_conversations(set(leads.values()), now)
+
+    rows = []
+    last_at: Dict[int, int] = {}
+    for e in fresh:
+        convo_id = convos[leads[(int(e["business_id"]), e["from"])]]
+        ts = int(e["received_at"])
+        rows.append({
+            "conversation_id": convo_id, "sender": "lead", "content": e["body"], "message_type": "text",
+            "external_id": e["message_sid"], "status": "received", "extra_data": {"to": e["to"]},
+            "ts": ts, "created_at": now, "updated_at": now,
+        })
+        last_at[convo_id] = max(ts, last_at.get(convo_id, 0))
+
+    base = conflict_insert(messages)
+    if base is not None:
+        db.session.execute(base.on_conflict_do_nothing(index_elements=["external_id"]), rows)
+    else:
+        db.session.execute(insert(messages), rows)
+
+    convo_table = Conversation.__table__
+    db.session.execute(
+        update(convo_table).where(convo_table.c.id == bindparam("b_id")).values(last_message_at=bindparam("b_at")),
+        [{"b_id": convo_id, "b_at": datetime.utcfromtimestamp(ts)} for convo_id, ts in last_at.items()],
+    )
+    db.session.commit()
+    return len(rows)
+
+
+def status_event(form, received_at: int) -> Dict[str, object]:
+    """Stream event for a Twilio message status callback."""
+    return {
+        "message_sid": form.get("MessageSid") or form.get("SmsSid", ""),
+        "status": form.get("MessageStatus") or form.get("SmsStatus", ""),
+        "error_code": form.get("ErrorCode", ""),
+        "received_at": received_at,
+    }
+
+
+def persist_statuses(events: List[Dict[str, str]]) -> int:
+    """
+    Apply a batch of status callbacks: keep the most advanced status per
+    MessageSid, then issue one UPDATE per distinct status. Returns the number of
+    messages updated; callbacks for unknown or already further-along messages
+    are no-ops, so replays are harmless.
+    """
+    latest: Dict[str, Dict[str, str]] = {}
+    for e in events:
+        sid, status = e.get("message_sid"), e.get("status")
+        if not sid or status not in STATUS_RANK:
+            log.warning("Dropping SMS status event %r", e)
+            continue
+        current = latest.get(sid)
+        if current is None or (STATUS_RANK[status], int(e["received_at"])) >= (
+                STATUS_RANK[current["status"]], int(current["received_at"])):
+            latest[sid] = e
+    if not latest:
+        return 0
+
+    by_status: Dict[str, List[str]] = {}
+    for sid, e in latest.items():
+        by_status.setdefault(e["status"], []).append(sid)
+
+    messages = Message.__table__
+    now = datetime.utcnow()
+    updated = 0
+    for status, sids in by_status.items():
+        lower = [s for s, rank in STATUS_RANK.items() if rank < STATUS_RANK[status]]
+        updated += db.session.execute(
+            update(messages)
+            .where(messages.c.external_id.in_(sids),
+                   or_(messages.c.status.is_(None), messages.c.status.in_(lower)))
+            .values(status=status, updated_at=now)
+        ).rowcount
+
+    # Error codes (failed/undelivered only) go into extra_data, which has to be merged per row
+    errors = {sid: e["error_code"] for sid, e in latest.items() if e.get("error_code")}
+    if errors:
+        rows = db.session.execute(
+            select(messages.c.id, messages.c.external_id, messages.c.extra_data)
+            .where(messages.c.external_id.in_(errors))
+        ).all()
+        if rows:
+            db.session.execute(
+                update(messages).where(messages.c.id == bindparam("b_id")).values(extra_data=bindparam("b_extra")),
+                [{"b_id": row.id, "b_extra": {**(row.extra_data or {}), "error_code": errors[row.external_id]}}
+                 for row in rows],
+            )
+    db.session.commit()
+    return updated
+
+
+# Streams drained by stream_worker.py, with their batch handlers
+CONSUMERS = [
+    (INBOUND_STREAM, persist_inbound),
+    (STATUS_STREAM, persist_statuses),
+]
@@ -0,0 +1,241 @@
+"""
+Outbound SMS send queue.
+
+API requests and campaigns only write Message rows (status "queued") and
+enqueue send_sms jobs on the "sms" RQ queue; web threads never call Twilio.
+The sms worker (worker.py sms) runs jobs in-process, so the per-tenant Twilio
+clients below, and their keep-alive HTTP sessions, live for the life of the
+worker. Each sender number is throttled across all workers to
+SMS_SENDER_CONCURRENCY in-flight sends and SMS_SENDER_RATE_PER_SEC messages
+per second. Transient Twilio failures are retried with backoff; the outcome
+is recorded on the Message row.
+"""
+
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from redis.exceptions import RedisError
+from rq import Callback, Queue, Retry, get_current_job
+from sqlalchemy import insert, select, update
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from .db import db
+from .models import Business, Lead, Message
+from .redis_pool import get_redis
+from .settings import settings
+from .sms_events import ensure_sms_conversations
+
+log = logging.getLogger(__name__)
+
+sms_queue = Queue("sms", connection=get_redis())
+
+RETRY_INTERVALS = [10, 30, 60, 120, 300]
+ENQUEUE_BATCH = 500
+
+
+class SenderBusy(Exception):
+    """The sender number stayed at its concurrency/rate limit for SMS_THROTTLE_MAX_WAIT seconds."""
+
+
+@dataclass(frozen=True)
+class SenderConfig:
+    account_sid: str
+    auth_token: str
+    from_number: str
+
+
+def sender_for(business_id: int) -> Optional[SenderConfig]:
+    """The business's Twilio credentials and number, falling back to the platform account."""
+    business = db.session.get(Business, business_id)
+    account_sid = (business and business.twilio_account_sid) or os.environ.get("TWILIO_ACCOUNT_SID")
+    auth_token = (business and business.twilio_auth_token) or os.environ.get("TWILIO_AUTH_TOKEN")
+    from_number = (business and business.twilio_phone_number) or os.environ.get("TWILIO_FROM")
+    if not (account_sid and auth_token and from_number):
+        return None
+    return SenderConfig(account_sid, auth_token, from_number)
+
+
+@lru_cache(maxsize=128)
+def client_for(account_sid: str, auth_token: str) -> Client:
+    """One long-lived client (pooled, keep-alive HTTP session) per Twilio account."""
+    http_client = TwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_HTTP_TIMEOUT)
+    return Client(account_sid, auth_token, http_client=http_client)
+
+
+class SenderThrottle:
+    """Cross-worker concurrency and per-second rate limits per sender number, kept in Redis."""
+
+    def __init__(self, prefix: str = "leadnest:sms"):
+        self.prefix = prefix
+
+    def _try_acquire(self, redis, sender: str, holder: str) -> bool:
+        # In-flight sends are a sorted set of holders scored by acquire time; a
+        # holder older than any send can take was leaked by a crashed worker and
+        # is pruned here, however busy the sender is
+        inflight_key = f"{self.prefix}:inflight:{sender}"
+        stale_after = max(int(settings.TWILIO_HTTP_TIMEOUT) * 2, 60)
+        now = time.time()
+        with redis.pipeline() as pipe:
+            pipe.zremrangebyscore(inflight_key, "-inf", now - stale_after)
+            pipe.zadd(inflight_key, {holder: now})
+            pipe.zcard(inflight_key)
+            pipe.expire(inflight_key, stale_after)
+            inflight = pipe.execute()[2]
+        if inflight > settings.SMS_SENDER_CONCURRENCY:
+            redis.zrem(inflight_key, holder)
+            return False
+
+        rate_key = f"{self.prefix}:rate:{sender}:{int(now)}"
+        with redis.pipeline() as pipe:
+            pipe.incr(rate_key)
+            pipe.expire(rate_key, 2)
+            sent_this_second = pipe.execute()[0]
+        if sent_this_second > settings.SMS_SENDER_RATE_PER_SEC:
+            redis.zrem(inflight_key, holder)
+            # Wait for the next one-second window
+            time.sleep(1 - time.time() % 1)
+            return False
+        return True
+
+    @contextmanager
+    def slot(self, sender: str):
+        redis = get_redis()
+        holder = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.SMS_THROTTLE_MAX_WAIT
+        while not self._try_acquire(redis, sender, holder):
+            if time.monotonic() > deadline:
+                raise SenderBusy(sender)
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            redis.zrem(f"{self.prefix}:inflight:{sender}", holder)
+
+
+throttle = SenderThrottle()
+
+
+def _enqueue_sends(message_ids: List[int]) -> None:
+    # One Redis pipeline per ENQUEUE_BATCH jobs keeps campaign enqueueing to a few round-trips
+    for start in range(0, len(message_ids), ENQUEUE_BATCH):
+        sms_queue.enqueue_many([
+            Queue.prepare_data(
+                send_sms, args=(message_id,), timeout=settings.SMS_SEND_JOB_TIMEOUT,
+                retry=Retry(max=len(RETRY_INTERVALS), interval=RETRY_INTERVALS),
+                on_failure=Callback(mark_send_failed),
+            )
+            for message_id in message_ids[start:start + ENQUEUE_BATCH]
+        ])
+
+
+def queue_sms(business_id: int, lead_ids: Iterable[int], body: str, sender: str = "user") -> Dict[int, int]:
+    """
+    Record one queued Message per lead (in its SMS conversation) and enqueue the
+    sends. Leads without a phone are skipped. Returns {lead_id: message_id}.
+    """
+    leads = Lead.__table__
+    phones = dict(db.session.execute(
+        select(leads.c.id, leads.c.phone)
+        .where(leads.c.id.in_(set(lead_ids)), leads.c.business_id == business_id, leads.c.phone.isnot(None))
+    ).all())
+    if not phones:
+        return {}
+
+    now = datetime.utcnow()
+    convos = ensure_sms_conversations(set(phones), now)
+    ts = int(time.time())
+    messages = Message.__table__
+    rows = db.session.execute(
+        insert(messages).returning(messages.c.id, messages.c.conversation_id),
+        [
+            {"conversation_id": convos[lead_id], "sender": sender, "content": body, "message_type": "text",
+             "status": "queued", "extra_data": {"to": phone, "business_id": business_id},
+             "ts": ts, "created_at": now, "updated_at": now}
+            for lead_id, phone in phones.items()
+        ],
+    ).all()
+    db.session.commit()
+
+    lead_by_convo = {convo_id: lead_id for lead_id, convo_id in convos.items()}
+    message_ids = {lead_by_convo[convo_id]: message_id for message_id, convo_id in rows}
+    try:
+        _enqueue_sends(list(message_ids.values()))
+    except RedisError:
+        # Nothing will send these; don't leave them looking queued
+        db.session.execute(
+            update(messages).where(messages.c.id.in_(message_ids.values()))
+            .values(status="failed", updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        raise
+    return message_ids
+
+
+def _record(message: Message, status: str, **details) -> None:
+    message.status = status
+    message.extra_data = {**(message.extra_data or {}), **details}
+    db.session.commit()
+
+
+def send_sms(message_id: int) -> Dict[str, Optional[str]]:
+    """
+    RQ job: send one queued Message through its business's Twilio client.
+    Raises on transient failures (rate limiting, 5xx, network) so RQ retries;
+    permanent rejections are recorded on the Message and not retried.
+    """
+    message = db.session.get(Message, message_id)
+    if message is None:
+        return {"status": "missing"}
+    if message.external_id:
+        # Already accepted by Twilio on an earlier attempt
+        return {"status": message.status, "sid": message.external_id}
+
+    extra = message.extra_data or {}
+    config = sender_for(extra.get("business_id", 1))
+    if config is None:
+        _record(message, "failed", error_message="Twilio not configured")
+        return {"status": "failed"}
+
+    job = get_current_job()
+    attempt = 1
+    if job is not None and job.retries_left is not None:
+        attempt += len(RETRY_INTERVALS) - job.retries_left
+    client = client_for(config.account_sid, config.auth_token)
+    # Delivery receipts come back through /twilio/status
+    status_callback = {}
+    if settings.TWILIO_STATUS_CALLBACK_URL:
+        status_callback["status_callback"] = settings.TWILIO_STATUS_CALLBACK_URL
+    try:
+        with throttle.slot(config.from_number):
+            sent = client.messages.create(body=message.content, from_=config.from_number, to=extra["to"],
+                                          **status_callback)
+    except TwilioRestException as e:
+        if e.status == 429 or e.status >= 500:
+            _record(message, "queued", attempts=attempt, error_code=e.code, error_message=e.msg)
+            raise
+        _record(message, "failed", attempts=attempt, error_code=e.code, error_message=e.msg)
+        return {"status": "failed", "error_code": e.code}
+
+    message.external_id = sent.sid
+    _record(message, sent.status or "sent", attempts=attempt, **{"from": config.from_number},
+            provider_status=sent.status, error_code=None, error_message=None)
+    return {"status": message.status, "sid": sent.sid}
+
+
+def mark_send_failed(job, connection, exc_type, exc_value, traceback) -> None:
+    """RQ failure callback: once retries are exhausted, mark the Message failed."""
+    if job.retries_left:
+        return
+    db.session.rollback()
+    message = db.session.get(Message, job.args[0])
+    if message is not None and not message.external_id:
+        _record(message, "failed", error_message=str(exc_value)[:500])
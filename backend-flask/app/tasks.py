@@ -1,79 +1,434 @@
-import csv, io, os
-from datetime import datetime
-from typing import List, Dict, Any
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 
-from redis import Redis
-from rq import Queue
+from rq import Queue, get_current_job
+from rq.job import Dependency, Job
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, select, tuple_, update
 
 from .db import db
-from .models import Lead, IdempotencyKey
+from .redis_pool import get_redis
+from .models import IdempotencyKey, Lead
+from .lead_keys import email_key, phone_key
+from .lead_import import (
+    CHUNK_SIZE, discard_spool, discard_stash, fetch_spool, iter_csv_rows, partition_spool, stash_spool, upsert_leads,
+)
+from .lead_scoring import due_rows, next_rescore_due, rescore_batch, scoring_rows
+from .metrics_rollup import refresh_daily_metrics
+from .settings import settings
+from .workers.roi_worker import fleet_period_end, roi_worker
 
-# One queue, shared by web/worker via REDIS_URL
-redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
-redis_conn = Redis.from_url(redis_url)
+log = logging.getLogger(__name__)
+
+# One queue, shared by web/worker via REDIS_URL, on the process-wide pool
+redis_conn = get_redis()
 queue = Queue(connection=redis_conn)
 
-CHUNK_SIZE = 500
+class ImportProgress:
+    """
+    upsert_leads on_chunk hook: publishes rows processed, rows/sec, chunk
+    commit latency and an ETA into the running job's meta after every chunk.
+    """
 
-def enqueue_bulk_import(csv_content: str, idempotency_key: str | None) -> str:
-    """Enqueue bulk CSV import. Returns RQ job id."""
-    job = queue.enqueue(process_bulk_import, csv_content, idempotency_key, timeout="30m")
-    return job.id
+    def __init__(self, job: Optional[Job], expected_rows: int = 0):
+        self.job = job
+        self.expected_rows = expected_rows
+        self.started = time.monotonic()
+        self.chunks = 0
+        self.commit_ms_total = 0.0
 
-def _normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
-    return {
-        "full_name": (row.get("full_name") or "").strip() or None,
-        "email": (row.get("email") or "").strip().lower() or None,
-        "phone": (row.get("phone") or "").strip() or None,
-        "source": (row.get("source") or "bulk").strip() or "bulk",
-        "status": (row.get("status") or "new").strip() or "new",
-        "business_id": 1,
-    }
-
-def process_bulk_import(csv_content: str, idempotency_key: str | None) -> Dict[str, Any]:
-    """Process a CSV import in the background (chunks, upserts)."""
-    reader = csv.DictReader(io.StringIO(csv_content))
-    rows = list(reader)
-
-    created = 0
-    updated = 0
-    errors: List[str] = []
+    def __call__(self, stats: Dict[str, Any]) -> None:
+        if self.job is None:
+            return
+        self.chunks += 1
+        self.commit_ms_total += stats["commit_ms"]
 
-    for i in range(0, len(rows), CHUNK_SIZE):
-        chunk = rows[i : i + CHUNK_SIZE]
-        for j, row in enumerate(chunk):
-            idx = i + j + 1
-            try:
-                data = _normalize_row(row)
-                if not any([data["full_name"], data["email"], data["phone"]]):
-                    continue
-
-                existing = None
-                if data["email"]:
-                    existing = Lead.query.filter_by(email=data["email"]).first()
-                if not existing and data["phone"]:
-                    existing = Lead.query.filter_by(phone=data["phone"]).first()
-
-                if existing:
-                    for k, v in data.items():
-                        if v is not None:
-                            setattr(existing, k, v)
-                    existing.updated_at = datetime.utcnow()
-                    updated += 1
-                else:
-                    db.session.add(Lead(**data))
-                    created += 1
-            except Exception as e:
-                errors.append(f"Row {idx}: {e}")
+        elapsed = time.monotonic() - self.started
+        rows = stats["rows_processed"]
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if rate > 0 and self.expected_rows > rows:
+            eta = round((self.expected_rows - rows) / rate, 1)
 
-        db.session.commit()
+        self.job.meta["progress"] = {
+            "rows_processed": rows,
+            "expected_rows": self.expected_rows or None,
+            "created": stats["created"],
+            "updated": stats["updated"],
+            "duplicates": stats["duplicates"],
+            "errors": stats["errors"],
+            "rows_per_sec": round(rate, 1),
+            "last_chunk_commit_ms": round(stats["commit_ms"], 1),
+            "avg_chunk_commit_ms": round(self.commit_ms_total / self.chunks, 1),
+            "eta_seconds": eta,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        self.job.save_meta()
 
-    result = {"created": created, "updated": updated, "errors": errors, "total_rows": len(rows)}
+def enqueue_bulk_import(spool_key: str, business_id: int, idempotency_key: str | None, estimated_rows: int = 0) -> str:
+    """Enqueue bulk CSV import of a stashed upload (see stash_spool) into a business. Returns RQ job id."""
+    job = queue.enqueue(process_bulk_import, spool_key, business_id, idempotency_key, estimated_rows,
+                        job_timeout="30m")
+    return job.id
 
+def _store_idempotent_result(idempotency_key: str | None, result: Dict[str, Any]) -> None:
     if idempotency_key:
         rec = IdempotencyKey.query.filter_by(key=idempotency_key).first()
         if rec:
-            rec.response_data = result
+            # Same shape as the inline /api/leads/bulk response
+            rec.response_data = {k: v for k, v in result.items() if k != "duplicates"}
             db.session.commit()
 
+def process_bulk_import(spool_key: str, business_id: int, idempotency_key: str | None,
+                        estimated_rows: int = 0) -> Dict[str, Any]:
+    """
+    Fetch a stashed CSV to local disk and stream it through the chunked upsert
+    engine, then drop both copies. Large files are fanned out to partition jobs
+    instead (see _fan_out).
+    """
+    job = get_current_job()
+    if job is not None and settings.IMPORT_PARTITIONS > 1 and estimated_rows >= settings.IMPORT_PARTITION_THRESHOLD:
+        return _fan_out(job, spool_key, business_id, idempotency_key)
+
+    spool_path = fetch_spool(spool_key)
+    try:
+        result = upsert_leads(iter_csv_rows(spool_path), business_id=business_id, chunk_size=CHUNK_SIZE,
+                              on_chunk=ImportProgress(job, estimated_rows))
+    finally:
+        discard_spool(spool_path)
+        discard_stash(spool_key)
+
+    _store_idempotent_result(idempotency_key, result)
+    enqueue_rescore(business_id)
+    return result
+
+def _fan_out(job: Job, spool_key: str, business_id: int, idempotency_key: str | None) -> Dict[str, Any]:
+    """
+    Split the upload into partitions keyed by lead phone/email, stash each one
+    and enqueue one job per partition and an aggregate job that runs once they
+    have all ended. Partition and aggregate job ids are kept in this job's meta
+    for /api/jobs.
+    """
+    spool_path = fetch_spool(spool_key)
+    try:
+        paths = partition_spool(spool_path, settings.IMPORT_PARTITIONS)
+    finally:
+        discard_spool(spool_path)
+
+    stashed = []
+    try:
+        for path, rows in paths:
+            stashed.append((stash_spool(path), rows))
+    finally:
+        for path, _ in paths:
+            discard_spool(path)
+    discard_stash(spool_key)
+
+    children = [
+        queue.enqueue(process_import_partition, key, business_id, rows, job_timeout="30m", meta={"parent_id": job.id})
+        for key, rows in stashed
+    ]
+    child_ids = [c.id for c in children]
+    aggregate = queue.enqueue(
+        aggregate_bulk_import, child_ids, business_id, idempotency_key,
+        depends_on=Dependency(jobs=children, allow_failure=True) if children else None,
+        job_timeout="5m",
+        meta={"parent_id": job.id},
+    )
+
+    job.meta.update({"partition_job_ids": child_ids, "aggregate_job_id": aggregate.id})
+    job.save_meta()
+    return {"status": "partitioned", "partitions": len(child_ids), "aggregate_job_id": aggregate.id}
+
+def process_import_partition(spool_key: str, business_id: int, expected_rows: int = 0) -> Dict[str, Any]:
+    """Import one partition stashed by _fan_out."""
+    spool_path = fetch_spool(spool_key)
+    try:
+        return upsert_leads(iter_csv_rows(spool_path), business_id=business_id, chunk_size=CHUNK_SIZE,
+                            on_chunk=ImportProgress(get_current_job(), expected_rows))
+    finally:
+        discard_spool(spool_path)
+        discard_stash(spool_key)
+
+def aggregate_bulk_import(partition_job_ids: List[str], business_id: int,
+                          idempotency_key: str | None) -> Dict[str, Any]:
+    """Sum partition results into the usual bulk import response."""
+    created = updated = duplicates = total_rows = 0
+    errors: List[str] = []
+
+    jobs = Job.fetch_many(partition_job_ids, connection=redis_conn)
+    for i, child in enumerate(jobs, start=1):
+        if child is None:
+            errors.append(f"Partition {i}: job expired")
+            continue
+        if not child.is_finished:
+            errors.append(f"Partition {i}: {child.get_status()}")
+            continue
+        res = child.return_value() or {}
+        created += res.get("created", 0)
+        updated += res.get("updated", 0)
+        duplicates += res.get("duplicates", 0)
+        total_rows += res.get("total_rows", 0)
+        errors.extend(f"Partition {i}: {e}" for e in res.get("errors", []))
+
+    result = {"created": created, "updated": updated, "duplicates": duplicates, "errors": errors,
+              "total_rows": total_rows, "partitions": len(partition_job_ids)}
+    _store_idempotent_result(idempotency_key, result)
+    enqueue_rescore(business_id)
     return result
+
+def enqueue_lead_key_backfill(batch_size: int = 1000) -> str:
+    """Enqueue backfill_lead_keys. Returns RQ job id."""
+    job = queue.enqueue(backfill_lead_keys, batch_size, job_timeout="2h")
+    return job.id
+
+def backfill_lead_keys(batch_size: int = 1000, after_id: int = 0) -> Dict[str, Any]:
+    """
+    Populate Lead.phone_key/email_key for rows written before the key columns
+    existed, walking leads by id and committing once per batch. The oldest lead
+    keeps a contested key; later duplicates are left without it and their ids
+    reported for manual merge. Safe to re-run (rows already in sync are skipped),
+    and `after_id` resumes from the last id in the job's progress meta.
+    """
+    job = get_current_job()
+    leads = Lead.__table__
+    scanned = updated = 0
+    duplicates: set = set()
+    last_id = after_id
+
+    while True:
+        rows = db.session.execute(
+            select(leads.c.id, leads.c.business_id, leads.c.phone, leads.c.email,
+                   leads.c.phone_key, leads.c.email_key)
+            .where(leads.c.id > last_id).order_by(leads.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        pending = []
+        for r in rows:
+            keys = {"phone_key": phone_key(r.phone), "email_key": email_key(r.email)}
+            if (keys["phone_key"], keys["email_key"]) != (r.phone_key, r.email_key):
+                pending.append({"b_id": r.id, "business_id": r.business_id, "stored": (r.phone_key, r.email_key), **keys})
+        if pending:
+            for col in ("phone_key", "email_key"):
+                pairs = {(p["business_id"], p[col]) for p in pending if p[col]}
+                owners = {}
+                if pairs:
+                    owners = {
+                        (biz, key): lead_id for biz, key, lead_id in db.session.execute(
+                            select(leads.c.business_id, leads.c[col], leads.c.id)
+                            .where(tuple_(leads.c.business_id, leads.c[col]).in_(pairs))
+                        )
+                    }
+                for p in pending:
+                    owner = owners.setdefault((p["business_id"], p[col]), p["b_id"]) if p[col] else None
+                    if owner is not None and owner != p["b_id"]:
+                        p[col] = None
+                        duplicates.add(p["b_id"])
+
+            # Duplicates may end up with the keys they already had
+            pending = [p for p in pending if (p["phone_key"], p["email_key"]) != p["stored"]]
+        if pending:
+            db.session.execute(
+                update(leads).where(leads.c.id == bindparam("b_id"))
+                .values(phone_key=bindparam("phone_key"), email_key=bindparam("email_key")),
+                [{"b_id": p["b_id"], "phone_key": p["phone_key"], "email_key": p["email_key"]} for p in pending],
+            )
+            updated += len(pending)
+        db.session.commit()
+
+        if job is not None:
+            job.meta["progress"] = {"last_id": last_id, "scanned": scanned, "updated": updated,
+                                    "duplicates": len(duplicates)}
+            job.save_meta()
+
+    if duplicates:
+        log.warning("Lead key backfill left %d duplicate leads unkeyed", len(duplicates))
+    return {"scanned": scanned, "updated": updated, "last_id": last_id, "duplicates": sorted(duplicates)}
+
+def enqueue_rescore(business_id: Optional[int] = None) -> Optional[str]:
+    """
+    Enqueue rescore_leads (one business, or all). Returns the RQ job id, or None
+    if Redis is unavailable; the next periodic sweep (rescore_sweep) catches up.
+    """
+    try:
+        return queue.enqueue(rescore_leads, business_id, job_timeout="2h").id
+    except RedisError:
+        log.warning("Could not enqueue lead rescore for business %s", business_id)
+        return None
+
+def rescore_leads(business_id: Optional[int] = None, batch_size: int = 1000, after_id: int = 0) -> Dict[str, Any]:
+    """
+    Walk leads by id (one business, or all) and rescore those whose inputs,
+    AIScoringConfig, scorer version or recency multiplier changed since they
+    were last scored, committing once per batch. Unchanged leads are only read.
+    `after_id` resumes from the last id in the job's progress meta.
+    """
+    job = get_current_job()
+    leads = Lead.__table__
+    scanned = rescored = 0
+    last_id = after_id
+
+    while True:
+        query = scoring_rows().where(leads.c.id > last_id)
+        if business_id is not None:
+            query = query.where(leads.c.business_id == business_id)
+        rows = db.session.execute(query.order_by(leads.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+        rescored += rescore_batch(rows)
+        db.session.commit()
+
+        if job is not None:
+            job.meta["progress"] = {"last_id": last_id, "scanned": scanned, "rescored": rescored}
+            job.save_meta()
+
+    schedule_rescore_due()
+    return {"scanned": scanned, "rescored": rescored, "last_id": last_id}
+
+def schedule_rescore_due() -> Optional[str]:
+    """
+    Schedule rescore_due for the next time a scored lead changes recency bucket
+    (needs a worker running the RQ scheduler). Runs for the same time share a
+    job id, so rescheduling doesn't pile up jobs. Returns the job id, if any.
+    """
+    when = next_rescore_due()
+    if when is None:
+        return None
+    when = when.replace(tzinfo=timezone.utc)
+    try:
+        return queue.enqueue_at(when, rescore_due, job_id=f"rescore-due-{int(when.timestamp())}",
+                                job_timeout="1h").id
+    except RedisError:
+        log.warning("Could not schedule due lead rescore")
+        return None
+
+def rescore_due(batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Rescore only the leads whose recency boundary has passed, walking the
+    next_rescore_at index, then schedule the next run.
+    """
+    now = datetime.now(timezone.utc)
+    scanned = rescored = 0
+    after = None
+
+    while True:
+        rows = db.session.execute(due_rows(now, after).limit(batch_size)).all()
+        if not rows:
+            break
+        after = (rows[-1].next_rescore_at, rows[-1].score_id)
+        scanned += len(rows)
+        rescored += rescore_batch(rows, now)
+        db.session.commit()
+
+    schedule_rescore_due()
+    return {"scanned": scanned, "rescored": rescored}
+
+def schedule_rescore_sweep() -> Optional[str]:
+    """
+    Schedule rescore_sweep for the next LEAD_RESCORE_INTERVAL_SECONDS boundary
+    (needs a worker running the RQ scheduler). Slot-aligned like
+    schedule_metrics_rollup, so restarts don't start a second chain.
+    Returns the job id, if any.
+    """
+    interval = max(settings.LEAD_RESCORE_INTERVAL_SECONDS, 1)
+    slot = (int(time.time()) // interval + 1) * interval
+    when = datetime.fromtimestamp(slot, timezone.utc)
+    try:
+        return queue.enqueue_at(when, rescore_sweep, job_id=f"lead-rescore-{slot}", job_timeout="2h").id
+    except RedisError:
+        log.warning("Could not schedule lead rescore sweep")
+        return None
+
+def rescore_sweep(reschedule: bool = True) -> Dict[str, Any]:
+    """
+    Rescore every business's changed leads, then schedule the next sweep.
+    Catches leads no write path enqueued a rescore for (inbound SMS, seeded
+    demos) and AIScoringConfig changes.
+    """
+    try:
+        return rescore_leads()
+    finally:
+        if reschedule:
+            schedule_rescore_sweep()
+
+def schedule_metrics_rollup() -> Optional[str]:
+    """
+    Schedule rollup_metrics for the next METRICS_ROLLUP_INTERVAL_SECONDS
+    boundary (needs a worker running the RQ scheduler). Runs are aligned to
+    the interval and share a job id per slot, so a restarted worker joins the
+    existing schedule instead of starting a second one. Returns the job id, if any.
+    """
+    interval = max(settings.METRICS_ROLLUP_INTERVAL_SECONDS, 1)
+    slot = (int(time.time()) // interval + 1) * interval
+    when = datetime.fromtimestamp(slot, timezone.utc)
+    try:
+        return queue.enqueue_at(when, rollup_metrics, job_id=f"metrics-rollup-{slot}", job_timeout="30m").id
+    except RedisError:
+        log.warning("Could not schedule daily metrics rollup")
+        return None
+
+def rollup_metrics(reschedule: bool = True) -> Dict[str, Any]:
+    """
+    Bring the daily ROI rollups up to date, one committed batch at a time
+    until the sources are caught up, then schedule the next run.
+    """
+    scanned = cells = 0
+    try:
+        while True:
+            result = refresh_daily_metrics()
+            scanned += result["scanned"]
+            cells += result["cells"]
+            if not result["more"]:
+                break
+    finally:
+        # A failed pass mustn't stop the schedule; the watermarks resume where it left off
+        if reschedule:
+            schedule_metrics_rollup()
+    return {"scanned": scanned, "cells": cells}
+
+def enqueue_roi_fleet(period_end: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Fan the nightly ROI reports out as one roi_fleet_range job per business-id
+    range, plus an aggregate job that runs once they have all ended. Enqueuing
+    again for the same period resumes each range from its checkpoint.
+    """
+    period_end = period_end or fleet_period_end()
+    stamp = period_end.strftime("%Y%m%d")
+    children = [
+        queue.enqueue(roi_fleet_range, first_id, last_id, period_end,
+                      job_id=f"roi-fleet-{stamp}-{first_id}", job_timeout="1h")
+        for first_id, last_id in roi_worker.fleet_ranges()
+    ]
+    aggregate = queue.enqueue(
+        aggregate_roi_fleet, [c.id for c in children],
+        depends_on=Dependency(jobs=children, allow_failure=True) if children else None,
+        job_timeout="5m",
+    )
+    return {"ranges": len(children), "aggregate_job_id": aggregate.id}
+
+def roi_fleet_range(first_id: int, last_id: int, period_end: datetime) -> Dict[str, Any]:
+    """ROI reports for one business-id range (see ROICalculationWorker.calculate_roi_range)."""
+    return roi_worker.calculate_roi_range(first_id, last_id, period_end)
+
+def aggregate_roi_fleet(range_job_ids: List[str]) -> Dict[str, Any]:
+    """Sum the range results; failed ranges are listed for a rerun, which resumes them."""
+    businesses = reports = 0
+    failed: List[str] = []
+    for job_id, child in zip(range_job_ids, Job.fetch_many(range_job_ids, connection=redis_conn)):
+        if child is None or not child.is_finished:
+            failed.append(job_id)
+            continue
+        res = child.return_value() or {}
+        businesses += res.get("businesses", 0)
+        reports += res.get("reports", 0)
+    if failed:
+        log.warning("ROI fleet run left %d ranges unfinished", len(failed))
+    return {"businesses": businesses, "reports": reports, "failed_ranges": failed}
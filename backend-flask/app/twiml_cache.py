@@ -0,0 +1,112 @@
+"""
+Per-process caches for the Twilio webhook hot path.
+
+validator_for() reuses one RequestValidator per auth token, and reply() returns
+TwiML pre-rendered to bytes per (business, template), so a webhook does no
+object construction or XML serialization. Rendered replies are dropped in every
+process when a business changes its auto-reply settings (invalidate()).
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from twilio.request_validator import RequestValidator
+from twilio.twiml.messaging_response import MessagingResponse
+
+from . import invalidation
+from .db import db
+from .models import OnboardingProgress, User
+
+log = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "leadnest:twiml"
+
+# Default reply text per template; a business's auto-reply settings override "auto_reply"
+TEMPLATES = {
+    "auto_reply": "Thanks! We got your message and will reply shortly.",
+}
+
+
+@lru_cache(maxsize=256)
+def validator_for(auth_token: str) -> RequestValidator:
+    return RequestValidator(auth_token)
+
+
+def render_twiml(text: Optional[str]) -> bytes:
+    """TwiML bytes replying with `text`; an empty <Response/> (no reply) for None."""
+    resp = MessagingResponse()
+    if text:
+        resp.message(text)
+    return str(resp).encode()
+
+
+def auto_reply_settings(business_id: int) -> Dict:
+    """Most recent enable_auto_reply onboarding data for any user of the business."""
+    progress = (
+        OnboardingProgress.query.join(User, OnboardingProgress.user_id == User.id)
+        .filter(User.business_id == business_id, OnboardingProgress.step == "enable_auto_reply")
+        .order_by(OnboardingProgress.completed_at.desc())
+        .first()
+    )
+    return (progress.data or {}) if progress else {}
+
+
+class TwimlCache:
+    def __init__(self, listen: bool = True):
+        self.listen = listen
+        self._rendered: Dict[Tuple[int, str], bytes] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        if listen:
+            invalidation.on(INVALIDATE_CHANNEL, self._drop)
+
+    def reply(self, business_id: int, template: str = "auto_reply") -> bytes:
+        if self.listen:
+            invalidation.ensure_listening()
+        key = (business_id, template)
+        body = self._rendered.get(key)
+        if body is None:
+            body = self._render(business_id, template)
+        return body
+
+    def _render(self, business_id: int, template: str) -> bytes:
+        generation = self._generation
+        text = TEMPLATES[template]
+        if template == "auto_reply":
+            try:
+                prefs = auto_reply_settings(business_id)
+            except Exception:
+                # Serve the default now, but don't cache it; retry on the next webhook
+                db.session.rollback()
+                log.exception("Loading auto-reply settings for business %s failed", business_id)
+                return render_twiml(text)
+            if prefs.get("enabled") is False:
+                text = None
+            else:
+                text = (prefs.get("message") or "").strip() or text
+
+        body = render_twiml(text)
+        with self._lock:
+            # Skip caching if an invalidation landed while settings were being read
+            if generation == self._generation:
+                self._rendered[(business_id, template)] = body
+        return body
+
+    def invalidate(self, business_id: Optional[int] = None) -> None:
+        """Drop a business's rendered replies (all, if None) here and in every other process."""
+        self._drop(None if business_id is None else str(business_id))
+        invalidation.publish(INVALIDATE_CHANNEL, "*" if business_id is None else str(business_id))
+
+    def _drop(self, message: Optional[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            if message in (None, "*"):
+                self._rendered.clear()
+            else:
+                for key in [k for k in self._rendered if str(k[0]) == message]:
+                    del self._rendered[key]
+
+
+twiml_cache = TwimlCache()
@@ -1,17 +1,35 @@
 """
 ROI Calculation Worker for Launch Multiplier.
 Handles automated ROI calculations, progress tracking, and insights generation.
+
+The nightly fleet refresh works in business-id ranges of ROI_FLEET_RANGE_SIZE
+(one RQ job each, see tasks.enqueue_roi_fleet). A range is walked in batches
+of ROI_FLEET_BATCH_SIZE businesses: one set of grouped ROI queries per batch,
+the ROIReport and ActivityLog rows bulk-inserted, and the range's checkpoint
+advanced in the same transaction, so a crashed run picks up after the last
+committed batch when it is started again for the same day.
 """
 
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, insert, select
 from ..db import db
-from ..models import Business, ROIReport, ActivityLog, User
+from ..models import Business, ROIReport, ActivityLog, RollupWatermark, User
+from ..metrics_rollup import daily_series
+from ..response_cache import response_cache
+from ..roi_metrics import roi_metrics
+from ..settings import settings
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+ROI_PERIOD_DAYS = 30
+
+
+def fleet_period_end(day=None):
+    """A fleet run's period end: midnight (UTC) starting `day`, today by default."""
+    return datetime.combine(day or datetime.utcnow().date(), time.min)
+
 
 class ROICalculationWorker:
     """Worker class for ROI calculations and insights."""
@@ -29,50 +47,31 @@ class ROICalculationWorker:
             
             # Get date range (last 30 days by default)
             end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=30)
+            start_date = end_date - timedelta(days=ROI_PERIOD_DAYS)
             
             # Calculate metrics
             metrics = self._calculate_metrics(business, start_date, end_date)
             
-            # Create or update ROI calculation record
+            # Update today's report, or start a new one (ix_roi_reports_business_created)
             roi_calc = ROIReport.query.filter_by(
-                business_id=business_id,
-                calculation_type='monthly'
-            ).order_by(ROIReport.calculated_at.desc()).first()
+                business_id=business_id
+            ).order_by(ROIReport.created_at.desc()).first()
             
             if not roi_calc or self._should_recalculate(roi_calc):
-                roi_calc = ROIReport(
-                    business_id=business_id,
-                    calculation_type='monthly'
-                )
+                roi_calc = ROIReport(business_id=business_id)
                 db.session.add(roi_calc)
             
             # Update ROI calculation
             roi_calc.period_start = start_date
             roi_calc.period_end = end_date
-            roi_calc.estimated_revenue = metrics['total_revenue']
-            roi_calc.total_cost = metrics['total_cost']
-            roi_calc.roi_percentage = metrics['roi_percentage']
-            roi_calc.leads_received = metrics['lead_count']
-            roi_calc.deals_closed = int(metrics['lead_count'] * (business.close_rate or 0.15))
-            roi_calc.calculated_at = datetime.utcnow()
+            for column, value in self._report_values(metrics).items():
+                setattr(roi_calc, column, value)
             
             # Log activity
-            activity = ActivityLog(
-                business_id=business_id,
-                action='roi_calculated',
-                description=f'ROI calculated: {metrics["roi_percentage"]:.1f}% ROI',
-                extra_data={
-                    'roi_percentage': metrics['roi_percentage'],
-                    'total_revenue': float(metrics['total_revenue']),
-                    'net_profit': float(metrics['net_profit']),
-                    'lead_count': metrics['lead_count']
-                },
-                source='worker'
-            )
-            db.session.add(activity)
+            db.session.add(ActivityLog(**self._activity_values(business_id, metrics)))
             
             db.session.commit()
+            response_cache.invalidate('roi_status', [business_id])
             
             self.logger.info(f"ROI calculated for business {business_id}: {metrics['roi_percentage']:.1f}%")
             return roi_calc
@@ -83,41 +82,27 @@ class ROICalculationWorker:
             return None
     
     def _calculate_metrics(self, business, start_date, end_date):
-        """Calculate ROI metrics for a business in a date range."""
-        # Use business settings for calculations
-        avg_deal_size = business.avg_deal_size or 5000.0
-        close_rate = business.close_rate or 0.15
-        cost_per_lead = business.cost_per_lead or 50.0
-        
-        # For demo purposes, generate realistic metrics
-        # In production, this would query actual data from leads/deals tables
-        
-        # Simulate lead activity based on business age and size
-        days_in_period = (end_date - start_date).days
-        base_leads_per_day = 3  # Conservative estimate
-        
-        # Simulate some variance
-        import random
-        random.seed(business.id)  # Consistent results per business
-        
-        lead_count = int(days_in_period * base_leads_per_day * random.uniform(0.7, 1.3))
-        lead_count = max(lead_count, 1)  # At least 1 lead
-        
-        # Calculate metrics
-        total_cost = lead_count * cost_per_lead
-        deals_closed = int(lead_count * close_rate)
-        total_revenue = deals_closed * avg_deal_size
+        """Calculate ROI metrics for a business in a date range from its leads, bookings, messages and calls."""
+        roi = roi_metrics([business.id], start_date, end_date)[business.id]
+        return self._summarize(roi, with_insights=True)
+    
+    def _summarize(self, roi, with_insights=False):
+        """Report figures for an ROIMetrics; insights are only generated for API use."""
+        lead_count = roi.leads_uploaded
+        total_cost = roi.total_cost
+        total_revenue = roi.revenue_generated
         net_profit = total_revenue - total_cost
         
         roi_percentage = (net_profit / total_cost * 100) if total_cost > 0 else 0
-        conversion_rate = close_rate * 100
+        conversion_rate = roi.conversion_rate * 100
+        cost_per_lead = roi.cost_per_lead
         revenue_per_lead = total_revenue / lead_count if lead_count > 0 else 0
         
         # Generate insights (for API use, not stored in model)
         insights = self._generate_insights(
             roi_percentage, conversion_rate, cost_per_lead, 
-            revenue_per_lead, lead_count, deals_closed
-        )
+            revenue_per_lead, lead_count, roi.deals_closed
+        ) if with_insights else []
         
         return {
             'total_revenue': total_revenue,
@@ -125,12 +110,42 @@ class ROICalculationWorker:
             'net_profit': net_profit,
             'roi_percentage': roi_percentage,
             'lead_count': lead_count,
+            'leads_responded': roi.leads_responded,
+            'appointments_booked': roi.appointments_booked,
+            'deals_closed': roi.deals_closed,
             'conversion_rate': conversion_rate,
             'cost_per_lead': cost_per_lead,
             'revenue_per_lead': revenue_per_lead,
             'insights': insights
         }
     
+    def _report_values(self, metrics):
+        """ROIReport columns for a _summarize result."""
+        return {
+            'estimated_revenue': metrics['total_revenue'],
+            'total_cost': metrics['total_cost'],
+            'roi_percentage': metrics['roi_percentage'],
+            'leads_received': metrics['lead_count'],
+            'leads_responded': metrics['leads_responded'],
+            'calls_booked': metrics['appointments_booked'],
+            'deals_closed': metrics['deals_closed'],
+        }
+    
+    def _activity_values(self, business_id, metrics):
+        """The roi_calculated ActivityLog entry for a _summarize result."""
+        return {
+            'business_id': business_id,
+            'action': 'roi_calculated',
+            'description': f'ROI calculated: {metrics["roi_percentage"]:.1f}% ROI',
+            'extra_data': {
+                'roi_percentage': metrics['roi_percentage'],
+                'total_revenue': float(metrics['total_revenue']),
+                'net_profit': float(metrics['net_profit']),
+                'lead_count': metrics['lead_count']
+            },
+            'source': 'worker'
+        }
+    
     def _generate_insights(self, roi_percentage, conversion_rate, cost_per_lead, 
                           revenue_per_lead, lead_count, deals_closed):
         """Generate actionable insights based on ROI metrics."""
@@ -204,60 +219,113 @@ class ROICalculationWorker:
     
     def _should_recalculate(self, roi_calc):
         """Determine if ROI should be recalculated."""
-        if not roi_calc.calculated_at:
+        if not roi_calc.created_at:
             return True
         
-        # Recalculate if more than 24 hours old
-        return datetime.utcnow() - roi_calc.calculated_at > timedelta(hours=24)
+        # Start a new report if the latest is more than 24 hours old
+        return datetime.utcnow() - roi_calc.created_at > timedelta(hours=24)
     
-    def calculate_roi_for_all_active_businesses(self):
-        """Calculate ROI for all businesses that need updates."""
-        try:
-            # Get businesses that need ROI calculation
-            businesses = Business.query.filter(Business.is_active == True).all()
-            
-            results = []
-            for business in businesses:
-                result = self.calculate_roi_for_business(business.id)
-                if result:
-                    results.append({
-                        'business_id': business.id,
-                        'business_name': business.name,
-                        'roi_percentage': result.roi_percentage,
-                        'status': 'success'
-                    })
-                else:
-                    results.append({
-                        'business_id': business.id,
-                        'business_name': business.name,
-                        'status': 'error'
-                    })
-            
-            self.logger.info(f"ROI calculation completed for {len(results)} businesses")
-            return results
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating ROI for all businesses: {str(e)}")
+    def calculate_roi_batch(self, business_ids, period_end, days=ROI_PERIOD_DAYS):
+        """
+        Compute ROI for the businesses over the `days` days before period_end in
+        one set of grouped queries and bulk-insert an ROIReport and a
+        roi_calculated ActivityLog for each one that had any activity in the
+        period (the rest are skipped). The caller commits. Returns
+        [(business_id, roi_percentage)] for the reports written.
+        """
+        period_start = period_end - timedelta(days=days)
+        now = datetime.utcnow()
+        reports, activities, results = [], [], []
+        for business_id, roi in sorted(roi_metrics(business_ids, period_start, period_end).items()):
+            if not any((roi.leads_uploaded, roi.calls_made, roi.emails_sent, roi.sms_sent,
+                        roi.appointments_booked, roi.deals_closed)):
+                continue
+            metrics = self._summarize(roi)
+            reports.append({'business_id': business_id, 'period_start': period_start, 'period_end': period_end,
+                            'created_at': now, 'updated_at': now, **self._report_values(metrics)})
+            activities.append({**self._activity_values(business_id, metrics), 'created_at': now, 'updated_at': now})
+            results.append((business_id, metrics['roi_percentage']))
+        if reports:
+            db.session.execute(insert(ROIReport.__table__), reports)
+            db.session.execute(insert(ActivityLog.__table__), activities)
+        return results
+    
+    def calculate_roi_range(self, first_id, last_id, period_end, batch_size=None):
+        """
+        ROI reports for the businesses with first_id <= id <= last_id, in
+        id-ordered batches, each committed together with the range's checkpoint.
+        A checkpoint from an earlier attempt for the same period_end is resumed.
+        """
+        batch_size = batch_size or settings.ROI_FLEET_BATCH_SIZE
+        businesses = Business.__table__
+        source = f'roi-fleet:{first_id}-{last_id}'
+        checkpoint = RollupWatermark.query.filter_by(source=source).first()
+        if checkpoint is None:
+            checkpoint = RollupWatermark(source=source, last_id=0)
+            db.session.add(checkpoint)
+        after = checkpoint.last_id if checkpoint.last_at == period_end else first_id - 1
+        
+        scanned = reports = 0
+        while True:
+            ids = list(db.session.scalars(
+                select(businesses.c.id)
+                .where(businesses.c.id > after, businesses.c.id <= last_id)
+                .order_by(businesses.c.id).limit(batch_size)
+            ))
+            if not ids:
+                break
+            written = self.calculate_roi_batch(ids, period_end)
+            reports += len(written)
+            scanned += len(ids)
+            after = ids[-1]
+            checkpoint.last_at, checkpoint.last_id = period_end, after
+            db.session.commit()
+            response_cache.invalidate('roi_status', [business_id for business_id, _ in written])
+        
+        db.session.commit()
+        self.logger.info(f"ROI range {first_id}-{last_id}: {reports} reports for {scanned} businesses")
+        return {'businesses': scanned, 'reports': reports}
+    
+    def fleet_ranges(self, range_size=None):
+        """[(first_id, last_id)] id ranges covering every business, ROI_FLEET_RANGE_SIZE ids wide."""
+        range_size = range_size or settings.ROI_FLEET_RANGE_SIZE
+        businesses = Business.__table__
+        low, high = db.session.execute(select(func.min(businesses.c.id), func.max(businesses.c.id))).one()
+        if low is None:
             return []
+        # Fixed boundaries keep a rerun's checkpoints lined up with the first attempt's
+        start = low // range_size * range_size
+        return [(lo, lo + range_size - 1) for lo in range(start, high + 1, range_size)]
+    
+    def calculate_roi_for_all_active_businesses(self, period_end=None):
+        """
+        Calculate ROI for every business with activity in the period, range by
+        range in this process (tasks.enqueue_roi_fleet spreads the ranges over
+        RQ workers instead). period_end defaults to today's midnight (UTC).
+        """
+        period_end = period_end or fleet_period_end()
+        totals = {'businesses': 0, 'reports': 0, 'ranges': 0}
+        for first_id, last_id in self.fleet_ranges():
+            result = self.calculate_roi_range(first_id, last_id, period_end)
+            totals['businesses'] += result['businesses']
+            totals['reports'] += result['reports']
+            totals['ranges'] += 1
+        self.logger.info(f"ROI calculation completed: {totals['reports']} reports for {totals['businesses']} businesses")
+        return totals
     
     def get_roi_trend(self, business_id, days=90):
-        """Get ROI trend over time for a business."""
+        """Get ROI trend over time for a business, one point per day with activity (from the daily rollups)."""
         try:
-            calculations = ROIReport.query.filter_by(
-                business_id=business_id
-            ).filter(
-                ROIReport.calculated_at >= datetime.utcnow() - timedelta(days=days)
-            ).order_by(ROIReport.calculated_at.asc()).all()
-            
             trend_data = []
-            for calc in calculations:
+            for row in daily_series(business_id, days):
+                revenue, cost = float(row.revenue or 0), float(row.cost or 0)
                 trend_data.append({
-                    'date': calc.calculated_at.isoformat() if calc.calculated_at else calc.created_at.isoformat(),
-                    'roi_percentage': float(calc.roi_percentage or 0),
-                    'total_revenue': float(calc.estimated_revenue or 0),
-                    'total_cost': float(calc.total_cost or 0),
-                    'net_profit': float(calc.estimated_revenue or 0) - float(calc.total_cost or 0),
-                    'lead_count': calc.leads_received or 0
+                    'date': row.day.isoformat(),
+                    'roi_percentage': (revenue - cost) / max(cost, 1) * 100,
+                    'total_revenue': revenue,
+                    'total_cost': cost,
+                    'net_profit': revenue - cost,
+                    'lead_count': row.leads_received or 0
                 })
             
             return trend_data
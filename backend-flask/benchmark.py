@@ -0,0 +1,437 @@
+"""
+Benchmarks for lead scoring, ROI calculation and bulk import.
+
+Every case runs against a synthetic lead corpus (seeded, so runs are
+comparable) in a fresh interpreter, so its peak RSS is its own.
+
+    python benchmark.py run --sizes 1k,100k --output baseline.json
+    python benchmark.py run --sizes 1k,100k,1m --postgres postgresql+psycopg://localhost/leadnest_bench \\
+        --compare baseline.json --threshold 0.1
+    python benchmark.py compare baseline.json current.json
+    python benchmark.py corpus --rows 100k --output leads.csv
+
+Cases:
+- score / score_batch: AILeadScorer.score_lead per lead, and score_leads_batch
+  over 1000-lead chunks (what tasks.rescore_leads does), in leads/s.
+- roi / roi_rollup: the ROI read paths over a SQLite database seeded with the
+  corpus (spread over ROI_BUSINESSES businesses, with conversations, outbound
+  messages, bookings and call logs): roi_metrics.activity_counts for every
+  business over 30 days, in leads/s, and metrics_rollup.rollup_roi per business
+  over 30 days once the daily rollups are built, in calls/s.
+- import_sqlite / import_postgres: lead_import.upsert_leads over a corpus CSV,
+  first into an empty table (inserts) and then again (updates), in rows/s.
+  The Postgres database is reset, so point --postgres at a scratch database.
+
+compare (or run --compare) exits 1 when a rate drops, or peak RSS grows, by
+more than the threshold against the baseline.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SEED = 20240601
+SCORE_CHUNK = 1000
+CSV_COLUMNS = ["full_name", "email", "phone", "source", "status"]
+CASES = ["score", "score_batch", "roi", "roi_rollup", "import_sqlite", "import_postgres"]
+ROI_BUSINESSES = 50
+ROI_DAYS = 30
+# rollup_roi calls per business in roi_rollup
+ROI_ROLLUP_REPEATS = 20
+
+_FIRST = ["Ann", "Bo", "Carla", "Dev", "Elena", "Femi", "Grace", "Hiro", "Ivan", "Jada", "Kofi", "Lena",
+          "Marco", "Nia", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tara", "Uma", "Victor", "Wen", "Yusuf"]
+_LAST = ["Smith", "Garcia", "Nguyen", "Okafor", "Patel", "Kim", "Rossi", "Cohen", "Silva", "Moreau",
+         "Brown", "Tanaka", "Novak", "Haddad", "Jensen", "Lopez", "Walker", "Singh"]
+_COMPANIES = ["{} Aesthetics", "{} Medspa", "{} Law Group", "{} & Partners Legal", "{} Construction",
+              "{} Renovation Co", "{} Hair Studio", "{} Beauty Salon", "{} Consulting", "{} Holdings", ""]
+_PROJECTS = ["botox", "laser", "filler", "legal", "attorney", "renovation", "building", "hair", "nails", "", ""]
+_BUDGETS = ["", "", "$50k", "$75k", "100,000", "$250k", "$500k", "$1M", "budget approved", "flexible",
+            "negotiable", "tight budget", "tbd"]
+_TIMELINES = ["", "", "ASAP", "this week", "next week", "this month", "30 days", "next quarter",
+              "6 months", "next year", "someday"]
+_NOTES = [
+    "", "",
+    "Urgent - need quote, decision maker here",
+    "Interested in a proposal and estimate",
+    "Looking for options, exploring pricing for a project starting next month",
+    "Ready to start ASAP, budget approved. When can you start?",
+    "Just researching for now.",
+    "Need a lawyer for a contract dispute. Deadline is close and we require help quickly, please call.",
+    "Considering a full kitchen renovation; would like a meeting to discuss the timeline and options.",
+]
+_SOURCES = ["website", "google_ads", "referral", "facebook", "csv", "sms", "walk_in"]
+_STATUSES = ["new", "new", "new", "contacted", "qualified"]
+_FREE_DOMAINS = ["gmail.com", "yahoo.com", "hotmail.com"]
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def synthetic_leads(rows: int, seed: int = SEED, now: Optional[datetime] = None) -> Iterator[Dict[str, str]]:
+    """
+    Yield `rows` realistic leads: score_lead inputs plus the CSV import columns.
+    About 5% reuse an earlier lead's phone or email, as repeat enquiries do.
+    """
+    rnd = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    recent = []
+    for i in range(rows):
+        first, last = rnd.choice(_FIRST), rnd.choice(_LAST)
+        company = rnd.choice(_COMPANIES).format(last)
+        if rnd.random() < 0.6:
+            domain = rnd.choice(_FREE_DOMAINS)
+        else:
+            domain = (company.split()[0].lower() if company else last.lower()) + ".com"
+        email = f"{first.lower()}.{last.lower()}{i}@{domain}" if rnd.random() < 0.85 else ""
+        digits = f"555{i % 10_000_000:07d}"
+        phone = rnd.choice([f"+1{digits}", f"({digits[:3]}) {digits[3:6]}-{digits[6:]}", f"1-{digits}", ""])
+        if recent and rnd.random() < 0.05:
+            phone, email = rnd.choice(recent)
+        elif len(recent) < 1000:
+            recent.append((phone, email))
+        else:
+            recent[i % 1000] = (phone, email)
+
+        yield {
+            "contact_name": f"{first} {last}",
+            "full_name": f"{first} {last}",
+            "company_name": company,
+            "email": email,
+            "phone": phone,
+            "project_type": rnd.choice(_PROJECTS),
+            "budget": rnd.choice(_BUDGETS),
+            "timeline": rnd.choice(_TIMELINES),
+            "notes": rnd.choice(_NOTES),
+            "source": rnd.choice(_SOURCES),
+            "status": rnd.choice(_STATUSES),
+            "created_at": (now - timedelta(hours=rnd.expovariate(1 / 72))).isoformat(),
+        }
+
+
+def write_corpus(path: str, rows: int, seed: int = SEED) -> None:
+    """Write a corpus as an import CSV (the columns /api/leads/bulk reads)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(synthetic_leads(rows, seed))
+
+
+def _chunks(iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ---------- Cases (each runs in its own interpreter) ----------
+
+def bench_score(rows: int, batch: bool) -> Dict:
+    from services.ai_lead_scorer import AILeadScorer
+
+    scorer = AILeadScorer()
+    elapsed = 0.0
+    for chunk in _chunks(synthetic_leads(rows), SCORE_CHUNK):
+        t0 = time.perf_counter()
+        if batch:
+            scorer.score_leads_batch(chunk)
+        else:
+            for lead in chunk:
+                scorer.score_lead(lead)
+        elapsed += time.perf_counter() - t0
+    return {"seconds": elapsed, "rate": rows / elapsed, "unit": "leads/s"}
+
+
+def _bench_app(database_url: str):
+    from flask import Flask
+
+    from app.db import db
+
+    app = Flask("benchmark")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def seed_roi_corpus(rows: int, now: datetime, seed: int = SEED) -> None:
+    """
+    Insert the corpus as leads of ROI_BUSINESSES businesses, each with an SMS
+    conversation; most get outbound messages after they arrive, some a booking
+    (a third of those closed) or a logged call. Needs an app context.
+    """
+    import calendar
+
+    from sqlalchemy import insert
+
+    from app.db import db
+    from app.models import ActivityLog, Booking, Business, Conversation, Lead, Message
+
+    rnd = random.Random(seed)
+    db.session.execute(insert(Business.__table__), [
+        {"id": b, "name": f"Business {b}", "avg_deal_size": 1000 + b * 50, "cost_per_lead": 20 + b % 30}
+        for b in range(1, ROI_BUSINESSES + 1)
+    ])
+    for chunk_no, chunk in enumerate(_chunks(synthetic_leads(rows, seed, now), 5000)):
+        leads, convos, messages, bookings, calls = [], [], [], [], []
+        for offset, lead in enumerate(chunk):
+            lead_id = chunk_no * 5000 + offset + 1
+            business_id = lead_id % ROI_BUSINESSES + 1
+            created_at = datetime.fromisoformat(lead["created_at"]).astimezone(timezone.utc).replace(tzinfo=None)
+            leads.append({"id": lead_id, "business_id": business_id, "full_name": lead["full_name"],
+                          "email": lead["email"], "phone": lead["phone"], "source": lead["source"],
+                          "status": lead["status"], "created_at": created_at, "updated_at": created_at})
+            convos.append({"id": lead_id, "lead_id": lead_id, "channel": "sms"})
+            sent_at = created_at
+            for _ in range(rnd.choice([0, 1, 1, 2, 3])):
+                sent_at += timedelta(minutes=rnd.expovariate(1 / 600))
+                messages.append({"conversation_id": lead_id, "sender": "assistant", "content": "Following up",
+                                 "status": rnd.choice(["sent", "delivered", "delivered", "failed"]),
+                                 "ts": calendar.timegm(sent_at.utctimetuple()), "updated_at": sent_at})
+            if rnd.random() < 0.1:
+                closed = rnd.random() < 0.33
+                bookings.append({"business_id": business_id, "lead_id": lead_id,
+                                 "starts_at": created_at + timedelta(days=rnd.randint(1, 7)),
+                                 "outcome": "closed" if closed else None,
+                                 "revenue_generated": rnd.choice([None, 2500, 5000]) if closed else None,
+                                 "updated_at": created_at})
+            if rnd.random() < 0.2:
+                calls.append({"business_id": business_id, "lead_id": lead_id, "action": "call_logged",
+                              "created_at": created_at + timedelta(hours=1)})
+        for model, batch in ((Lead, leads), (Conversation, convos), (Message, messages),
+                             (Booking, bookings), (ActivityLog, calls)):
+            if batch:
+                db.session.execute(insert(model.__table__), batch)
+        db.session.commit()
+
+
+def bench_roi(rows: int, rollup: bool) -> Dict:
+    from app.db import db
+    from app.metrics_rollup import rebuild, rollup_roi
+    from app.roi_metrics import activity_counts, period
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    business_ids = list(range(1, ROI_BUSINESSES + 1))
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _bench_app(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        with app.app_context():
+            db.create_all()
+            seed_roi_corpus(rows, now)
+            try:
+                if not rollup:
+                    t0 = time.perf_counter()
+                    counts = activity_counts(business_ids, *period(ROI_DAYS, now))
+                    elapsed = time.perf_counter() - t0
+                    return {"seconds": elapsed, "rate": rows / elapsed, "unit": "leads/s",
+                            "leads_responded": sum(c["leads_responded"] for c in counts.values())}
+
+                t0 = time.perf_counter()
+                rebuild(ROI_DAYS + 1, today=now.date())
+                rebuild_seconds = time.perf_counter() - t0
+                calls = ROI_BUSINESSES * ROI_ROLLUP_REPEATS
+                t0 = time.perf_counter()
+                for i in range(calls):
+                    rollup_roi(business_ids[i % ROI_BUSINESSES], ROI_DAYS, today=now.date())
+                elapsed = time.perf_counter() - t0
+                return {"seconds": elapsed, "rate": calls / elapsed, "unit": "calls/s",
+                        "rebuild_seconds": rebuild_seconds}
+            finally:
+                db.session.remove()
+
+
+def bench_import(rows: int, database_url: Optional[str]) -> Dict:
+    from app.db import db
+    from app.lead_import import iter_csv_rows, upsert_leads
+    from app.models import Business
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leads.csv")
+        write_corpus(path, rows)
+
+        app = _bench_app(database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Business(id=1, name="Benchmark"))
+            db.session.commit()
+            try:
+                t0 = time.perf_counter()
+                first = upsert_leads(iter_csv_rows(path), business_id=1)
+                insert_seconds = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                upsert_leads(iter_csv_rows(path), business_id=1)
+                update_seconds = time.perf_counter() - t0
+            finally:
+                db.session.remove()
+                if database_url:
+                    db.drop_all()
+
+    return {
+        "seconds": insert_seconds,
+        "rate": rows / insert_seconds,
+        "update_rate": rows / update_seconds,
+        "unit": "rows/s",
+        "created": first["created"],
+        "errors": len(first["errors"]),
+    }
+
+
+def _run_case(case: str, rows: int, postgres: Optional[str], results) -> None:
+    if case in ("score", "score_batch"):
+        result = bench_score(rows, batch=case == "score_batch")
+    elif case in ("roi", "roi_rollup"):
+        result = bench_roi(rows, rollup=case == "roi_rollup")
+    elif case == "import_sqlite":
+        result = bench_import(rows, None)
+    else:
+        result = bench_import(rows, postgres)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    results.put(result)
+
+
+def run_case(case: str, rows: int, postgres: Optional[str] = None) -> Dict:
+    """Run one case in a fresh interpreter and return its measurements."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(case, rows, postgres, results))
+    proc.start()
+    try:
+        return results.get()
+    except KeyboardInterrupt:
+        proc.terminate()
+        raise
+    finally:
+        proc.join()
+
+
+# ---------- Baselines ----------
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Regressions of current against baseline: a rate down, or peak RSS up, by more than threshold."""
+    regressions = []
+    for key, base in sorted(baseline["results"].items()):
+        now = current["results"].get(key)
+        if now is None:
+            continue
+        for metric in ("rate", "update_rate"):
+            if base.get(metric) and now.get(metric) is not None and now[metric] < base[metric] * (1 - threshold):
+                regressions.append(f"{key} {metric}: {now[metric]:,.0f} < {base[metric]:,.0f} {base['unit']}")
+        if base.get("peak_rss_mb") and now.get("peak_rss_mb") and \
+                now["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key} peak_rss_mb: {now['peak_rss_mb']} > {base['peak_rss_mb']}")
+    return regressions
+
+
+def _environment() -> Dict:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy_version,
+        "seed": SEED,
+    }
+
+
+def _report(regressions: List[str]) -> int:
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run benchmarks and write the results as JSON")
+    run.add_argument("--sizes", default="1k,100k", help="corpus sizes, e.g. 1k,100k,1m")
+    run.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of " + ", ".join(CASES))
+    run.add_argument("--postgres", default=os.environ.get("BENCH_POSTGRES_URL"),
+                     help="scratch Postgres URL for import_postgres (its tables are dropped)")
+    run.add_argument("--output", default="benchmark_results.json")
+    run.add_argument("--compare", metavar="BASELINE", help="baseline JSON to check for regressions")
+    run.add_argument("--threshold", type=float, default=0.1)
+
+    cmp_ = sub.add_parser("compare", help="compare two result files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.1)
+
+    corpus = sub.add_parser("corpus", help="write a synthetic lead CSV")
+    corpus.add_argument("--rows", default="1k")
+    corpus.add_argument("--output", default="synthetic_leads.csv")
+    corpus.add_argument("--seed", type=int, default=SEED)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "corpus":
+        write_corpus(args.output, parse_size(args.rows), args.seed)
+        return 0
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        return _report(compare(baseline, current, args.threshold))
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    if "import_postgres" in cases and not args.postgres:
+        cases.remove("import_postgres")
+
+    output = {"environment": _environment(), "results": {}}
+    for rows in (parse_size(s) for s in args.sizes.split(",")):
+        for case in cases:
+            result = run_case(case, rows, args.postgres)
+            output["results"][f"{case}/{rows}"] = result
+            print(f"{case:<16} {rows:>9,} rows  {result['rate']:>12,.0f} {result['unit']:<8} "
+                  f"peak {result['peak_rss_mb']} MB")
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            return _report(compare(json.load(f), output, args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""Composite indexes for keyset-paginated lead listing
+
+Revision ID: 3b7d9e2a4c10
+Revises: 88936a15c9f1
+Create Date: 2026-10-18 09:12:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7d9e2a4c10'
+down_revision = '88936a15c9f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.create_index('ix_leads_created_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_leads_business_created_id', ['business_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_leads_business_status_created_id', ['business_id', 'status', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_leads_business_source_created_id', ['business_id', 'source', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_leads_business_priority_created_id', ['business_id', 'priority', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_leads_business_score', ['business_id', 'score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('ix_leads_business_score')
+        batch_op.drop_index('ix_leads_business_priority_created_id')
+        batch_op.drop_index('ix_leads_business_source_created_id')
+        batch_op.drop_index('ix_leads_business_status_created_id')
+        batch_op.drop_index('ix_leads_business_created_id')
+        batch_op.drop_index('ix_leads_created_id')
@@ -0,0 +1,26 @@
+"""ROI reports: latest-report-per-business index
+
+Revision ID: 4a7d2e91c6b3
+Revises: e3c7a9d15f28
+Create Date: 2026-10-18 20:03:17.884102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a7d2e91c6b3'
+down_revision = 'e3c7a9d15f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('roi_reports', schema=None) as batch_op:
+        batch_op.create_index('ix_roi_reports_business_created', ['business_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('roi_reports', schema=None) as batch_op:
+        batch_op.drop_index('ix_roi_reports_business_created')
@@ -0,0 +1,28 @@
+"""Recency rescore schedule on ai_scoring
+
+Revision ID: 6f1b2d9c4e70
+Revises: d5e8a1c07b42
+Create Date: 2026-10-18 16:27:44.918302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1b2d9c4e70'
+down_revision = 'd5e8a1c07b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ai_scoring', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_rescore_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_ai_scoring_next_rescore_at', ['next_rescore_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ai_scoring', schema=None) as batch_op:
+        batch_op.drop_index('ix_ai_scoring_next_rescore_at')
+        batch_op.drop_column('next_rescore_at')
@@ -0,0 +1,44 @@
+"""Normalized phone/email keys on leads with unique tenant constraints
+
+Existing rows are populated afterwards by the backfill job
+(`flask backfill-lead-keys` or tasks.enqueue_lead_key_backfill).
+
+Revision ID: 7e2c5b19d4a3
+Revises: c41f6a8e2d95
+Create Date: 2026-10-18 11:37:52.209614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2c5b19d4a3'
+down_revision = 'c41f6a8e2d95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_key', sa.String(length=16), nullable=True))
+        batch_op.add_column(sa.Column('email_key', sa.String(length=255), nullable=True))
+        # Superseded by the unique key indexes below
+        batch_op.drop_index('ix_leads_business_phone')
+        batch_op.drop_index('ix_leads_business_email')
+        batch_op.create_index('uq_leads_business_phone_key', ['business_id', 'phone_key'], unique=True)
+        batch_op.create_index('uq_leads_business_email_key', ['business_id', 'email_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('uq_leads_business_email_key')
+        batch_op.drop_index('uq_leads_business_phone_key')
+        batch_op.create_index('ix_leads_business_email', ['business_id', 'email'], unique=False,
+                              postgresql_where=sa.text('email IS NOT NULL'),
+                              sqlite_where=sa.text('email IS NOT NULL'))
+        batch_op.create_index('ix_leads_business_phone', ['business_id', 'phone'], unique=False,
+                              postgresql_where=sa.text('phone IS NOT NULL'),
+                              sqlite_where=sa.text('phone IS NOT NULL'))
+        batch_op.drop_column('email_key')
+        batch_op.drop_column('phone_key')
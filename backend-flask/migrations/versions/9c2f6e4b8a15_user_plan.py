@@ -0,0 +1,26 @@
+"""Users: subscribed plan (rate-limit quota claim)
+
+Revision ID: 9c2f6e4b8a15
+Revises: 4a7d2e91c6b3
+Create Date: 2026-10-18 21:42:09.316524
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2f6e4b8a15'
+down_revision = '4a7d2e91c6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('plan', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('plan')
@@ -0,0 +1,26 @@
+"""Unique provider message id for idempotent webhook persistence
+
+Revision ID: a9d3f27c81e6
+Revises: 7e2c5b19d4a3
+Create Date: 2026-10-18 13:02:15.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3f27c81e6'
+down_revision = '7e2c5b19d4a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('uq_messages_external_id', ['external_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('uq_messages_external_id')
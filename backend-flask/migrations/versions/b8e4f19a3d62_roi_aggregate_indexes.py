@@ -0,0 +1,33 @@
+"""Indexes for ROI aggregates over bookings and activity logs
+
+Revision ID: b8e4f19a3d62
+Revises: 6f1b2d9c4e70
+Create Date: 2026-10-18 18:12:05.406117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f19a3d62'
+down_revision = '6f1b2d9c4e70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_business_starts_at', ['business_id', 'starts_at'], unique=False)
+
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_logs_business_action_created', ['business_id', 'action', 'created_at'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_logs_business_action_created')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_business_starts_at')
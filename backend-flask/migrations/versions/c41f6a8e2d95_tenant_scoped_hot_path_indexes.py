@@ -0,0 +1,44 @@
+"""Tenant-scoped indexes for inbound lookup, import dedup and conversation reads
+
+Revision ID: c41f6a8e2d95
+Revises: 3b7d9e2a4c10
+Create Date: 2026-10-18 10:04:27.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f6a8e2d95'
+down_revision = '3b7d9e2a4c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.create_index('ix_leads_business_phone', ['business_id', 'phone'], unique=False,
+                              postgresql_where=sa.text('phone IS NOT NULL'),
+                              sqlite_where=sa.text('phone IS NOT NULL'))
+        batch_op.create_index('ix_leads_business_email', ['business_id', 'email'], unique=False,
+                              postgresql_where=sa.text('email IS NOT NULL'),
+                              sqlite_where=sa.text('email IS NOT NULL'))
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.create_index('ix_conversations_lead_channel', ['lead_id', 'channel'], unique=False)
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('ix_messages_conversation_ts', ['conversation_id', 'ts'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_messages_conversation_ts')
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversations_lead_channel')
+
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('ix_leads_business_email')
+        batch_op.drop_index('ix_leads_business_phone')
@@ -0,0 +1,38 @@
+"""Persisted AI scores: fingerprint/recency on ai_scoring, score listing index
+
+Revision ID: d5e8a1c07b42
+Revises: a9d3f27c81e6
+Create Date: 2026-10-18 15:41:08.203517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e8a1c07b42'
+down_revision = 'a9d3f27c81e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ai_scoring', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=40), nullable=True))
+        batch_op.add_column(sa.Column('recency', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('scored_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('ix_leads_business_score')
+        batch_op.create_index('ix_leads_business_score_id', ['business_id', 'score', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('leads', schema=None) as batch_op:
+        batch_op.drop_index('ix_leads_business_score_id')
+        batch_op.create_index('ix_leads_business_score', ['business_id', 'score'], unique=False)
+
+    with op.batch_alter_table('ai_scoring', schema=None) as batch_op:
+        batch_op.drop_column('scored_at')
+        batch_op.drop_column('recency')
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,77 @@
+"""Daily ROI rollups: daily_metrics, rollup_watermarks, watermark walk indexes
+
+Revision ID: e3c7a9d15f28
+Revises: b8e4f19a3d62
+Create Date: 2026-10-18 19:12:44.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c7a9d15f28'
+down_revision = 'b8e4f19a3d62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_metrics',
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('leads_received', sa.Integer(), nullable=False),
+    sa.Column('leads_responded', sa.Integer(), nullable=False),
+    sa.Column('appointments_booked', sa.Integer(), nullable=False),
+    sa.Column('deals_closed', sa.Integer(), nullable=False),
+    sa.Column('sms_sent', sa.Integer(), nullable=False),
+    sa.Column('emails_sent', sa.Integer(), nullable=False),
+    sa.Column('calls_made', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('daily_metrics', schema=None) as batch_op:
+        batch_op.create_index('uq_daily_metrics_business_day', ['business_id', 'day'], unique=True)
+
+    op.create_table('rollup_watermarks',
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('last_at', sa.DateTime(), nullable=True),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source')
+    )
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_updated_id', ['updated_at', 'id'], unique=False)
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('ix_messages_updated_id', ['updated_at', 'id'], unique=False)
+
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_logs_created_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_logs_created_id')
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_messages_updated_id')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_updated_id')
+
+    op.drop_table('rollup_watermarks')
+
+    with op.batch_alter_table('daily_metrics', schema=None) as batch_op:
+        batch_op.drop_index('uq_daily_metrics_business_day')
+
+    op.drop_table('daily_metrics')
@@ -3,9 +3,84 @@ AI Lead Scoring Engine
 Competitive advantage feature for LeadNest
 """
 import datetime
-from typing import Dict, List, Optional
+import hashlib
+import json
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
 import re
 
+try:
+    import numpy as np
+except ImportError:  # batch scoring falls back to plain Python arithmetic
+    np = None
+
+# Bump when scoring logic changes, so persisted scores are recomputed
+SCORER_VERSION = 2
+
+_NON_DIGITS = re.compile(r'[^\d]')
+
+# AIScoringConfig column defaults; a weight left unset takes its default
+TENANT_WEIGHT_DEFAULTS = {
+    'recency_weight': 0.3,
+    'source_weight': 0.2,
+    'engagement_weight': 0.3,
+    'profile_completeness_weight': 0.2,
+}
+# Lead fields counted towards profile completeness
+PROFILE_FIELDS = ('contact_name', 'email', 'phone', 'company_name', 'notes')
+
+
+class KeywordMatcher:
+    """
+    `any(k in text for k in keywords)` as a single compiled regex search.
+    count() gives the number of distinct keywords present, like the scalar path.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(keywords)
+        ordered = sorted(set(self.keywords), key=len, reverse=True)
+        self._pattern = re.compile('|'.join(map(re.escape, ordered))) if ordered else None
+
+    def matches(self, text: str) -> bool:
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+    def count(self, text: str) -> int:
+        # Keywords may overlap in the text, which one regex scan can't count
+        return sum(1 for keyword in self.keywords if keyword in text)
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    """
+    A business's AIScoringConfig compiled for AILeadScorer: per-industry
+    (budget, urgency, engagement) weight vectors, the high-value source set and
+    the keyword matchers. Immutable, so one instance is shared by every caller.
+    The default profile (no config) scores exactly as the scorer always has.
+    """
+    weights: Mapping[str, Tuple[float, float, float]]
+    matchers: Mapping[str, object]
+    fingerprint: str
+    tenant: bool = False
+    high_value_sources: FrozenSet[str] = frozenset()
+    # Final score = (weighted components * base_weight + source * source_weight
+    #                + completeness * completeness_weight) * recency
+    base_weight: float = 1.0
+    source_weight: float = 0.0
+    completeness_weight: float = 0.0
+    # Scales the recency multiplier's distance from 1.0
+    recency_scale: float = 1.0
+    best_contact_time: Optional[str] = None
+
+    def weights_for(self, industry: str) -> Tuple[float, float, float]:
+        return self.weights.get(industry, self.weights['default'])
+
+    def recency(self, multiplier: float) -> float:
+        if self.recency_scale == 1.0:
+            return multiplier
+        return 1 + (multiplier - 1) * self.recency_scale
+
+
 class AILeadScorer:
     """
     Smart AI Lead Scoring Engine
@@ -33,10 +108,44 @@ class AILeadScorer:
             'timeline', 'options', 'proposal', 'estimate', 'meeting'
         ]
 
-    def score_lead(self, lead_data: Dict) -> Dict:
+        # (keywords, score) tiers; the first tier with a keyword in the text wins
+        self.budget_tiers = [
+            (['$1m', '$2m', '$5m', '1 million', '2 million'], 95.0),
+            (['$500k', '$750k', '500,000', '750,000'], 85.0),
+            (['$250k', '$300k', '$400k', '250,000'], 75.0),
+            (['$100k', '$150k', '100,000'], 65.0),
+            (['$50k', '$75k', '50,000'], 55.0),
+            (['budget approved', 'funding secured'], 80.0),
+            (['flexible', 'negotiable'], 60.0),
+            (['tight budget', 'limited', 'cheap'], 25.0),
+        ]
+        self.timeline_tiers = [
+            (['asap', 'immediate', 'urgent', 'emergency'], 85.0),
+            (['this week', 'next week', '1 week'], 80.0),
+            (['this month', 'next month', '30 days'], 65.0),
+            (['3 months', '6 months', 'quarter'], 45.0),
+            (['next year', '12 months', 'someday'], 25.0),
+        ]
+        # Checked in order; the first industry with a keyword in the text wins
+        self.industry_keywords = [
+            ('medspas', ['medspa', 'botox', 'filler', 'laser', 'aesthetic']),
+            ('law_firms', ['law', 'legal', 'attorney', 'lawyer', 'firm']),
+            ('contractors', ['construction', 'contractor', 'building', 'renovation']),
+            ('salons', ['salon', 'hair', 'beauty', 'spa', 'nails']),
+        ]
+        # (max age in hours, multiplier): fresh leads get a boost, older ones are penalized
+        self.recency_buckets = [(1, 1.2), (24, 1.1), (72, 1.0), (168, 0.9)]
+        self.stale_recency = 0.8
+        self.free_email_domains = ['gmail', 'yahoo', 'hotmail']
+        self.requirement_keywords = ['need', 'require', 'looking for', 'project']
+        self._matchers = None
+        self._default_profile = None
+
+    def score_lead(self, lead_data: Dict, profile: Optional[ScoringProfile] = None) -> Dict:
         """
         Score a single lead and return score + reasoning
         """
+        profile = profile or self.default_profile()
         try:
             # Extract lead information
             company_name = lead_data.get('company_name', '')
@@ -57,14 +166,23 @@ class AILeadScorer:
             
             # Determine industry for weighted scoring
             industry = self._detect_industry(project_type, company_name, notes)
-            weights = self.industry_weights.get(industry, self.industry_weights['default'])
+            weights = profile.weights_for(industry)
             
             # Calculate weighted final score
             final_score = (
-                budget_score * weights['budget_weight'] +
-                urgency_score * weights['urgency_weight'] +
-                engagement_score * weights['engagement_weight']
-            ) * recency_score  # Recency as multiplier
+                budget_score * weights[0] +
+                urgency_score * weights[1] +
+                engagement_score * weights[2]
+            )
+            if profile.tenant:
+                source_score, completeness_score = self._tenant_scores(lead_data, profile)
+                final_score = (
+                    final_score * profile.base_weight +
+                    source_score * profile.source_weight +
+                    completeness_score * profile.completeness_weight
+                )
+            recency_score = profile.recency(recency_score)
+            final_score = final_score * recency_score  # Recency as multiplier
             
             # Cap at 100
             final_score = min(100, max(0, final_score))
@@ -86,7 +204,7 @@ class AILeadScorer:
                 recency_score, category, notes, timeline
             )
             
-            return {
+            result = {
                 'ai_score': round(final_score, 1),
                 'category': category,
                 'priority': priority,
@@ -100,18 +218,25 @@ class AILeadScorer:
                 'insights': insights,
                 'recommended_action': self._get_recommended_action(category, final_score)
             }
+            if profile.tenant:
+                self._add_tenant_details(result, source_score, completeness_score, profile)
+            return result
             
         except Exception as e:
-            # Fallback scoring
-            return {
-                'ai_score': 50.0,
-                'category': 'warm',
-                'priority': 2,
-                'industry': 'unknown',
-                'breakdown': {},
-                'insights': ['Unable to fully analyze lead - manual review recommended'],
-                'recommended_action': 'Review manually and follow up within 24 hours'
-            }
+            return self._fallback_score()
+
+    @staticmethod
+    def _fallback_score() -> Dict:
+        """Fallback scoring"""
+        return {
+            'ai_score': 50.0,
+            'category': 'warm',
+            'priority': 2,
+            'industry': 'unknown',
+            'breakdown': {},
+            'insights': ['Unable to fully analyze lead - manual review recommended'],
+            'recommended_action': 'Review manually and follow up within 24 hours'
+        }
 
     def _score_budget(self, budget: str) -> float:
         """Score based on budget information"""
@@ -121,24 +246,10 @@ class AILeadScorer:
         budget_lower = budget.lower()
         
         # Extract budget ranges
-        if any(x in budget_lower for x in ['$1m', '$2m', '$5m', '1 million', '2 million']):
-            return 95.0
-        elif any(x in budget_lower for x in ['$500k', '$750k', '500,000', '750,000']):
-            return 85.0
-        elif any(x in budget_lower for x in ['$250k', '$300k', '$400k', '250,000']):
-            return 75.0
-        elif any(x in budget_lower for x in ['$100k', '$150k', '100,000']):
-            return 65.0
-        elif any(x in budget_lower for x in ['$50k', '$75k', '50,000']):
-            return 55.0
-        elif any(x in budget_lower for x in ['budget approved', 'funding secured']):
-            return 80.0
-        elif any(x in budget_lower for x in ['flexible', 'negotiable']):
-            return 60.0
-        elif any(x in budget_lower for x in ['tight budget', 'limited', 'cheap']):
-            return 25.0
-        else:
-            return 45.0
+        for keywords, score in self.budget_tiers:
+            if any(x in budget_lower for x in keywords):
+                return score
+        return 45.0
 
     def _score_urgency(self, timeline: str, notes: str) -> float:
         """Score based on urgency indicators"""
@@ -158,16 +269,9 @@ class AILeadScorer:
             return 50.0
         
         # Timeline analysis
-        if any(x in text for x in ['asap', 'immediate', 'urgent', 'emergency']):
-            return 85.0
-        elif any(x in text for x in ['this week', 'next week', '1 week']):
-            return 80.0
-        elif any(x in text for x in ['this month', 'next month', '30 days']):
-            return 65.0
-        elif any(x in text for x in ['3 months', '6 months', 'quarter']):
-            return 45.0
-        elif any(x in text for x in ['next year', '12 months', 'someday']):
-            return 25.0
+        for keywords, score in self.timeline_tiers:
+            if any(x in text for x in keywords):
+                return score
         
         return 40.0
 
@@ -179,7 +283,7 @@ class AILeadScorer:
         if email:
             if '@' in email and '.' in email:
                 score += 15.0
-                if any(domain in email.lower() for domain in ['gmail', 'yahoo', 'hotmail']):
+                if any(domain in email.lower() for domain in self.free_email_domains):
                     score += 5.0
                 else:
                     score += 15.0  # Business email = higher quality
@@ -202,53 +306,65 @@ class AILeadScorer:
                 score += 10.0
             
             # Check for detailed requirements
-            if any(x in notes.lower() for x in ['need', 'require', 'looking for', 'project']):
+            if any(x in notes.lower() for x in self.requirement_keywords):
                 score += 10.0
         
         return min(100.0, score)
 
     def _score_recency(self, created_at: str) -> float:
         """Score multiplier based on lead recency"""
-        if not created_at:
+        return self.recency_multiplier(created_at)
+
+    def recency_multiplier(self, created_at, now: Optional[datetime.datetime] = None) -> float:
+        """The recency multiplier score_lead applies to a lead created at created_at"""
+        hours_old = self._hours_old(created_at, now or datetime.datetime.now(datetime.timezone.utc))
+        if hours_old is None:
             return 1.0
         
+        for max_hours, multiplier in self.recency_buckets:
+            if hours_old <= max_hours:
+                return multiplier
+        return self.stale_recency
+
+    def next_recency_change(self, created_at, now: Optional[datetime.datetime] = None) -> Optional[datetime.datetime]:
+        """
+        When recency_multiplier for this lead next changes: its current bucket's
+        upper age boundary, crossed just after the returned time. None once the
+        lead is past the last boundary, or if created_at is unusable.
+        """
+        hours_old = self._hours_old(created_at, now or datetime.datetime.now(datetime.timezone.utc))
+        if hours_old is None:
+            return None
+        for max_hours, _ in self.recency_buckets:
+            if hours_old <= max_hours:
+                return self._lead_date(created_at) + datetime.timedelta(hours=max_hours)
+        return None
+
+    @staticmethod
+    def _lead_date(created_at) -> datetime.datetime:
+        if isinstance(created_at, str):
+            return datetime.datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        return created_at
+
+    @classmethod
+    def _hours_old(cls, created_at, now: datetime.datetime) -> Optional[float]:
+        """Lead age in hours; None if created_at is missing or unusable (naive, unparseable)"""
+        if not created_at:
+            return None
+        
         try:
-            if isinstance(created_at, str):
-                lead_date = datetime.datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-            else:
-                lead_date = created_at
-            
-            now = datetime.datetime.now(datetime.timezone.utc)
-            hours_old = (now - lead_date).total_seconds() / 3600
-            
-            if hours_old <= 1:
-                return 1.2  # Fresh leads get boost
-            elif hours_old <= 24:
-                return 1.1
-            elif hours_old <= 72:
-                return 1.0
-            elif hours_old <= 168:  # 1 week
-                return 0.9
-            else:
-                return 0.8  # Older leads penalized
-                
+            return (now - cls._lead_date(created_at)).total_seconds() / 3600
         except:
-            return 1.0
+            return None
 
     def _detect_industry(self, project_type: str, company_name: str, notes: str) -> str:
         """Detect industry from lead data"""
         text = f"{project_type} {company_name} {notes}".lower()
         
-        if any(x in text for x in ['medspa', 'botox', 'filler', 'laser', 'aesthetic']):
-            return 'medspas'
-        elif any(x in text for x in ['law', 'legal', 'attorney', 'lawyer', 'firm']):
-            return 'law_firms'
-        elif any(x in text for x in ['construction', 'contractor', 'building', 'renovation']):
-            return 'contractors'
-        elif any(x in text for x in ['salon', 'hair', 'beauty', 'spa', 'nails']):
-            return 'salons'
-        else:
-            return 'default'
+        for industry, keywords in self.industry_keywords:
+            if any(x in text for x in keywords):
+                return industry
+        return 'default'
 
     def _generate_insights(self, budget_score: float, urgency_score: float, 
                           engagement_score: float, recency_score: float,
@@ -286,11 +402,317 @@ class AILeadScorer:
         else:
             return "Add to nurture sequence. Schedule follow-up in 1 week."
 
+    def fingerprint(self) -> str:
+        """Hash of the scoring logic version and every weight/keyword list it uses"""
+        config = {
+            'version': SCORER_VERSION,
+            'industry_weights': self.industry_weights,
+            'hot_keywords': self.hot_keywords,
+            'warm_keywords': self.warm_keywords,
+            'budget_tiers': self.budget_tiers,
+            'timeline_tiers': self.timeline_tiers,
+            'industry_keywords': self.industry_keywords,
+            'recency_buckets': self.recency_buckets,
+            'stale_recency': self.stale_recency,
+            'free_email_domains': self.free_email_domains,
+            'requirement_keywords': self.requirement_keywords,
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    # ---------- Scoring profiles ----------
+
+    def default_profile(self) -> ScoringProfile:
+        """Profile for businesses without an AIScoringConfig"""
+        if self._default_profile is None:
+            self._default_profile = self.compile_profile(None)
+        return self._default_profile
+
+    def compile_profile(self, config: Optional[Dict]) -> ScoringProfile:
+        """
+        Compile an AIScoringConfig (a dict of its columns) into a ScoringProfile.
+        engagement_weight replaces each industry's engagement weight (budget and
+        urgency share the rest in their usual ratio), source_weight and
+        profile_completeness_weight blend in the lead's source and completeness,
+        and recency_weight scales the recency multiplier (the 0.3 default leaves
+        it as is).
+        """
+        matchers = MappingProxyType(self._get_matchers())
+        vectors = {
+            industry: (w['budget_weight'], w['urgency_weight'], w['engagement_weight'])
+            for industry, w in self.industry_weights.items()
+        }
+        if config is None:
+            return ScoringProfile(MappingProxyType(vectors), matchers, self.fingerprint())
+
+        weights = {}
+        for name, default in TENANT_WEIGHT_DEFAULTS.items():
+            value = config.get(name)
+            weights[name] = default if value is None else min(1.0, max(0.0, float(value)))
+
+        engagement = weights['engagement_weight']
+        vectors = {
+            industry: ((1 - engagement) * b / (b + u), (1 - engagement) * u / (b + u), engagement)
+            for industry, (b, u, _) in vectors.items()
+        }
+        source, completeness = weights['source_weight'], weights['profile_completeness_weight']
+        if source + completeness > 1:
+            source, completeness = source / (source + completeness), completeness / (source + completeness)
+        sources = frozenset(str(s).strip().lower() for s in config.get('high_value_sources') or ())
+        hours = config.get('peak_contact_hours') or {}
+
+        payload = [self.fingerprint(), weights, sorted(sources), hours]
+        return ScoringProfile(
+            weights=MappingProxyType(vectors),
+            matchers=matchers,
+            fingerprint=hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest(),
+            tenant=True,
+            high_value_sources=sources,
+            base_weight=1 - source - completeness,
+            source_weight=source,
+            completeness_weight=completeness,
+            recency_scale=weights['recency_weight'] / TENANT_WEIGHT_DEFAULTS['recency_weight'],
+            best_contact_time=self._contact_time(hours),
+        )
+
+    @staticmethod
+    def _contact_time(peak_hours) -> Optional[str]:
+        """AIScoring.best_contact_time for the start of the business's peak contact hours"""
+        try:
+            start = int(peak_hours['start'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if start < 12:
+            return 'morning'
+        return 'afternoon' if start < 17 else 'evening'
+
+    @staticmethod
+    def _tenant_scores(lead_data: Dict, profile: ScoringProfile) -> Tuple[float, float]:
+        """(source, profile completeness) scores for a tenant profile"""
+        source = lead_data.get('source', '')
+        source_score = 100.0 if source and source.strip().lower() in profile.high_value_sources else 40.0
+        filled = sum(1 for field in PROFILE_FIELDS if lead_data.get(field))
+        return source_score, 100.0 * filled / len(PROFILE_FIELDS)
+
+    @staticmethod
+    def _add_tenant_details(result: Dict, source_score: float, completeness_score: float,
+                            profile: ScoringProfile) -> None:
+        result['breakdown']['source_score'] = source_score
+        result['breakdown']['completeness_score'] = round(completeness_score, 1)
+        if source_score == 100.0:
+            result['insights'].append("⭐ High-value lead source")
+        if profile.best_contact_time:
+            result['best_contact_time'] = profile.best_contact_time
+
+    # ---------- Batch scoring ----------
+
+    def _get_matchers(self) -> Dict:
+        """Keyword lists compiled once; tiers keep their order and scores"""
+        if self._matchers is None:
+            def tiers(pairs):
+                # A matcher over every tier's keywords rules out most texts in one search
+                pairs = list(pairs)
+                return KeywordMatcher(k for keywords, _ in pairs for k in keywords), \
+                    [(KeywordMatcher(keywords), value) for keywords, value in pairs]
+
+            self._matchers = {
+                'budget': tiers(self.budget_tiers),
+                'hot': KeywordMatcher(self.hot_keywords),
+                'warm': KeywordMatcher(self.warm_keywords),
+                'timeline': tiers(self.timeline_tiers),
+                'industry': tiers((keywords, name) for name, keywords in self.industry_keywords),
+                'free_email': KeywordMatcher(self.free_email_domains),
+                'requirements': KeywordMatcher(self.requirement_keywords),
+            }
+        return self._matchers
+
+    @staticmethod
+    def _first_tier(tiers, text: str, default):
+        any_tier, ordered = tiers
+        if not any_tier.matches(text):
+            return default
+        for matcher, value in ordered:
+            if matcher.matches(text):
+                return value
+        return default
+
+    def _batch_components(self, lead_data: Dict, m: Dict, cache: Dict, now: datetime.datetime) -> tuple:
+        """
+        (budget, urgency, engagement, hours_old, industry) for one lead, computed
+        as score_lead's helpers do. Raises wherever score_lead would fall back.
+        """
+        company_name = lead_data.get('company_name', '')
+        email = lead_data.get('email', '')
+        phone = lead_data.get('phone', '')
+        project_type = lead_data.get('project_type', '')
+        budget = lead_data.get('budget', '')
+        timeline = lead_data.get('timeline', '')
+        notes = lead_data.get('notes', '')
+        created_at = lead_data.get('created_at', '')
+
+        if not budget:
+            budget_score = 40.0
+        else:
+            budget_lower = budget.lower()
+            # Budget/timeline texts repeat a lot within an import, so each is scored once per batch
+            budget_score = cache.get(('budget', budget_lower))
+            if budget_score is None:
+                budget_score = cache[('budget', budget_lower)] = self._first_tier(m['budget'], budget_lower, 45.0)
+
+        text = f"{timeline} {notes}".lower()
+        urgency_score = cache.get(('urgency', text))
+        if urgency_score is None:
+            urgency_score = cache[('urgency', text)] = self._urgency_from(m, text)
+
+        engagement_score = 0.0
+        if email:
+            if '@' in email and '.' in email:
+                engagement_score += 20.0 if m['free_email'].matches(email.lower()) else 30.0
+        if phone:
+            if len(_NON_DIGITS.sub('', phone)) >= 10:
+                engagement_score += 20.0
+        if company_name and len(company_name) > 2:
+            engagement_score += 20.0
+        if notes:
+            if len(notes) > 100:
+                engagement_score += 20.0
+            elif len(notes) > 50:
+                engagement_score += 10.0
+            if m['requirements'].matches(notes.lower()):
+                engagement_score += 10.0
+        engagement_score = min(100.0, engagement_score)
+
+        text = f"{project_type} {company_name} {notes}".lower()
+        industry = cache.get(('industry', text))
+        if industry is None:
+            industry = cache[('industry', text)] = self._first_tier(m['industry'], text, 'default')
+
+        return budget_score, urgency_score, engagement_score, self._hours_old(created_at, now), industry
+
+    def _urgency_from(self, m: Dict, text: str) -> float:
+        hot_count = m['hot'].count(text)
+        if hot_count >= 2:
+            return 90.0
+        elif hot_count >= 1:
+            return 75.0
+        warm_count = m['warm'].count(text)
+        if warm_count >= 2:
+            return 60.0
+        elif warm_count >= 1:
+            return 50.0
+        return self._first_tier(m['timeline'], text, 40.0)
+
+    def _recency_multipliers(self, hours: List[Optional[float]]) -> List[float]:
+        if np is not None:
+            h = np.array([np.nan if x is None else x for x in hours], dtype=float)
+            with np.errstate(invalid='ignore'):
+                return np.select(
+                    [np.isnan(h)] + [h <= max_hours for max_hours, _ in self.recency_buckets],
+                    [1.0] + [multiplier for _, multiplier in self.recency_buckets],
+                    default=self.stale_recency,
+                ).tolist()
+        return [
+            1.0 if x is None else next((m for max_hours, m in self.recency_buckets if x <= max_hours),
+                                       self.stale_recency)
+            for x in hours
+        ]
+
+    @staticmethod
+    def _weighted_scores(budget, urgency, engagement, recency, weights: List[Tuple[float, float, float]],
+                         profile: ScoringProfile, source=None, completeness=None) -> List[float]:
+        """Same expression (and operation order) as score_lead, across the whole batch"""
+        wb, wu, we = (list(w) for w in zip(*weights)) if weights else ([], [], [])
+        if np is not None:
+            b, u, e, r = (np.asarray(x, dtype=float) for x in (budget, urgency, engagement, recency))
+            base = b * np.asarray(wb) + u * np.asarray(wu) + e * np.asarray(we)
+            if profile.tenant:
+                base = (base * profile.base_weight +
+                        np.asarray(source, dtype=float) * profile.source_weight +
+                        np.asarray(completeness, dtype=float) * profile.completeness_weight)
+            return (base * r).tolist()
+        base = [b * x + u * y + e * z for b, u, e, x, y, z in zip(budget, urgency, engagement, wb, wu, we)]
+        if profile.tenant:
+            base = [
+                v * profile.base_weight + s * profile.source_weight + c * profile.completeness_weight
+                for v, s, c in zip(base, source, completeness)
+            ]
+        return [v * r for v, r in zip(base, recency)]
+
+    def _batch_result(self, final_score: float, budget_score: float, urgency_score: float,
+                      engagement_score: float, recency_score: float, industry: str) -> Dict:
+        final_score = min(100, max(0, final_score))
+        if final_score >= 80:
+            category, priority = 'hot', 1
+        elif final_score >= 60:
+            category, priority = 'warm', 2
+        else:
+            category, priority = 'cold', 3
+        return {
+            'ai_score': round(final_score, 1),
+            'category': category,
+            'priority': priority,
+            'industry': industry,
+            'breakdown': {
+                'budget_score': round(budget_score, 1),
+                'urgency_score': round(urgency_score, 1),
+                'engagement_score': round(engagement_score, 1),
+                'recency_score': round(recency_score, 2)
+            },
+            'insights': self._generate_insights(
+                budget_score, urgency_score, engagement_score, recency_score, category, None, None
+            ),
+            'recommended_action': self._get_recommended_action(category, final_score)
+        }
+
+    def score_leads_batch(self, leads: List[Dict], now: Optional[datetime.datetime] = None,
+                          profile: Optional[ScoringProfile] = None) -> List[Dict]:
+        """
+        Score many leads at once. Returns exactly what score_lead returns for
+        each lead, in input order. Keyword lists are compiled once, the weighted
+        scores are computed over the whole batch (NumPy if installed), and the
+        result for each distinct combination of component scores is built once.
+        """
+        profile = profile or self.default_profile()
+        m = profile.matchers
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        cache: Dict[tuple, object] = {}
+
+        components = []
+        for lead in leads:
+            try:
+                tenant = self._tenant_scores(lead, profile) if profile.tenant else (None, None)
+                components.append(self._batch_components(lead, m, cache, now) + tenant)
+            except Exception:
+                components.append(None)
+
+        ok = [c for c in components if c is not None]
+        budget, urgency, engagement, hours, industries, sources, completeness = \
+            (list(x) for x in zip(*ok)) if ok else ([], [], [], [], [], [], [])
+        recency = [profile.recency(r) for r in self._recency_multipliers(hours)]
+        weights = [profile.weights_for(i) for i in industries]
+        raw = self._weighted_scores(budget, urgency, engagement, recency, weights, profile, sources, completeness)
+
+        built: Dict[tuple, Dict] = {}
+        results = []
+        rows = iter(zip(raw, budget, urgency, engagement, recency, industries, sources, completeness))
+        for c in components:
+            if c is None:
+                results.append(self._fallback_score())
+                continue
+            row = next(rows)
+            template = built.get(row)
+            if template is None:
+                template = built[row] = self._batch_result(*row[:6])
+                if profile.tenant:
+                    self._add_tenant_details(template, row[6], row[7], profile)
+            # Fresh containers per lead; callers may mutate their results
+            results.append({**template, 'breakdown': dict(template['breakdown']),
+                            'insights': list(template['insights'])})
+        return results
+
     def bulk_score_leads(self, leads: List[Dict]) -> List[Dict]:
         """Score multiple leads efficiently"""
         scored_leads = []
-        for lead in leads:
-            score_data = self.score_lead(lead)
+        for lead, score_data in zip(leads, self.score_leads_batch(leads)):
             lead_with_score = lead.copy()
             lead_with_score.update(score_data)
             scored_leads.append(lead_with_score)
@@ -0,0 +1,31 @@
+"""
+Drains the webhook event streams (app/sms_events.CONSUMERS) into the database
+in batches, one consumer thread per stream. Run several processes to scale out;
+they share each stream through its consumer group.
+"""
+import os
+import signal
+import socket
+import threading
+
+from app import create_app
+from app.event_streams import run_consumer
+from app.sms_events import CONSUMERS
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(target=run_consumer, args=(app, stream, handler, consumer, stop), name=stream.key)
+        for stream, handler in CONSUMERS
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
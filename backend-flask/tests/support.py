@@ -0,0 +1,36 @@
+"""
+Shared setup for the unit tests
+Puts backend-flask on the import path and runs database tests against a fresh in-memory SQLite database
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+from app.db import db
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test inside an app context with freshly created tables; subclasses seed after super().setUp()"""
+
+    def setUp(self):
+        self.app = make_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
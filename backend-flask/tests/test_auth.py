@@ -0,0 +1,61 @@
+"""
+Unit tests for resolving the caller's business from their token
+Runs against an in-memory SQLite database
+"""
+import unittest
+
+from support import DatabaseTestCase
+from app.auth import current_business_id, issue_token, require_auth, require_business, user_claims
+from app.db import db
+from app.models import Business, User
+
+
+class TestRequireBusiness(DatabaseTestCase):
+    """Test that tenant-scoped views only ever see the caller's own business"""
+
+    def setUp(self):
+        super().setUp()
+
+        @self.app.route('/data', methods=['GET', 'POST'])
+        @require_auth
+        @require_business
+        def data():
+            return {'business_id': current_business_id()}
+
+        db.session.add_all([Business(id=1, name='Mine'), Business(id=2, name='Theirs')])
+        db.session.add_all([User(email='owner@x.com', business_id=1), User(email='nobiz@x.com')])
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def get(self, path, claims, **kwargs):
+        return self.client.get(path, headers={'Authorization': 'Bearer ' + issue_token(claims)}, **kwargs)
+
+    def test_business_from_user_record(self):
+        resp = self.get('/data', {'sub': 'owner@x.com', 'email': 'owner@x.com'})
+        self.assertEqual((resp.status_code, resp.json), (200, {'business_id': 1}))
+        self.assertEqual(user_claims('Owner@x.com')['business_id'], 1)
+
+    def test_other_business_is_forbidden(self):
+        owner = {'sub': 'owner@x.com', 'email': 'owner@x.com'}
+        self.assertEqual(self.get('/data?business_id=2', owner).status_code, 403)
+        self.assertEqual(self.get('/data?business_id=1', owner).status_code, 200)
+        resp = self.client.post('/data', json={'business_id': 2},
+                                headers={'Authorization': 'Bearer ' + issue_token(owner)})
+        self.assertEqual(resp.status_code, 403)
+        # A JSON array body (bulk endpoints) names no business
+        resp = self.client.post('/data', json=[{'business_id': 2}],
+                                headers={'Authorization': 'Bearer ' + issue_token(owner)})
+        self.assertEqual(resp.json, {'business_id': 1})
+
+    def test_user_without_business_is_forbidden(self):
+        self.assertEqual(self.get('/data', {'sub': 'nobiz@x.com', 'email': 'nobiz@x.com'}).status_code, 403)
+        # No silent default business either
+        self.assertEqual(self.get('/data?business_id=1', {'sub': 'stranger@x.com'}).status_code, 403)
+
+    def test_claim_takes_precedence(self):
+        resp = self.get('/data', {'sub': 'nobiz@x.com', 'business_id': 2})
+        self.assertEqual(resp.json, {'business_id': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Unit tests for the benchmark harness (corpus generation and regression checks)
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmark import bench_roi, compare, parse_size, synthetic_leads
+
+
+def results(**cases):
+    return {'results': {key: {'unit': 'leads/s', **values} for key, values in cases.items()}}
+
+
+class TestCorpus(unittest.TestCase):
+    """Test the synthetic lead corpus"""
+
+    def test_corpus_is_deterministic(self):
+        first = [dict(lead, created_at=None) for lead in synthetic_leads(200)]
+        second = [dict(lead, created_at=None) for lead in synthetic_leads(200)]
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 200)
+
+    def test_corpus_repeats_some_contacts(self):
+        leads = list(synthetic_leads(2000))
+        phones = [lead['phone'] for lead in leads if lead['phone']]
+        self.assertLess(len(set(phones)), len(phones))
+
+    def test_parse_size(self):
+        self.assertEqual([parse_size(s) for s in ('1k', '100K', '1m', '250')], [1000, 100000, 1000000, 250])
+
+
+class TestROICases(unittest.TestCase):
+    """Test that the ROI cases run the real read paths over a seeded database"""
+
+    def test_live_and_rollup_cases(self):
+        live = bench_roi(300, rollup=False)
+        self.assertEqual(live['unit'], 'leads/s')
+        self.assertGreater(live['leads_responded'], 0)
+        rolled = bench_roi(300, rollup=True)
+        self.assertEqual(rolled['unit'], 'calls/s')
+        self.assertGreater(rolled['rate'], 0)
+
+
+class TestCompare(unittest.TestCase):
+    """Test regression detection against a baseline"""
+
+    def test_flags_slower_rates_and_higher_memory(self):
+        baseline = results(**{'score/1000': {'rate': 1000.0, 'peak_rss_mb': 100.0}})
+        current = results(**{'score/1000': {'rate': 850.0, 'peak_rss_mb': 120.0}})
+        regressions = compare(baseline, current, threshold=0.1)
+        self.assertEqual(len(regressions), 2)
+
+    def test_changes_within_threshold_pass(self):
+        baseline = results(**{'score/1000': {'rate': 1000.0, 'peak_rss_mb': 100.0}})
+        current = results(**{'score/1000': {'rate': 950.0, 'peak_rss_mb': 105.0},
+                             'roi/1000': {'rate': 1.0, 'peak_rss_mb': 1.0}})
+        self.assertEqual(compare(baseline, current, threshold=0.1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Unit tests for the instrumented database connection pool
+Uses SQLite connections with a slow connect to stand in for Postgres
+"""
+import unittest
+import sys
+import os
+import sqlite3
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, text
+
+from app import db as db_module
+from app.db import InstrumentedQueuePool, PoolMetrics
+
+
+def slow_connect():
+    time.sleep(0.2)
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+class TestInstrumentedQueuePool(unittest.TestCase):
+    """Test that checkout waits exclude the time spent opening connections"""
+
+    def setUp(self):
+        self.metrics = PoolMetrics()
+        patcher = mock.patch.object(db_module, 'pool_metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = create_engine('sqlite://', creator=slow_connect, poolclass=InstrumentedQueuePool,
+                                    pool_size=1, max_overflow=1, pool_timeout=5)
+        self.addCleanup(self.engine.dispose)
+
+    def test_opening_connections_is_not_a_wait(self):
+        with self.engine.connect() as a, self.engine.connect() as b:
+            a.execute(text('select 1'))
+            b.execute(text('select 1'))
+        stats = self.metrics.snapshot()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertLess(stats['wait_ms_max'], 100)
+        self.assertEqual(stats['slow_waits'], 0)
+
+    def test_exhausted_pool_wait_is_recorded(self):
+        with self.engine.connect(), self.engine.connect():
+            pass
+        holders = [self.engine.connect(), self.engine.connect()]
+        release = threading.Timer(0.15, holders[0].close)
+        release.start()
+        with self.engine.connect():
+            pass
+        holders[1].close()
+        release.join()
+        self.assertGreaterEqual(self.metrics.snapshot()['wait_ms_max'], 100)
+        self.assertEqual(self.metrics.snapshot()['slow_waits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,305 @@
+"""
+Unit tests for the bulk lead upsert engine
+Runs against an in-memory SQLite database
+"""
+import unittest
+import io
+import os
+import tempfile
+from unittest import mock
+
+from sqlalchemy import event
+
+from support import DatabaseTestCase, make_app
+from app import lead_import
+from app.db import db
+from app.models import Business, Lead
+from app.lead_import import (
+    upsert_leads, normalize_row, spool_upload, iter_csv_rows, discard_spool, partition_spool, partition_key,
+    stash_spool, fetch_spool,
+)
+from app.lead_keys import phone_key, email_key
+from app.tasks import backfill_lead_keys
+from app.settings import settings
+
+
+class ListRedis:
+    """The Redis list commands the upload stash uses, kept in a dict."""
+
+    def __init__(self):
+        self.lists = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:end + 1]
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+
+class TestLeadImport(DatabaseTestCase):
+    """Test chunked set-based lead upserts"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Test Biz'))
+        db.session.commit()
+
+    def test_normalize_row_splits_full_name(self):
+        data = normalize_row({'full_name': 'Ada Lovelace', 'email': ' ADA@Example.com '})
+        self.assertEqual(data['first_name'], 'Ada')
+        self.assertEqual(data['last_name'], 'Lovelace')
+        self.assertEqual(data['email'], 'ada@example.com')
+        self.assertEqual(data['source'], 'bulk')
+        self.assertIsNone(normalize_row({'source': 'csv'}))
+
+    def test_creates_updates_and_dedups_within_chunk(self):
+        db.session.add(Lead(business_id=1, email='old@example.com', first_name='Old'))
+        db.session.commit()
+
+        rows = [
+            {'full_name': 'New Person', 'email': 'new@example.com'},
+            {'email': 'old@example.com', 'status': 'contacted'},
+            {'email': 'new@example.com', 'phone': '+15551234567'},
+            {},
+        ]
+        result = upsert_leads(rows, business_id=1)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(result['duplicates'], 1)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['total_rows'], 4)
+        self.assertEqual(Lead.query.count(), 2)
+
+        new = Lead.query.filter_by(email='new@example.com').one()
+        self.assertEqual(new.first_name, 'New')
+        self.assertEqual(new.phone, '+15551234567')
+        old = Lead.query.filter_by(email='old@example.com').one()
+        self.assertEqual(old.status, 'contacted')
+        self.assertEqual(old.first_name, 'Old')
+
+    def test_rows_sharing_a_phone_keep_their_fields(self):
+        rows = [
+            {'first_name': 'Jo', 'email': 'jo@x.com', 'phone': '+15551234567'},
+            {'last_name': 'Smith', 'phone': '555-123-4567'},
+            {'email': 'sam@x.com', 'phone': '(555) 123-4567'},
+        ]
+        result = upsert_leads(rows, business_id=1)
+
+        self.assertEqual((result['created'], result['updated'], result['duplicates']), (2, 0, 1))
+        jo = Lead.query.filter_by(email='jo@x.com').one()
+        self.assertEqual((jo.first_name, jo.last_name, jo.phone_key), ('Jo', 'Smith', '+15551234567'))
+        # The number is Jo's; Sam is still created, without it
+        self.assertIsNone(Lead.query.filter_by(email='sam@x.com').one().phone_key)
+
+    def test_statement_count_bounded_by_chunks(self):
+        statements = []
+
+        def count(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE')):
+                statements.append(statement)
+
+        rows = [{'email': f'user{i}@example.com'} for i in range(1000)]
+        progress = []
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            result = upsert_leads(rows, business_id=1, chunk_size=250, on_chunk=progress.append)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        self.assertEqual(result['created'], 1000)
+        self.assertEqual([p['rows_processed'] for p in progress], [250, 500, 750, 1000])
+        # One lookup and one insert per chunk, independent of row count
+        self.assertLessEqual(len(statements), 4 * 2)
+
+        result = upsert_leads(rows, business_id=1, chunk_size=250)
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['updated'], 1000)
+        self.assertEqual(Lead.query.count(), 1000)
+
+
+    def test_phone_formats_collapse_to_one_lead(self):
+        rows = [{'phone': '+15551234567'}, {'phone': '(555) 123-4567'}]
+        upsert_leads(rows, business_id=1, chunk_size=1)
+        result = upsert_leads([{'phone': '555-123-4567', 'email': 'Pat@Example.com'}], business_id=1)
+
+        self.assertEqual(result['updated'], 1)
+        lead = Lead.query.one()
+        self.assertEqual(lead.phone_key, '+15551234567')
+        self.assertEqual(lead.email_key, 'pat@example.com')
+
+    def test_chunk_racing_a_concurrent_insert_is_retried(self):
+        from unittest import mock
+        from app import lead_import
+        db.session.add(Lead(business_id=1, phone='+15551234567', email='jo@example.com'))
+        db.session.commit()
+
+        resolve = lead_import._resolve_existing
+        # First pass resolves before the other partition's lead is visible
+        calls = iter([lambda rows, business_id: {}, resolve])
+        with mock.patch.object(lead_import, '_resolve_existing', side_effect=lambda *a: next(calls)(*a)):
+            result = upsert_leads([{'email': 'sam@example.com', 'phone': '555-123-4567'}], business_id=1)
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, []))
+        self.assertEqual(Lead.query.count(), 1)
+
+    def test_orm_writes_keep_keys_in_sync(self):
+        lead = Lead(business_id=1, phone='555.123.4567', email=' J.Doe+promo@GMail.com')
+        db.session.add(lead)
+        db.session.commit()
+        self.assertEqual((lead.phone_key, lead.email_key), ('+15551234567', 'jdoe@gmail.com'))
+
+        lead.phone = '+44 7700 900123'
+        db.session.commit()
+        self.assertEqual(lead.phone_key, '+447700900123')
+
+    def test_backfill_keys_oldest_lead_wins(self):
+        leads = Lead.__table__
+        db.session.execute(leads.insert(), [
+            {'business_id': 1, 'phone': '555-123-4567', 'email': None},
+            {'business_id': 1, 'phone': '+1 555 123 4567', 'email': 'a@example.com'},
+            {'business_id': 1, 'phone': None, 'email': 'B@example.com'},
+        ])
+        db.session.commit()
+
+        result = backfill_lead_keys(batch_size=2)
+
+        self.assertEqual(result['scanned'], 3)
+        self.assertEqual(result['updated'], 3)
+        self.assertEqual(result['duplicates'], [2])
+        keys = [(l.phone_key, l.email_key) for l in Lead.query.order_by(Lead.id)]
+        self.assertEqual(keys, [('+15551234567', None), (None, 'a@example.com'), (None, 'b@example.com')])
+        self.assertEqual(backfill_lead_keys()['updated'], 0)
+
+
+class TestLeadKeys(unittest.TestCase):
+    """Test phone/email key normalization"""
+
+    def test_phone_key(self):
+        for raw in ['+15551234567', '(555) 123-4567', '555-123-4567', '1 555 123 4567', '001 555 123 4567']:
+            self.assertEqual(phone_key(raw), '+15551234567', raw)
+        self.assertIsNone(phone_key('12345'))
+        self.assertIsNone(phone_key(''))
+        self.assertIsNone(phone_key(None))
+
+    def test_email_key(self):
+        self.assertEqual(email_key('  Jane@Example.COM '), 'jane@example.com')
+        self.assertEqual(email_key('j.a.n.e+leads@googlemail.com'), 'jane@gmail.com')
+        self.assertEqual(email_key('jane+leads@example.com'), 'jane+leads@example.com')
+        self.assertIsNone(email_key('not-an-email'))
+
+
+class TestCSVSpooling(unittest.TestCase):
+    """Test upload spooling and streaming CSV parsing"""
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.orig_dir = settings.IMPORT_SPOOL_DIR
+        settings.IMPORT_SPOOL_DIR = self.spool_dir
+        self.redis = ListRedis()
+        patcher = mock.patch.object(lead_import, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        settings.IMPORT_SPOOL_DIR = self.orig_dir
+
+    def test_spool_and_stream(self):
+        body = b"full_name,email\n" + b"".join(b"User %d,user%d@example.com\n" % (i, i) for i in range(10000))
+        path, estimated = spool_upload(io.BytesIO(body))
+
+        self.assertTrue(path.startswith(self.spool_dir))
+        self.assertEqual(estimated, 10000)
+
+        rows = iter_csv_rows(path)
+        self.assertEqual(next(rows)['email'], 'user0@example.com')
+        self.assertEqual(sum(1 for _ in rows), 9999)
+
+        discard_spool(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_stash_round_trip_between_hosts(self):
+        body = b"email\n" + b"".join(b"user%d@example.com\n" % i for i in range(20000))
+        path, _ = spool_upload(io.BytesIO(body))
+        # Several round-trips each way
+        with mock.patch.object(lead_import, 'STASH_BATCH_BLOCKS', 2):
+            key = stash_spool(path)
+            discard_spool(path)
+
+            # The worker has its own disk
+            settings.IMPORT_SPOOL_DIR = tempfile.mkdtemp()
+            fetched = fetch_spool(key)
+        with open(fetched, 'rb') as f:
+            self.assertEqual(f.read(), body)
+        self.assertGreater(len(self.redis.lists[key]), 2)
+        self.assertEqual(self.redis.ttls[key], settings.IMPORT_SPOOL_TTL_SECONDS)
+        discard_spool(fetched)
+
+        # Expired (or already imported) uploads fail loudly rather than importing nothing
+        self.redis.delete(key)
+        with self.assertRaises(LookupError):
+            fetch_spool(key)
+        self.assertEqual(os.listdir(settings.IMPORT_SPOOL_DIR), [])
+
+    def test_bulk_import_job_writes_to_its_business(self):
+        from app import tasks
+        app = make_app()
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Business(id=1, name='One'), Business(id=2, name='Two')])
+            db.session.commit()
+            path, rows = spool_upload(io.BytesIO(b"email\na@example.com\nb@example.com\n"))
+            key = stash_spool(path)
+            discard_spool(path)
+            with mock.patch.object(tasks, 'enqueue_rescore') as rescore:
+                result = tasks.process_bulk_import(key, 2, None, rows)
+            self.assertEqual(result['created'], 2)
+            self.assertEqual({l.business_id for l in Lead.query.all()}, {2})
+            rescore.assert_called_once_with(2)
+            self.assertEqual((self.redis.lists, os.listdir(self.spool_dir)), ({}, []))
+            db.drop_all()
+
+    def test_estimate_without_trailing_newline(self):
+        path, estimated = spool_upload(io.BytesIO(b"email\na@example.com\nb@example.com"))
+        self.assertEqual(estimated, 2)
+        discard_spool(path)
+
+    def test_partitions_keep_same_phone_together(self):
+        lines = [b"email,phone"]
+        for i in range(2000):
+            lines.append(b"User%d@Example.com,+1555%07d" % (i, i % 500))
+        path, _ = spool_upload(io.BytesIO(b"\n".join(lines) + b"\n"))
+
+        parts = partition_spool(path, 4)
+        discard_spool(path)
+
+        seen = {}
+        total = 0
+        for i, (part, rows) in enumerate(parts):
+            self.assertGreater(rows, 0)
+            for row in iter_csv_rows(part):
+                total += 1
+                key = partition_key(row)
+                self.assertEqual(seen.setdefault(key, i), i)
+            discard_spool(part)
+
+        self.assertEqual(total, 2000)
+        self.assertEqual(len(seen), 500)
+        self.assertGreater(len(parts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,156 @@
+"""
+Unit tests for persisted, incrementally refreshed AI lead scores
+Runs against an in-memory SQLite database
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import AIScoring, AIScoringConfig, Business, Lead
+from app.lead_scoring import lead_inputs, profiles_for, scored_page, scorer
+from app import tasks
+from app.tasks import rescore_due, rescore_leads, rescore_sweep
+
+
+class TestPersistedScores(DatabaseTestCase):
+    """Test that scores are stored and only changed leads are rescored"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([Business(id=1, name='Test Biz'), Business(id=2, name='Other')])
+        week_ago = datetime.utcnow() - timedelta(days=10)
+        db.session.add_all([
+            Lead(id=1, business_id=1, first_name='Ann', email='ann@acme.io', phone='+15551110001',
+                 company='Acme Legal', notes='Urgent, need quote from a lawyer', created_at=week_ago),
+            Lead(id=2, business_id=1, first_name='Bo', email='bo@gmail.com', created_at=week_ago),
+            Lead(id=3, business_id=2, first_name='Cy', notes='just exploring options', created_at=week_ago),
+        ])
+        db.session.commit()
+
+    def test_scores_are_persisted_like_score_lead(self):
+        self.assertEqual(rescore_leads(), {'scanned': 3, 'rescored': 3, 'last_id': 3})
+
+        lead = db.session.get(Lead, 1)
+        stored = AIScoring.query.filter_by(lead_id=1).one()
+        expected = scorer.score_lead(lead_inputs(lead))
+        self.assertEqual(lead.score, expected['ai_score'])
+        self.assertEqual(stored.factors, expected)
+        self.assertEqual(stored.priority, {1: 'high', 2: 'medium', 3: 'low'}[expected['priority']])
+
+    def test_rescore_skips_unchanged_leads(self):
+        rescore_leads()
+        updated_at = db.session.get(Lead, 1).updated_at
+
+        self.assertEqual(rescore_leads()['rescored'], 0)
+
+        lead = db.session.get(Lead, 2)
+        lead.notes = 'Ready to start ASAP, budget approved'
+        db.session.commit()
+        self.assertEqual(rescore_leads()['rescored'], 1)
+        self.assertEqual(db.session.get(Lead, 1).updated_at, updated_at)
+
+    def test_config_change_rescores_that_business_only(self):
+        rescore_leads()
+        db.session.add(AIScoringConfig(business_id=2, recency_weight=0.5))
+        db.session.commit()
+
+        self.assertEqual(rescore_leads()['rescored'], 1)
+        self.assertEqual(rescore_leads(business_id=1)['rescored'], 0)
+
+    def test_sweep_scores_unqueued_leads_and_reschedules(self):
+        """Leads written without an enqueued rescore (e.g. inbound SMS) are picked up by the sweep"""
+        rescore_leads()
+        db.session.add(Lead(id=4, business_id=2, phone='+15551110004', source='sms'))
+        db.session.commit()
+
+        with mock.patch.object(tasks, 'schedule_rescore_sweep') as schedule:
+            self.assertEqual(rescore_sweep()['rescored'], 1)
+        schedule.assert_called_once_with()
+        self.assertEqual(AIScoring.query.filter_by(lead_id=4).count(), 1)
+
+        # A failing sweep still schedules the next one
+        with mock.patch.object(tasks, 'schedule_rescore_sweep') as schedule, \
+                mock.patch.object(tasks, 'rescore_batch', side_effect=RuntimeError):
+            db.session.get(Lead, 4).notes = 'changed'
+            db.session.commit()
+            with self.assertRaises(RuntimeError):
+                rescore_sweep()
+        schedule.assert_called_once_with()
+
+    def test_config_is_applied_from_a_cached_profile(self):
+        db.session.add(AIScoringConfig(business_id=2, source_weight=0.5, high_value_sources=['sms'],
+                                       peak_contact_hours={'start': 18, 'end': 21}))
+        db.session.get(Lead, 3).source = 'sms'
+        db.session.commit()
+        rescore_leads()
+
+        profile = profiles_for([2])[2]
+        self.assertIs(profiles_for([2])[2], profile)
+        stored = AIScoring.query.filter_by(lead_id=3).one()
+        self.assertEqual(stored.factors, scorer.score_lead(lead_inputs(db.session.get(Lead, 3)), profile))
+        self.assertEqual(stored.best_contact_time, 'evening')
+        self.assertIs(profiles_for([1])[1], scorer.default_profile())
+
+        # Saving the config bumps updated_at, which compiles a new profile
+        db.session.get(AIScoringConfig, AIScoringConfig.query.one().id).source_weight = 0.1
+        db.session.commit()
+        self.assertIsNot(profiles_for([2])[2], profile)
+        self.assertEqual(rescore_leads()['rescored'], 1)
+
+    def test_recency_bucket_change_rescores(self):
+        lead = db.session.get(Lead, 2)
+        lead.created_at = datetime.utcnow() - timedelta(minutes=30)
+        db.session.commit()
+        rescore_leads()
+        self.assertEqual(AIScoring.query.filter_by(lead_id=2).one().recency, 1.2)
+
+        # As if lead 1 had been scored while it was still fresh
+        db.session.execute(db.update(AIScoring).where(AIScoring.lead_id == 1).values(recency=1.2))
+        db.session.commit()
+        self.assertEqual(rescore_leads()['rescored'], 1)
+        self.assertEqual(AIScoring.query.filter_by(lead_id=1).one().recency, 0.8)
+
+    def test_next_rescore_at_is_the_next_recency_boundary(self):
+        created = datetime.utcnow() - timedelta(minutes=30)
+        db.session.get(Lead, 2).created_at = created
+        db.session.commit()
+        rescore_leads()
+
+        self.assertEqual(AIScoring.query.filter_by(lead_id=2).one().next_rescore_at, created + timedelta(hours=1))
+        # Past the last boundary (168h): the multiplier won't change again
+        self.assertIsNone(AIScoring.query.filter_by(lead_id=1).one().next_rescore_at)
+
+    def test_rescore_due_only_touches_leads_past_their_boundary(self):
+        created = datetime.utcnow() - timedelta(hours=2)
+        db.session.get(Lead, 2).created_at = created
+        db.session.get(Lead, 3).created_at = created
+        db.session.commit()
+        rescore_leads()
+        # Lead 2 as if it had been scored before turning one hour old
+        db.session.execute(db.update(AIScoring).where(AIScoring.lead_id == 2)
+                           .values(recency=1.2, next_rescore_at=created + timedelta(hours=1)))
+        db.session.commit()
+
+        self.assertEqual(rescore_due(), {'scanned': 1, 'rescored': 1})
+        score = AIScoring.query.filter_by(lead_id=2).one()
+        self.assertEqual((score.recency, score.next_rescore_at), (1.1, created + timedelta(hours=24)))
+        self.assertEqual(rescore_due(), {'scanned': 0, 'rescored': 0})
+
+    def test_scored_page_orders_filters_and_pages_in_sql(self):
+        rescore_leads()
+        scores = {l.id: l.score for l in Lead.query.filter_by(business_id=1)}
+
+        rows, has_more = scored_page(1, limit=1)
+        self.assertEqual([lead.id for lead, _ in rows], [max(scores, key=scores.get)])
+        self.assertTrue(has_more)
+
+        rows, has_more = scored_page(1, limit=10, min_score=max(scores.values()))
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(has_more)
+
+
+if __name__ == '__main__':
+    unittest.main()
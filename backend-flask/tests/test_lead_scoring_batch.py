@@ -0,0 +1,152 @@
+"""
+Parity tests for batch lead scoring
+score_leads_batch must return exactly what score_lead returns for every lead
+"""
+import unittest
+from unittest.mock import patch
+import datetime
+import itertools
+import sys
+import os
+
+# Add services to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
+
+import ai_lead_scorer
+from ai_lead_scorer import AILeadScorer, KeywordMatcher
+
+
+def sample_leads():
+    """Every combination of field values that exercises a different scoring branch"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    values = {
+        'budget': ['', '$1M build-out', 'about 250,000', 'Budget approved', 'negotiable', 'Tight budget', 'tbd'],
+        'timeline': ['', 'ASAP', 'next week', 'this month', 'next quarter', 'someday', 'timeline: options'],
+        'notes': [
+            '',
+            'Urgent - need quote, decision maker here',
+            'Interested in a proposal and estimate for our Botox clinic',
+            'Looking for a lawyer. ' * 6,
+            'Hair salon renovation project, exploring options',
+        ],
+        'email': ['', 'jane@gmail.com', 'ops@acme-build.com', 'not-an-email'],
+        'created_at': [
+            '',
+            (now - datetime.timedelta(minutes=10)).isoformat(),
+            (now - datetime.timedelta(hours=12)).isoformat().replace('+00:00', 'Z'),
+            now - datetime.timedelta(days=2),
+            (now - datetime.timedelta(days=5)).isoformat(),
+            (now - datetime.timedelta(days=30)).isoformat(),
+            '2024-01-01T00:00:00',
+            'yesterday',
+        ],
+    }
+    keys = list(values)
+    leads = []
+    for i, combo in enumerate(itertools.product(*values.values())):
+        lead = dict(zip(keys, combo))
+        lead['phone'] = ['', '+1 (555) 123-4567', '12345'][i % 3]
+        lead['company_name'] = ['', 'Acme Construction', 'XY'][i % 3]
+        lead['project_type'] = ['', 'laser', 'legal'][i % 3]
+        leads.append(lead)
+    # Bad input takes score_lead's fallback
+    leads += [None, {'budget': 50000}, {'email': 42}, {'phone': 5551234567}, {'company_name': 7}]
+    return leads
+
+
+class TestBatchScoringParity(unittest.TestCase):
+    """Test score_leads_batch against the scalar score_lead"""
+
+    def setUp(self):
+        self.scorer = AILeadScorer()
+        self.leads = sample_leads()
+
+    def test_batch_matches_scalar(self):
+        expected = [self.scorer.score_lead(lead) for lead in self.leads]
+        self.assertEqual(self.scorer.score_leads_batch(self.leads), expected)
+
+    def test_batch_matches_scalar_without_numpy(self):
+        expected = [self.scorer.score_lead(lead) for lead in self.leads]
+        with patch.object(ai_lead_scorer, 'np', None):
+            self.assertEqual(self.scorer.score_leads_batch(self.leads), expected)
+
+    def test_results_are_independent(self):
+        results = self.scorer.score_leads_batch([{'notes': 'urgent'}, {'notes': 'urgent'}])
+        results[0]['insights'].append('edited')
+        self.assertNotIn('edited', results[1]['insights'])
+
+    def test_bulk_score_leads_uses_batch_results(self):
+        leads = self.leads[:50]
+        scored = self.scorer.bulk_score_leads(leads)
+        self.assertEqual(len(scored), 50)
+        self.assertEqual([s['ai_score'] for s in scored], sorted((s['ai_score'] for s in scored), reverse=True))
+
+
+class TestScoringProfiles(unittest.TestCase):
+    """Test per-business profiles compiled from AIScoringConfig"""
+
+    config = {
+        'recency_weight': 0.6, 'source_weight': 0.3, 'engagement_weight': 0.5,
+        'profile_completeness_weight': 0.1, 'high_value_sources': ['Referral'],
+        'peak_contact_hours': {'start': 13, 'end': 18},
+    }
+
+    def setUp(self):
+        self.scorer = AILeadScorer()
+        self.leads = sample_leads()
+        for i, lead in enumerate(self.leads):
+            if isinstance(lead, dict):
+                lead['source'] = ['', 'referral', 'cold_call'][i % 3]
+        self.leads.append({'source': 7})
+        self.profile = self.scorer.compile_profile(self.config)
+
+    def test_default_profile_scores_as_before(self):
+        lead = self.leads[1]
+        self.assertEqual(self.scorer.score_lead(lead, self.scorer.compile_profile(None)),
+                         self.scorer.score_lead(lead))
+
+    def test_batch_matches_scalar_with_profile(self):
+        expected = [self.scorer.score_lead(lead, self.profile) for lead in self.leads]
+        self.assertEqual(self.scorer.score_leads_batch(self.leads, profile=self.profile), expected)
+        with patch.object(ai_lead_scorer, 'np', None):
+            self.assertEqual(self.scorer.score_leads_batch(self.leads, profile=self.profile), expected)
+
+    def test_profile_weights_and_sources(self):
+        budget, urgency, engagement = self.profile.weights_for('law_firms')
+        self.assertAlmostEqual(engagement, 0.5)
+        self.assertAlmostEqual(budget / urgency, 0.4 / 0.3)
+        self.assertEqual(self.profile.high_value_sources, frozenset({'referral'}))
+
+        result = self.scorer.score_lead({'source': 'Referral', 'email': 'a@b.co'}, self.profile)
+        self.assertEqual(result['breakdown']['source_score'], 100.0)
+        self.assertEqual(result['breakdown']['completeness_score'], 20.0)
+        self.assertEqual(result['best_contact_time'], 'afternoon')
+        self.assertNotEqual(self.profile.fingerprint, self.scorer.default_profile().fingerprint)
+
+    def test_profile_is_immutable(self):
+        with self.assertRaises(Exception):
+            self.profile.source_weight = 1.0
+        with self.assertRaises(TypeError):
+            self.profile.weights['default'] = (1.0, 0.0, 0.0)
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    """Test the compiled keyword matcher agrees with substring checks"""
+
+    def test_matches_and_counts_overlapping_keywords(self):
+        matcher = KeywordMatcher(['law', 'lawyer', 'yer', 'firm'])
+        self.assertTrue(matcher.matches('call a lawyer'))
+        self.assertFalse(matcher.matches('call a plumber'))
+        self.assertEqual(matcher.count('call a lawyer'), 3)
+
+    def test_keywords_are_literal(self):
+        matcher = KeywordMatcher(['$1m', 'a.b'])
+        self.assertTrue(matcher.matches('budget $1m'))
+        self.assertFalse(matcher.matches('axb'))
+
+    def test_empty_keyword_list_matches_nothing(self):
+        self.assertFalse(KeywordMatcher([]).matches('anything'))
+
+
+if __name__ == '__main__':
+    unittest.main()
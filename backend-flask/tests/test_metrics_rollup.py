@@ -0,0 +1,147 @@
+"""
+Unit tests for the incremental daily ROI rollups
+Runs against an in-memory SQLite database
+"""
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import ActivityLog, Booking, Business, Conversation, DailyMetrics, Lead, Message, RollupWatermark
+from app.metrics_rollup import daily_series, rebuild, refresh_daily_metrics, rollup_roi
+from app.roi_metrics import business_roi
+
+
+def unix(when):
+    return int((when - datetime(1970, 1, 1)).total_seconds())
+
+
+class TestDailyMetricsRollup(DatabaseTestCase):
+    """Test that the rollups track the source tables incrementally and sum to the live ROI"""
+
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2026, 3, 31, 12, 0)
+        self.today = self.now.date()
+        self.day1, self.day2 = self.now - timedelta(days=3), self.now - timedelta(days=2)
+        db.session.add_all([
+            Business(id=1, name='Test Biz', avg_deal_size=Decimal('1000'), cost_per_lead=Decimal('20')),
+            Business(id=2, name='Other'),
+            Lead(id=1, business_id=1, first_name='Ann', created_at=self.day1),
+            Lead(id=2, business_id=1, first_name='Bo', created_at=self.day2),
+            Lead(id=3, business_id=2, first_name='Cy', created_at=self.day2),
+            Conversation(id=1, lead_id=1, channel='sms'),
+            ActivityLog(business_id=1, lead_id=1, action='call_logged', created_at=self.day1),
+            ActivityLog(business_id=1, lead_id=1, action='lead_viewed', created_at=self.day1),
+        ])
+        db.session.add_all([
+            Booking(id=1, business_id=1, lead_id=1, starts_at=self.day2, outcome='closed',
+                    revenue_generated=Decimal('2500'), updated_at=self.day1),
+            Booking(id=2, business_id=1, lead_id=2, starts_at=self.day2, updated_at=self.day1),
+            Message(conversation_id=1, sender='user', content='hi', status='delivered', ts=unix(self.day1),
+                    updated_at=self.day1),
+        ])
+        db.session.commit()
+
+    def rows(self):
+        return {(r.business_id, r.day): r for r in DailyMetrics.query.all()}
+
+    def test_refresh_rolls_up_days_and_advances_watermarks(self):
+        result = refresh_daily_metrics(now=self.now)
+        self.assertFalse(result['more'])
+
+        rows = self.rows()
+        first, second = rows[(1, self.day1.date())], rows[(1, self.day2.date())]
+        self.assertEqual((first.leads_received, first.calls_made, first.sms_sent, first.leads_responded),
+                         (1, 1, 1, 1))
+        self.assertEqual((second.leads_received, second.appointments_booked, second.deals_closed), (1, 2, 1))
+        self.assertEqual((float(second.revenue), float(second.cost)), (2500.0, 20.0))
+        self.assertEqual(float(rows[(2, self.day2.date())].cost), 50.0)
+
+        mark = RollupWatermark.query.filter_by(source='leads').one()
+        self.assertEqual((mark.last_at, mark.last_id), (self.day2, 3))
+        # Nothing new: nothing read
+        self.assertEqual(refresh_daily_metrics(now=self.now)['scanned'], 0)
+
+    def test_only_changed_rows_are_read(self):
+        refresh_daily_metrics(now=self.now)
+        later = self.now + timedelta(hours=1)
+        db.session.add(Lead(id=4, business_id=1, first_name='Di', created_at=later))
+        booking = db.session.get(Booking, 2)
+        booking.outcome = 'closed'
+        booking.updated_at = later
+        db.session.commit()
+
+        result = refresh_daily_metrics(now=later + timedelta(hours=1))
+        self.assertEqual(result['scanned'], 2)
+        self.assertEqual(result['cells'], 2)
+        rows = self.rows()
+        # The unpriced closed deal is valued at the business's average deal size
+        self.assertEqual(float(rows[(1, self.day2.date())].revenue), 3500.0)
+        self.assertEqual(rows[(1, later.date())].leads_received, 1)
+
+    def test_rows_newer_than_the_lag_wait(self):
+        refresh_daily_metrics(now=self.now)
+        db.session.add(Lead(id=4, business_id=1, first_name='Di', created_at=self.now))
+        db.session.commit()
+        self.assertEqual(refresh_daily_metrics(now=self.now + timedelta(seconds=5))['scanned'], 0)
+        self.assertEqual(refresh_daily_metrics(now=self.now + timedelta(minutes=5))['scanned'], 1)
+
+    def test_small_batches_report_more(self):
+        result = refresh_daily_metrics(batch_size=1, now=self.now)
+        self.assertTrue(result['more'])
+        while refresh_daily_metrics(batch_size=1, now=self.now)['more']:
+            pass
+        self.assertEqual(rollup_roi(1, 30, today=self.today).leads_uploaded, 2)
+
+    def test_rollup_window_matches_live_metrics(self):
+        refresh_daily_metrics(now=self.now)
+        rolled, live = rollup_roi(1, 30, today=self.today), business_roi(1, 30, now=self.now)
+        for field in ('leads_uploaded', 'leads_responded', 'calls_made', 'sms_sent', 'appointments_booked',
+                      'deals_closed', 'revenue_generated', 'total_cost', 'roi_percentage'):
+            self.assertEqual(getattr(rolled, field), getattr(live, field), field)
+        # Day 1 falls outside a 3-day window ending today
+        self.assertEqual(rollup_roi(1, 3, today=self.today).leads_uploaded, 1)
+
+    def test_lead_messaged_on_several_days_counts_once(self):
+        db.session.add_all([
+            Message(conversation_id=1, sender='user', content='following up', status='delivered',
+                    ts=unix(self.day2), updated_at=self.day2),
+            Message(conversation_id=1, sender='user', content='still there?', status='sent',
+                    ts=unix(self.now - timedelta(hours=1)), updated_at=self.now - timedelta(hours=1)),
+        ])
+        db.session.commit()
+        refresh_daily_metrics(now=self.now)
+
+        rows = self.rows()
+        self.assertEqual([rows[(1, d)].leads_responded for d in (self.day1.date(), self.day2.date())], [1, 0])
+        self.assertEqual(rows[(1, self.today)].sms_sent, 1)
+        self.assertEqual(rollup_roi(1, 30, today=self.today).leads_responded, 1)
+        self.assertEqual(business_roi(1, 30, now=self.now).leads_responded, 1)
+        # Responded to before the window: not counted again inside it
+        self.assertEqual(rollup_roi(1, 3, today=self.today).leads_responded, 0)
+        self.assertEqual(rollup_roi(1, 3, today=self.today).sms_sent, 2)
+
+    def test_days_left_without_activity_are_removed(self):
+        refresh_daily_metrics(now=self.now)
+        later = self.now + timedelta(hours=1)
+        for booking in Booking.query.all():
+            booking.status = 'canceled'
+            booking.outcome = None
+            booking.updated_at = later
+        Lead.query.filter(Lead.id.in_([2, 3])).delete()
+        db.session.commit()
+
+        refresh_daily_metrics(now=later + timedelta(hours=1))
+        self.assertNotIn((1, self.day2.date()), self.rows())
+        # Deletes aren't seen incrementally; a rebuild recomputes the window
+        self.assertIn((2, self.day2.date()), self.rows())
+        rebuild(30, today=self.today)
+        self.assertNotIn((2, self.day2.date()), self.rows())
+        self.assertEqual([r.day for r in daily_series(1, 30, today=self.today)], [self.day1.date()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for the inbound SMS number routing table
+Runs against an in-memory SQLite database
+"""
+import unittest
+import os
+from unittest import mock
+
+from sqlalchemy import event
+from redis.exceptions import RedisError
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import Business
+from app.number_routing import NumberRouter, Route
+
+
+class TestNumberRouter(DatabaseTestCase):
+    """Test To-number routing and reloads"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            Business(id=1, name='Default'),
+            Business(id=2, name='Spa', twilio_phone_number='+1 (555) 010-2000', twilio_auth_token='spa-token'),
+            Business(id=3, name='Salon', twilio_phone_number='5550103000'),
+        ])
+        db.session.commit()
+        self.router = NumberRouter(listen=False)
+        self.env = mock.patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'platform-token'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        super().tearDown()
+
+    def test_routes_to_business_and_token(self):
+        self.assertEqual(self.router.resolve('+15550102000'), Route(2, 'spa-token'))
+        # No tenant token: fall back to the platform token
+        self.assertEqual(self.router.resolve('+15550103000'), Route(3, 'platform-token'))
+        # Unknown number keeps the single-tenant default
+        self.assertEqual(self.router.resolve('+15559999999'), Route(1, 'platform-token'))
+
+        with mock.patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': ''}):
+            self.assertIsNone(self.router.resolve('+15559999999'))
+
+    def test_lookups_do_not_query_until_invalidated(self):
+        self.router.load()
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            for _ in range(5):
+                self.router.resolve('+15550102000')
+            self.assertEqual(statements, [])
+
+            db.session.get(Business, 2).twilio_auth_token = 'rotated'
+            db.session.commit()
+            statements.clear()
+            # Redis being down must not stop this process from reloading
+            with mock.patch('app.invalidation.get_redis') as get_redis:
+                get_redis.return_value.publish.side_effect = RedisError('down')
+                self.router.invalidate()
+            self.assertEqual(self.router.resolve('+15550102000'), Route(2, 'rotated'))
+            self.assertEqual(len(statements), 1)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Query plan checks for the hot lead/conversation/message access paths
+Each query is captured as executed and re-run under EXPLAIN QUERY PLAN on SQLite
+"""
+import unittest
+from datetime import datetime
+
+from sqlalchemy import event, tuple_
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import Business, Lead, Conversation, Message, ROIReport, RollupWatermark
+from app.lead_import import _resolve_existing
+from app.lead_scoring import due_rows, scored_page
+from app.metrics_rollup import SOURCES, _changed_rows, rollup_activity
+from app.roi_metrics import activity_counts
+
+
+class TestHotQueryPlans(DatabaseTestCase):
+    """Test that tenant-scoped hot queries are served by their indexes"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Test Biz'))
+        db.session.commit()
+
+    def plans(self, fn):
+        """Run fn, then EXPLAIN every SELECT it issued; returns one plan string per statement."""
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        self.assertTrue(captured, 'no SELECT was executed')
+        raw = db.engine.raw_connection()
+        try:
+            cur = raw.cursor()
+            return [
+                ' | '.join(row[-1] for row in cur.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall())
+                for sql, params in captured
+            ]
+        finally:
+            raw.close()
+
+    def assertUsesIndex(self, plan, index):
+        self.assertIn(index, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_inbound_sms_lead_lookup(self):
+        [plan] = self.plans(lambda: Lead.query.filter_by(business_id=1, phone_key='+15551234567').first())
+        self.assertUsesIndex(plan, 'uq_leads_business_phone_key')
+
+    def test_import_dedup_lookup(self):
+        rows = [{'email_key': 'a@example.com', 'phone_key': '+15551234567'},
+                {'email_key': None, 'phone_key': '+15557654321'}]
+        email_plan, phone_plan = self.plans(lambda: _resolve_existing(rows, 1))
+        self.assertUsesIndex(email_plan, 'uq_leads_business_email_key')
+        self.assertUsesIndex(phone_plan, 'uq_leads_business_phone_key')
+
+    def test_lead_listing_page(self):
+        def page():
+            (Lead.query.filter(Lead.business_id == 1, Lead.status == 'new')
+             .filter(tuple_(Lead.created_at, Lead.id) < (datetime(2026, 1, 1), 500))
+             .order_by(Lead.created_at.desc(), Lead.id.desc()).limit(51).all())
+        [plan] = self.plans(page)
+        self.assertUsesIndex(plan, 'ix_leads_business_status_created_id')
+
+    def test_lead_score_page(self):
+        [plan] = self.plans(lambda: scored_page(1, limit=50, min_score=70))
+        self.assertUsesIndex(plan, 'ix_leads_business_score_id')
+
+    def test_due_rescore_walk(self):
+        [plan] = self.plans(lambda: db.session.execute(
+            due_rows(datetime(2026, 1, 1), after=(datetime(2025, 12, 31), 10)).limit(1000)).all())
+        self.assertUsesIndex(plan, 'ix_ai_scoring_next_rescore_at')
+
+    def test_conversation_by_lead_and_channel(self):
+        [plan] = self.plans(lambda: Conversation.query.filter_by(lead_id=1, channel='sms').first())
+        self.assertUsesIndex(plan, 'ix_conversations_lead_channel')
+
+    def test_messages_by_conversation_in_ts_order(self):
+        [plan] = self.plans(lambda: Message.query.filter(Message.conversation_id == 1)
+                            .order_by(Message.ts.asc()).all())
+        self.assertUsesIndex(plan, 'ix_messages_conversation_ts')
+
+    def test_roi_aggregates(self):
+        leads, bookings, messages, first_responses, calls = self.plans(
+            lambda: activity_counts([1], datetime(2026, 1, 1), datetime(2026, 2, 1)))
+        self.assertIn('ix_leads_business_created_id', leads)
+        self.assertIn('ix_bookings_business_starts_at', bookings)
+        self.assertIn('ix_messages_conversation_ts', messages)
+        self.assertIn('ix_messages_conversation_ts', first_responses)
+        self.assertIn('ix_activity_logs_business_action_created', calls)
+
+    def test_rollup_window_read(self):
+        plan, = self.plans(lambda: rollup_activity([1], datetime(2026, 1, 1).date(), datetime(2026, 3, 31).date()))
+        self.assertIn('uq_daily_metrics_business_day', plan)
+
+    def test_rollup_watermark_walks(self):
+        expected = {'leads': 'ix_leads_created_id', 'activity_logs': 'ix_activity_logs_created_id',
+                    'bookings': 'ix_bookings_updated_id', 'messages': 'ix_messages_updated_id'}
+        mark = RollupWatermark(source='test', last_at=datetime(2026, 1, 1), last_id=10)
+        for source in SOURCES:
+            plan, = self.plans(lambda: _changed_rows(source, mark, datetime(2026, 2, 1), 100))
+            self.assertIn(expected[source.name], plan, source.name)
+
+
+    def test_latest_roi_report(self):
+        plan, = self.plans(lambda: ROIReport.query.filter_by(business_id=1)
+                           .order_by(ROIReport.created_at.desc()).first())
+        self.assertUsesIndex(plan, 'ix_roi_reports_business_created')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Unit tests for the per-tenant rate-limit key and plan quotas
+Runs against an in-memory SQLite database
+"""
+import unittest
+from contextlib import contextmanager
+
+
+from support import DatabaseTestCase
+from app import PLAN_QUOTAS, plan_quota, tenant_key
+from app.auth import issue_token, user_claims
+from app.db import db
+from app.models import Business, User
+
+
+class TestRateLimitKeys(DatabaseTestCase):
+    """Test that limits are keyed by tenant and sized by the caller's plan"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Mine'))
+        db.session.add_all([
+            User(email='pro@x.com', business_id=1, plan='pro', subscription_status='active'),
+            User(email='lapsed@x.com', business_id=1, plan='pro', subscription_status='canceled'),
+            User(email='new@x.com'),
+        ])
+        db.session.commit()
+
+    @contextmanager
+    def request(self, claims=None):
+        """A request with these token claims; a fresh app context so g is per request, as in serving."""
+        headers = {'Authorization': 'Bearer ' + issue_token(claims)} if claims is not None else {}
+        with self.app.app_context(), self.app.test_request_context(
+                '/', headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.7'}):
+            yield
+
+    def test_tenant_key(self):
+        with self.request({'sub': 'pro@x.com', 'business_id': 1}):
+            self.assertEqual(tenant_key(), 'tenant:1')
+        with self.request({'sub': 'new@x.com'}):
+            self.assertEqual(tenant_key(), 'tenant:new@x.com')
+        with self.request():
+            self.assertEqual(tenant_key(), 'ip:10.0.0.7')
+
+    def test_plan_quota(self):
+        with self.request({'sub': 'pro@x.com', 'plan': 'agency'}):
+            self.assertEqual(plan_quota(), PLAN_QUOTAS['agency'])
+        # Unknown plans and anonymous callers get the trial quota
+        with self.request({'sub': 'pro@x.com', 'plan': 'enterprise-legacy'}):
+            self.assertEqual(plan_quota(), PLAN_QUOTAS['trial'])
+        with self.request():
+            self.assertEqual(plan_quota(), PLAN_QUOTAS['trial'])
+
+    def test_plan_claim_follows_subscription(self):
+        self.assertEqual(user_claims('pro@x.com')['plan'], 'pro')
+        self.assertEqual(user_claims('lapsed@x.com')['plan'], 'trial')
+        self.assertEqual(user_claims('new@x.com')['plan'], 'trial')
+        with self.request(user_claims('pro@x.com')):
+            self.assertEqual(plan_quota(), PLAN_QUOTAS['pro'])
+
+
+if __name__ == '__main__':
+    unittest.main()
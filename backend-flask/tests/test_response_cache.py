@@ -0,0 +1,182 @@
+"""
+Unit tests for the analytics response cache
+Redis is replaced by a small in-memory stand-in with the commands the cache uses
+"""
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import jwt
+from flask import Flask, request
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.response_cache import ResponseCache
+from app.settings import settings
+
+
+class MemoryRedis:
+    """The handful of Redis commands ResponseCache issues, kept in a dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _encode(self, value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = self._encode(value)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        with self.lock:
+            value = int(self.data.get(key, b'0')) + 1
+            self.data[key] = self._encode(value)
+            return value
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self.data.get(key) or {})
+
+    def hset(self, key, mapping):
+        with self.lock:
+            self.data[key] = {k.encode(): self._encode(v) for k, v in mapping.items()}
+
+    def expire(self, key, ttl):
+        pass
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+def token(business_id):
+    return 'Bearer ' + jwt.encode({'sub': '1', 'business_id': business_id}, settings.JWT_SECRET, algorithm='HS256')
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test caching, invalidation, coalescing and conditional requests"""
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        self.get_redis = mock.patch('app.response_cache.get_redis', return_value=self.redis)
+        self.get_redis.start()
+        self.cache = ResponseCache()
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+        app = Flask(__name__)
+
+        @app.get('/roi')
+        @self.cache.cached('roi', vary=('days',))
+        def roi():
+            self.calls += 1
+            self.release.wait(5)
+            return {'days': request.args.get('days'), 'calls': self.calls}, 200
+
+        @app.get('/missing')
+        @self.cache.cached('roi')
+        def missing():
+            self.calls += 1
+            return {'error': 'nope'}, 404
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.get_redis.stop()
+
+    def get(self, path, business_id=1, **headers):
+        return self.client.get(path, headers={'Authorization': token(business_id), **headers})
+
+    def test_hit_on_normalized_params(self):
+        first = self.get('/roi?days=30&_=1')
+        second = self.get('/roi?_=2&days=30')
+        self.assertEqual((first.headers['X-Cache'], second.headers['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(second.json, {'days': '30', 'calls': 1})
+        self.assertEqual(second.headers['Content-Type'], 'application/json')
+        self.assertEqual(self.get('/roi?days=7').json['calls'], 2)
+        self.assertEqual(self.cache.stats()['roi'], {'miss': 2, 'hit': 1})
+
+    def test_entries_are_per_tenant(self):
+        self.get('/roi?days=30', business_id=1)
+        self.assertEqual(self.get('/roi?days=30', business_id=2).json['calls'], 2)
+
+    def test_invalidate_expires_tenant_entries(self):
+        self.get('/roi?days=30', business_id=1)
+        self.get('/roi?days=30', business_id=2)
+        self.cache.invalidate('roi', [1])
+        self.assertEqual(self.get('/roi?days=30', business_id=1).headers['X-Cache'], 'MISS')
+        self.assertEqual(self.get('/roi?days=30', business_id=2).headers['X-Cache'], 'HIT')
+
+    def test_etag_revalidation(self):
+        etag = self.get('/roi?days=30').headers['ETag']
+        resp = self.get('/roi?days=30', **{'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.get('/roi?days=30', **{'If-None-Match': '"other"'}).status_code, 200)
+        self.assertEqual(self.cache.stats()['roi']['not_modified'], 1)
+
+    def test_errors_are_not_cached(self):
+        self.get('/missing')
+        self.assertEqual(self.get('/missing').status_code, 404)
+        self.assertEqual(self.calls, 2)
+
+    def test_identical_requests_coalesce(self):
+        self.release.clear()
+        results = []
+        first = threading.Thread(target=lambda: results.append(self.get('/roi?days=30').json))
+        first.start()
+        while not self.calls:
+            time.sleep(0.01)
+        second = threading.Thread(target=lambda: results.append(self.get('/roi?days=30').json))
+        second.start()
+        time.sleep(0.1)
+        self.release.set()
+        first.join()
+        second.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'days': '30', 'calls': 1}] * 2)
+        self.assertEqual(self.cache.stats()['roi'].get('coalesced'), 1)
+
+    def test_redis_down_serves_uncached(self):
+        with mock.patch.object(self.redis, 'pipeline', side_effect=RedisConnectionError()):
+            resp = self.get('/roi?days=30')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.cache.stats()['roi'], {'bypass': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
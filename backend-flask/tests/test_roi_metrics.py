@@ -0,0 +1,190 @@
+"""
+Unit tests for ROI metrics counted from leads, bookings, messages and activity logs
+Runs against an in-memory SQLite database
+"""
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import ActivityLog, Booking, Business, Conversation, Lead, Message, ROIReport
+from app.roi_metrics import activity_counts, business_roi, period
+from app import tasks
+from app.workers.roi_worker import roi_worker
+
+
+class TestROIMetrics(DatabaseTestCase):
+    """Test that ROI metrics reflect the business's own activity in the period"""
+
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2026, 3, 31, 12, 0)
+        recent, old = self.now - timedelta(days=3), self.now - timedelta(days=60)
+        db.session.add_all([
+            Business(id=1, name='Test Biz', avg_deal_size=Decimal('1000'), cost_per_lead=Decimal('20')),
+            Business(id=2, name='Other'),
+            Lead(id=1, business_id=1, first_name='Ann', created_at=recent),
+            Lead(id=2, business_id=1, first_name='Bo', created_at=recent),
+            Lead(id=3, business_id=1, first_name='Cy', created_at=old),
+            Lead(id=4, business_id=2, first_name='Di', created_at=recent),
+            Booking(business_id=1, lead_id=1, starts_at=recent, show_status='showed', outcome='closed',
+                    revenue_generated=Decimal('2500')),
+            Booking(business_id=1, lead_id=2, starts_at=recent, show_status='showed', outcome='closed'),
+            Booking(business_id=1, lead_id=2, starts_at=recent, status='canceled'),
+            Booking(business_id=1, lead_id=3, starts_at=old, outcome='closed', revenue_generated=Decimal('9999')),
+            Booking(business_id=2, lead_id=4, starts_at=recent, outcome='closed', revenue_generated=Decimal('50')),
+            Conversation(id=1, lead_id=1, channel='sms'),
+            Conversation(id=2, lead_id=2, channel='email'),
+            Conversation(id=3, lead_id=4, channel='sms'),
+            ActivityLog(business_id=1, lead_id=1, action='call_logged', created_at=recent),
+            ActivityLog(business_id=1, lead_id=1, action='roi_calculated', created_at=recent),
+            ActivityLog(business_id=2, lead_id=4, action='call_logged', created_at=recent),
+        ])
+        ts = int((recent - datetime(1970, 1, 1)).total_seconds())
+        db.session.add_all([
+            Message(conversation_id=1, sender='user', content='hi', status='delivered', ts=ts),
+            Message(conversation_id=1, sender='ai', content='hi', status='failed', ts=ts),
+            Message(conversation_id=1, sender='lead', content='hey', status='received', ts=ts),
+            Message(conversation_id=2, sender='user', content='hi', status='sent', ts=ts),
+            Message(conversation_id=3, sender='user', content='hi', status='sent', ts=ts),
+        ])
+        db.session.commit()
+
+    def test_counts_are_per_business_and_period(self):
+        counts = activity_counts([1, 2], *period(30, self.now))
+        self.assertEqual(counts[1], {
+            'leads': 2, 'leads_responded': 2, 'appointments': 2, 'shows': 2, 'no_shows': 0,
+            'deals_closed': 2, 'revenue': 2500.0, 'unpriced_deals': 1, 'sms_sent': 1, 'emails_sent': 1,
+            'calls_made': 1,
+        })
+        self.assertEqual((counts[2]['leads'], counts[2]['revenue'], counts[2]['calls_made']), (1, 50.0, 1))
+
+    def test_business_without_activity_gets_zeros(self):
+        metrics = business_roi(3, 30, now=self.now)
+        self.assertEqual((metrics.leads_uploaded, metrics.revenue_generated), (0, 0.0))
+
+    def test_metrics_use_business_settings(self):
+        metrics = business_roi(1, 30, now=self.now)
+        # 2500 recorded + one closed deal without revenue at the 1000 average deal size
+        self.assertEqual(metrics.revenue_generated, 3500.0)
+        self.assertEqual(metrics.total_cost, 40.0)
+        self.assertEqual(metrics.deals_closed, 2)
+        self.assertEqual(metrics.conversion_rate, 1.0)
+        self.assertAlmostEqual(metrics.roi_percentage, (3500 - 40) / 40 * 100)
+
+
+class TestROIFleet(DatabaseTestCase):
+    """Test the batched, checkpointed ROI report run over all businesses"""
+
+    def setUp(self):
+        super().setUp()
+        self.period_end = datetime(2026, 4, 1)
+        recent = self.period_end - timedelta(days=2)
+        db.session.add_all([Business(id=i, name=f'Biz {i}') for i in range(1, 8)])
+        db.session.add_all([
+            Lead(business_id=i, first_name='Ann', created_at=recent) for i in (1, 2, 3, 5, 7)
+        ])
+        db.session.add(Booking(business_id=2, lead_id=2, starts_at=recent, outcome='closed',
+                               revenue_generated=Decimal('900')))
+        db.session.commit()
+
+    def reports(self):
+        return {r.business_id: r for r in ROIReport.query.all()}
+
+    def test_reports_for_businesses_with_activity(self):
+        result = roi_worker.calculate_roi_range(1, 7, self.period_end, batch_size=3)
+        self.assertEqual(result, {'businesses': 7, 'reports': 5})
+        reports = self.reports()
+        self.assertEqual(sorted(reports), [1, 2, 3, 5, 7])
+        self.assertEqual((reports[2].deals_closed, float(reports[2].estimated_revenue)), (1, 900.0))
+        self.assertEqual(reports[2].period_start, self.period_end - timedelta(days=30))
+        self.assertEqual(ActivityLog.query.filter_by(action='roi_calculated').count(), 5)
+
+    def test_rerun_resumes_from_checkpoint(self):
+        roi_worker.calculate_roi_range(1, 7, self.period_end, batch_size=3)
+        # Same period: every batch is already committed
+        self.assertEqual(roi_worker.calculate_roi_range(1, 7, self.period_end, batch_size=3)['businesses'], 0)
+        self.assertEqual(ROIReport.query.count(), 5)
+        # A new period starts the range over
+        self.assertEqual(roi_worker.calculate_roi_range(1, 7, self.period_end + timedelta(days=1))['reports'], 5)
+
+    def assertOneReportEach(self, business_ids):
+        reports = [r.business_id for r in ROIReport.query.all()]
+        logs = [a.business_id for a in ActivityLog.query.filter_by(action='roi_calculated')]
+        self.assertEqual((sorted(reports), sorted(logs)), (business_ids, business_ids))
+
+    def crash_on_batch(self, n):
+        """calculate_roi_batch that writes its rows and then fails on its nth call, before the commit"""
+        batch, calls = roi_worker.calculate_roi_batch, []
+
+        def crashing(*args, **kwargs):
+            calls.append(args)
+            written = batch(*args, **kwargs)
+            if len(calls) == n:
+                raise RuntimeError('worker lost')
+            return written
+        return mock.patch.object(roi_worker, 'calculate_roi_batch', side_effect=crashing)
+
+    def test_range_failing_mid_run_resumes_without_duplicates(self):
+        with self.crash_on_batch(2), self.assertRaises(RuntimeError):
+            roi_worker.calculate_roi_range(1, 7, self.period_end, batch_size=3)
+        db.session.rollback()
+        # The first batch is committed with the checkpoint; the failed one left nothing behind
+        self.assertOneReportEach([1, 2, 3])
+
+        result = roi_worker.calculate_roi_range(1, 7, self.period_end, batch_size=3)
+        self.assertEqual(result, {'businesses': 4, 'reports': 2})
+        self.assertOneReportEach([1, 2, 3, 5, 7])
+
+    def test_fleet_rerun_resumes_failed_ranges(self):
+        enqueued = []
+
+        def enqueue(fn, *args, job_id=None, **kwargs):
+            enqueued.append((fn, args, job_id))
+            return SimpleNamespace(id=job_id or f'job-{len(enqueued)}')
+
+        fake_queue = SimpleNamespace(enqueue=enqueue)
+        with mock.patch.object(tasks, 'queue', fake_queue), mock.patch.object(tasks, 'Dependency'), \
+                mock.patch.object(roi_worker, 'fleet_ranges', return_value=[(0, 3), (4, 7)]):
+            self.assertEqual(tasks.enqueue_roi_fleet(self.period_end)['ranges'], 2)
+            first_run = list(enqueued)
+            enqueued.clear()
+            tasks.enqueue_roi_fleet(self.period_end)
+        ranges = [(args[:2], job_id) for fn, args, job_id in first_run if fn is tasks.roi_fleet_range]
+        self.assertEqual(ranges, [((0, 3), 'roi-fleet-20260401-0'), ((4, 7), 'roi-fleet-20260401-4')])
+        # A rerun enqueues the same range jobs
+        self.assertEqual([e for e in enqueued if e[0] is tasks.roi_fleet_range],
+                         [e for e in first_run if e[0] is tasks.roi_fleet_range])
+
+        # The second range's worker dies mid-range; the rerun's jobs finish the fleet
+        tasks.roi_fleet_range(0, 3, self.period_end)
+        with mock.patch.object(tasks.settings, 'ROI_FLEET_BATCH_SIZE', 2), self.crash_on_batch(2), \
+                self.assertRaises(RuntimeError):
+            tasks.roi_fleet_range(4, 7, self.period_end)
+        db.session.rollback()
+        with mock.patch.object(tasks.settings, 'ROI_FLEET_BATCH_SIZE', 2):
+            for fn, args, _ in enqueued:
+                if fn is tasks.roi_fleet_range:
+                    fn(*args)
+        self.assertOneReportEach([1, 2, 3, 5, 7])
+
+    def test_all_businesses_run_by_range(self):
+        self.assertEqual(roi_worker.fleet_ranges(range_size=4), [(0, 3), (4, 7)])
+        totals = roi_worker.calculate_roi_for_all_active_businesses(self.period_end)
+        self.assertEqual(totals['reports'], 5)
+        self.assertEqual(totals['businesses'], 7)
+
+    def test_single_business_report(self):
+        report = roi_worker.calculate_roi_for_business(2)
+        self.assertIsNotNone(report)
+        # Recalculating within 24 hours updates the same report
+        self.assertEqual(roi_worker.calculate_roi_for_business(2).id, report.id)
+        self.assertEqual(ROIReport.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
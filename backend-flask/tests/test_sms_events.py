@@ -0,0 +1,153 @@
+"""
+Unit tests for batched inbound SMS persistence
+Runs against an in-memory SQLite database
+"""
+import unittest
+from datetime import datetime
+
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import Business, Lead, Conversation, Message
+from app.event_streams import handle_batch
+from app.sms_events import persist_inbound, persist_statuses
+
+
+def event(sid, sender='+15551234567', body='hi', received_at=1760000000, business_id=1):
+    return {'message_sid': sid, 'business_id': str(business_id), 'from': sender, 'to': '+15550000000',
+            'body': body, 'received_at': str(received_at)}
+
+
+class RecordingStream:
+    """Stands in for EventStream in handle_batch; records acks and dead letters."""
+
+    key = 'test:stream'
+
+    def __init__(self, exhausted=()):
+        self.acked, self.dead, self._exhausted = [], [], set(exhausted)
+
+    def ack(self, ids):
+        self.acked.extend(ids)
+
+    def exhausted(self, ids):
+        return self._exhausted & set(ids)
+
+    def dead_letter(self, event, error):
+        self.dead.append(event)
+
+
+class TestInboundPersistence(DatabaseTestCase):
+    """Test set-wise, idempotent inbound SMS writes"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Test Biz'))
+        db.session.commit()
+
+    def test_batch_creates_leads_conversations_and_messages(self):
+        db.session.add(Lead(business_id=1, phone='(555) 123-4567', first_name='Known'))
+        db.session.commit()
+
+        stored = persist_inbound([
+            event('SM1'),
+            event('SM2', body='again', received_at=1760000060),
+            event('SM3', sender='+15559876543'),
+            event('SM1'),
+        ])
+
+        self.assertEqual(stored, 3)
+        self.assertEqual(Lead.query.count(), 2)
+        self.assertEqual(Conversation.query.count(), 2)
+        known = Lead.query.filter_by(first_name='Known').one()
+        convo = Conversation.query.filter_by(lead_id=known.id, channel='sms').one()
+        msgs = Message.query.filter_by(conversation_id=convo.id).order_by(Message.ts).all()
+        self.assertEqual([m.content for m in msgs], ['hi', 'again'])
+        self.assertEqual(msgs[0].sender, 'lead')
+        self.assertEqual(convo.last_message_at, datetime.utcfromtimestamp(1760000060))
+
+        new = Lead.query.filter_by(phone_key='+15559876543').one()
+        self.assertEqual(new.source, 'sms')
+
+    def test_redelivery_is_idempotent(self):
+        persist_inbound([event('SM1'), event('SM2')])
+        self.assertEqual(persist_inbound([event('SM2'), event('SM1')]), 0)
+        self.assertEqual(Message.query.count(), 2)
+
+    def test_bad_event_is_dead_lettered_without_blocking_batch(self):
+        stream = RecordingStream()
+        batch = [(b'1-0', event('SM1')), (b'2-0', event('SM2', received_at='not-a-ts')), (b'3-0', event('SM3'))]
+
+        self.assertTrue(handle_batch(stream, batch, persist_inbound))
+
+        self.assertEqual(stream.acked, [b'1-0', b'2-0', b'3-0'])
+        self.assertEqual([e['message_sid'] for e in stream.dead], ['SM2'])
+        self.assertEqual(Message.query.count(), 2)
+
+    def test_total_failure_leaves_batch_pending_until_exhausted(self):
+        def failing(events):
+            raise RuntimeError('database unavailable')
+
+        batch = [(b'1-0', event('SM1')), (b'2-0', event('SM2'))]
+        stream = RecordingStream()
+        self.assertFalse(handle_batch(stream, batch, failing))
+        self.assertEqual((stream.acked, stream.dead), ([], []))
+
+        stream = RecordingStream(exhausted={b'1-0'})
+        self.assertFalse(handle_batch(stream, batch, failing))
+        self.assertEqual(stream.acked, [b'1-0'])
+        self.assertEqual([e['message_sid'] for e in stream.dead], ['SM1'])
+
+
+def status(sid, value, received_at=1760000000, error_code=''):
+    return {'message_sid': sid, 'status': value, 'error_code': error_code, 'received_at': str(received_at)}
+
+
+class TestStatusPersistence(DatabaseTestCase):
+    """Test coalesced delivery status updates"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Test Biz'))
+        db.session.add(Lead(id=1, business_id=1, phone='+15551234567'))
+        db.session.add(Conversation(id=1, lead_id=1, channel='sms'))
+        db.session.add_all([
+            Message(conversation_id=1, sender='ai', content='hi', ts=0, external_id=f'SM{i}', status='queued')
+            for i in range(1, 5)
+        ])
+        db.session.commit()
+
+    def statuses(self):
+        return dict(db.session.execute(db.select(Message.external_id, Message.status)).all())
+
+    def test_batch_keeps_latest_status_per_message(self):
+        updated = persist_statuses([
+            status('SM1', 'sent'), status('SM2', 'sent'), status('SM1', 'delivered', 1760000005),
+            status('SM3', 'undelivered', error_code='30003'), status('SM3', 'sent', 1760000009),
+            status('SM404', 'delivered'),
+        ])
+
+        self.assertEqual(updated, 3)
+        self.assertEqual(self.statuses(), {'SM1': 'delivered', 'SM2': 'sent', 'SM3': 'undelivered', 'SM4': 'queued'})
+        failed = Message.query.filter_by(external_id='SM3').one()
+        self.assertEqual(failed.extra_data['error_code'], '30003')
+
+    def test_late_callback_does_not_regress_status(self):
+        persist_statuses([status('SM1', 'delivered')])
+        self.assertEqual(persist_statuses([status('SM1', 'sent', 1760000010), status('SM1', 'sending')]), 0)
+        self.assertEqual(self.statuses()['SM1'], 'delivered')
+
+    def test_one_update_per_distinct_status(self):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        db.event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            persist_statuses([status(f'SM{i}', 'delivered') for i in range(1, 5)] + [status('SM1', 'sent')])
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE')]), 1)
+        self.assertEqual(set(self.statuses().values()), {'delivered'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+Unit tests for the outbound SMS queue
+Runs against an in-memory SQLite database; Redis and Twilio are patched out
+"""
+import unittest
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from twilio.base.exceptions import TwilioRestException
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import Business, Lead, Conversation, Message
+from app import sms_outbound
+from app.sms_outbound import SenderBusy, SenderThrottle, queue_sms, send_sms, mark_send_failed
+from app.settings import settings
+
+
+class TestOutboundSms(DatabaseTestCase):
+    """Test queued sends and how Twilio outcomes are recorded"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Business(id=1, name='Test Biz', twilio_account_sid='AC1', twilio_auth_token='tok',
+                                twilio_phone_number='+15550000000'))
+        db.session.add_all([
+            Lead(id=1, business_id=1, first_name='A', phone='+15551110001'),
+            Lead(id=2, business_id=1, first_name='B', phone='+15551110002'),
+            Lead(id=3, business_id=1, first_name='No phone'),
+        ])
+        db.session.commit()
+
+        self.enqueued = []
+        patcher = patch.object(sms_outbound, '_enqueue_sends', side_effect=self.enqueued.extend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(sms_outbound.throttle, 'slot', return_value=nullcontext())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = MagicMock()
+        patcher = patch.object(sms_outbound, 'client_for', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queue_sms_records_queued_messages_and_enqueues_them(self):
+        queued = queue_sms(1, [1, 2, 3], 'Spring sale')
+
+        self.assertEqual(set(queued), {1, 2})
+        self.assertEqual(sorted(self.enqueued), sorted(queued.values()))
+        for lead_id, message_id in queued.items():
+            message = db.session.get(Message, message_id)
+            self.assertEqual(message.status, 'queued')
+            self.assertEqual(message.content, 'Spring sale')
+            self.assertEqual(db.session.get(Conversation, message.conversation_id).lead_id, lead_id)
+            self.assertEqual(message.extra_data['to'], db.session.get(Lead, lead_id).phone)
+
+    def test_queue_sms_ignores_other_businesses_leads(self):
+        db.session.add(Business(id=2, name='Other'))
+        db.session.add(Lead(id=4, business_id=2, first_name='C', phone='+15551110004'))
+        db.session.commit()
+
+        self.assertEqual(queue_sms(1, [4], 'hi'), {})
+        self.assertEqual(self.enqueued, [])
+
+    def test_queue_sms_marks_messages_failed_when_redis_is_down(self):
+        sms_outbound._enqueue_sends.side_effect = RedisConnectionError()
+
+        with self.assertRaises(RedisConnectionError):
+            queue_sms(1, [1], 'hi')
+        self.assertEqual([m.status for m in Message.query.all()], ['failed'])
+
+    def test_send_records_sid_and_status(self):
+        message_id = queue_sms(1, [1], 'hi')[1]
+        self.client.messages.create.return_value = SimpleNamespace(sid='SM1', status='queued')
+
+        result = send_sms(message_id)
+
+        self.client.messages.create.assert_called_once_with(body='hi', from_='+15550000000', to='+15551110001')
+        self.assertEqual(result, {'status': 'queued', 'sid': 'SM1'})
+        message = db.session.get(Message, message_id)
+        self.assertEqual(message.external_id, 'SM1')
+        self.assertEqual(message.extra_data['from'], '+15550000000')
+
+    def test_send_is_skipped_once_twilio_accepted_the_message(self):
+        message_id = queue_sms(1, [1], 'hi')[1]
+        self.client.messages.create.return_value = SimpleNamespace(sid='SM1', status='queued')
+        send_sms(message_id)
+
+        send_sms(message_id)
+        self.assertEqual(self.client.messages.create.call_count, 1)
+
+    def test_permanent_twilio_error_fails_without_retry(self):
+        message_id = queue_sms(1, [1], 'hi')[1]
+        self.client.messages.create.side_effect = TwilioRestException(400, '/Messages', 'Invalid To', code=21211)
+
+        result = send_sms(message_id)
+
+        self.assertEqual(result['status'], 'failed')
+        message = db.session.get(Message, message_id)
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(message.extra_data['error_code'], 21211)
+
+    def test_transient_twilio_error_is_raised_for_retry(self):
+        message_id = queue_sms(1, [1], 'hi')[1]
+        self.client.messages.create.side_effect = TwilioRestException(429, '/Messages', 'Too many requests')
+
+        with self.assertRaises(TwilioRestException):
+            send_sms(message_id)
+        self.assertEqual(db.session.get(Message, message_id).status, 'queued')
+
+    def test_failure_callback_marks_failed_only_when_retries_are_exhausted(self):
+        message_id = queue_sms(1, [1], 'hi')[1]
+
+        mark_send_failed(SimpleNamespace(args=(message_id,), retries_left=2), None, None, Exception('busy'), None)
+        self.assertEqual(db.session.get(Message, message_id).status, 'queued')
+
+        mark_send_failed(SimpleNamespace(args=(message_id,), retries_left=0), None, None, Exception('busy'), None)
+        self.assertEqual(db.session.get(Message, message_id).status, 'failed')
+
+
+class MemoryRedis:
+    """The sorted-set and counter commands SenderThrottle issues, kept in dicts."""
+
+    def __init__(self):
+        self.zsets, self.counters = {}, {}
+
+    def pipeline(self):
+        return MemoryPipeline(self)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def incr(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    def expire(self, key, ttl):
+        pass
+
+
+class MemoryPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class TestSenderThrottle(unittest.TestCase):
+    """Test the per-sender in-flight limit and recovery from leaked slots"""
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        for name, value in (('SMS_SENDER_CONCURRENCY', 1), ('SMS_SENDER_RATE_PER_SEC', 100),
+                            ('SMS_THROTTLE_MAX_WAIT', 0.1)):
+            patcher = patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(sms_outbound, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.throttle = SenderThrottle()
+
+    def test_slot_is_exclusive_and_released(self):
+        with self.throttle.slot('+1555'):
+            with self.assertRaises(SenderBusy):
+                with self.throttle.slot('+1555'):
+                    pass
+        with self.throttle.slot('+1555'):
+            pass
+        self.assertEqual(self.redis.zcard('leadnest:sms:inflight:+1555'), 0)
+
+    def test_leaked_slot_expires_while_others_keep_polling(self):
+        key = 'leadnest:sms:inflight:+1555'
+        # A worker killed mid-send never released its slot
+        self.redis.zadd(key, {'crashed': 1000.0})
+        with patch.object(sms_outbound.time, 'time', return_value=1030.0):
+            self.assertFalse(self.throttle._try_acquire(self.redis, '+1555', 'a'))
+        with patch.object(sms_outbound.time, 'time', return_value=1061.0):
+            self.assertTrue(self.throttle._try_acquire(self.redis, '+1555', 'b'))
+        self.assertEqual(set(self.redis.zsets[key]), {'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Unit tests for cached Twilio validators and pre-rendered TwiML replies
+Runs against an in-memory SQLite database
+"""
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import event
+
+from support import DatabaseTestCase
+from app.db import db
+from app.models import Business, User, OnboardingProgress
+from app.twiml_cache import TwimlCache, TEMPLATES, render_twiml, validator_for
+
+
+class TestTwimlCache(DatabaseTestCase):
+    """Test per-business reply rendering and invalidation"""
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([Business(id=1, name='Default'), Business(id=2, name='Spa')])
+        db.session.add(User(id=1, email='owner@spa.test', business_id=2))
+        db.session.commit()
+        self.cache = TwimlCache(listen=False)
+        self.publish = mock.patch('app.twiml_cache.invalidation.publish')
+        self.publish.start()
+
+    def tearDown(self):
+        self.publish.stop()
+        super().tearDown()
+
+    def set_auto_reply(self, data):
+        progress = OnboardingProgress.query.filter_by(user_id=1, step='enable_auto_reply').first()
+        if not progress:
+            progress = OnboardingProgress(user_id=1, step='enable_auto_reply')
+            db.session.add(progress)
+        progress.completed_at = datetime.utcnow()
+        progress.data = data
+        db.session.commit()
+
+    def test_default_and_custom_replies(self):
+        self.set_auto_reply({'enabled': True, 'message': 'Spa here, booking link soon!'})
+
+        self.assertEqual(self.cache.reply(1), render_twiml(TEMPLATES['auto_reply']))
+        self.assertIn(b'<Message>Spa here, booking link soon!</Message>', self.cache.reply(2))
+
+    def test_rendered_once_until_invalidated(self):
+        self.set_auto_reply({'enabled': True, 'message': 'First'})
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            first = self.cache.reply(2)
+            for _ in range(5):
+                self.assertIs(self.cache.reply(2), first)
+            self.assertEqual(len(statements), 1)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        self.set_auto_reply({'enabled': False})
+        self.assertIs(self.cache.reply(2), first)
+        self.cache.invalidate(2)
+        self.assertEqual(self.cache.reply(2), render_twiml(None))
+
+    def test_validator_reused_per_token(self):
+        self.assertIs(validator_for('token-a'), validator_for('token-a'))
+        self.assertIsNot(validator_for('token-a'), validator_for('token-b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,52 @@
-from rq import Worker, Queue, Connection
-from app.tasks import redis_conn
+import os
+import sys
+
+from rq import Queue, SimpleWorker, Worker
+from rq.worker_pool import WorkerPool
+from app.tasks import schedule_metrics_rollup, schedule_rescore_sweep
+from app.redis_pool import get_blocking_redis
 from app import create_app
 
+app = create_app()
+# Workers wait for jobs in BLPOP, longer than the shared pool's read timeout
+redis_conn = get_blocking_redis()
+
+
+class AppWorker(Worker):
+    """Runs every job inside the Flask app context (needed for db.session)."""
+
+    def perform_job(self, job, queue):
+        with app.app_context():
+            return super().perform_job(job, queue)
+
+
+class SmsWorker(SimpleWorker):
+    """
+    Runs send_sms jobs in the worker process itself (no fork per job), so the
+    pooled Twilio clients in app.sms_outbound stay warm between sends.
+    """
+
+    def perform_job(self, job, queue):
+        with app.app_context():
+            return super().perform_job(job, queue)
+
+
 if __name__ == '__main__':
-    app = create_app()
-    with app.app_context():
-        with Connection(redis_conn):
-            worker = Worker([Queue('default')])
-            worker.work()
+    if sys.argv[1:] == ['sms']:
+        # Send retries are scheduled with backoff, so this worker also runs the scheduler
+        SmsWorker([Queue('sms', connection=redis_conn)], connection=redis_conn).work(with_scheduler=True)
+        sys.exit()
+
+    # RQ_WORKERS > 1 runs a pool so partitioned imports are processed in parallel
+    num_workers = int(os.environ.get('RQ_WORKERS', 1))
+    queues = [Queue('default', connection=redis_conn)]
+    # Daily ROI rollups and the lead rescore sweep reschedule themselves after each run;
+    # this starts the chains
+    schedule_metrics_rollup()
+    schedule_rescore_sweep()
+    if num_workers > 1:
+        pool = WorkerPool(queues, connection=redis_conn, num_workers=num_workers, worker_class=AppWorker)
+        pool.start()
+    else:
+        # The scheduler runs delayed jobs (tasks.schedule_rescore_due, schedule_rescore_sweep, schedule_metrics_rollup)
+        AppWorker(queues, connection=redis_conn).work(with_scheduler=True)
@@ -0,0 +1,65 @@
+"""
+Streaming CSV for exports.
+
+iter_csv() turns a header and an iterable of rows into encoded CSV chunks of
+CSV_CHUNK_ROWS rows, so an export never holds more than one chunk in memory
+and the header reaches the client before the first row is read.
+gzip_chunks() compresses such a stream on the fly, flushing after every chunk
+so the client keeps receiving data as it is produced.
+"""
+
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, Sequence
+
+CSV_CHUNK_ROWS = 1000
+
+
+def _drain(buffer: io.StringIO, encoding: str) -> bytes:
+    data = buffer.getvalue().encode(encoding)
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence], chunk_rows: int = CSV_CHUNK_ROWS,
+             encoding: str = "utf-8") -> Iterator[bytes]:
+    """Encoded CSV: the header on its own, then one chunk per chunk_rows rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield _drain(buffer, encoding)
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield _drain(buffer, encoding)
+            pending = 0
+    if pending:
+        yield _drain(buffer, encoding)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """gzip (Content-Encoding: gzip) stream of the chunks."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (and doesn't refuse it with q=0)."""
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "x-gzip"):
+            q = params.strip().lower()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
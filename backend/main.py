@@ -1,15 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List
-import csv
-import io
 from fastapi.responses import StreamingResponse
 import logging
 
 from config import config
+from csv_export import CSV_CHUNK_ROWS, accepts_gzip, gzip_chunks, iter_csv
 from database import get_db, User, Search, Lead, Export, engine, Base
 from schemas import (
     UserCreate, UserLogin, User as UserSchema, Token,
@@ -208,9 +208,30 @@ async def create_export(
     
     return db_export
 
+# CSV header -> Lead column, in export order
+LEAD_EXPORT_COLUMNS = [
+    ('Business Name', 'business_name'), ('Phone', 'phone'), ('Email', 'email'), ('Website', 'website'),
+    ('Address', 'address'), ('Category', 'category'), ('Rating', 'rating'), ('Review Count', 'review_count'),
+    ('Email Message', 'ai_email_message'), ('SMS Message', 'ai_sms_message'), ('Quality Score', 'quality_score'),
+]
+
+def iter_lead_export_rows(bind, search_id: int):
+    """
+    A search's leads as CSV rows, read on a connection of its own through a
+    server-side cursor (stream_results) in CSV_CHUNK_ROWS batches, so memory
+    stays flat however many leads the search has.
+    """
+    leads = Lead.__table__
+    query = select(*(leads.c[column] for _, column in LEAD_EXPORT_COLUMNS)).where(leads.c.search_id == search_id)
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=CSV_CHUNK_ROWS).execute(query)
+        for row in result:
+            yield [value or '' for value in row]
+
 @app.get("/exports/{search_id}/csv")
-async def export_csv(
+def export_csv(
     search_id: int,
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -223,43 +244,14 @@ async def export_csv(
     if not search:
         raise HTTPException(status_code=404, detail="Search not found")
     
-    # Get leads
-    leads = db.query(Lead).filter(Lead.search_id == search_id).all()
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    # Streamed: the header goes out at once, then the leads chunk by chunk as they are read
+    chunks = iter_csv([header for header, _ in LEAD_EXPORT_COLUMNS], iter_lead_export_rows(db.get_bind(), search_id))
+    headers = {"Content-Disposition": f"attachment; filename=leads_{search_id}.csv", "Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
     
-    # Write header
-    writer.writerow([
-        'Business Name', 'Phone', 'Email', 'Website', 'Address',
-        'Category', 'Rating', 'Review Count', 'Email Message',
-        'SMS Message', 'Quality Score'
-    ])
-    
-    # Write leads
-    for lead in leads:
-        writer.writerow([
-            lead.business_name,
-            lead.phone or '',
-            lead.email or '',
-            lead.website or '',
-            lead.address or '',
-            lead.category or '',
-            lead.rating or '',
-            lead.review_count or '',
-            lead.ai_email_message or '',
-            lead.ai_sms_message or '',
-            lead.quality_score or ''
-        ])
-    
-    output.seek(0)
-    
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=leads_{search_id}.csv"}
-    )
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
 
 # Dashboard endpoints
 @app.get("/dashboard/stats", response_model=DashboardStats)
@@ -214,6 +214,50 @@ def test_export_csv(client, test_data, db_session):
     assert rows[0][0] == "Business Name"  # Header
     assert rows[1][0] == "Test Business"  # Data
 
+def test_export_csv_streams_gzip(client, test_data, db_session):
+    """Test that large CSV exports stream in chunks and honor Accept-Encoding: gzip"""
+    from database import User, Search, Lead
+    from auth import get_password_hash
+    from datetime import datetime, timedelta
+    
+    user = User(
+        email="gzip@example.com",
+        hashed_password=get_password_hash("password"),
+        trial_ends_at=datetime.utcnow() + timedelta(days=5),
+        subscription_status="trial"
+    )
+    db_session.add(user)
+    db_session.commit()
+    
+    search = Search(user_id=user.id, location="Austin, TX", trade="roofing", results_count=2500)
+    db_session.add(search)
+    db_session.commit()
+    
+    # More than one CSV chunk of leads
+    db_session.add_all([
+        Lead(search_id=search.id, business_name=f"Business {i}", quality_score=0.5) for i in range(2500)
+    ])
+    db_session.commit()
+    
+    login_response = client.post("/auth/login", json={
+        "email": "gzip@example.com",
+        "password": "password"
+    })
+    token = login_response.json()["access_token"]
+    
+    response = client.get(f"/exports/{search.id}/csv",
+        headers={"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    
+    # The client decodes the gzip stream
+    rows = list(csv.reader(io.StringIO(response.content.decode('utf-8'))))
+    assert len(rows) == 2501  # Header + 2500 data rows
+    assert rows[0][0] == "Business Name"
+    assert {row[0] for row in rows[1:]} == {f"Business {i}" for i in range(2500)}
+
 def test_dashboard_stats(client, test_data, db_session):
     """Test dashboard statistics endpoint"""
     from database import User, Search, Lead, Export